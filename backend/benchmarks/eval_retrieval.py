@@ -0,0 +1,230 @@
+# sweeps vector index types and search parameters, reporting recall@k against query latency
+#
+# usage (from backend/):
+#   uv run python benchmarks/eval_retrieval.py                      # the live journal table
+#   uv run python benchmarks/eval_retrieval.py --table journal_chunks
+#   uv run python benchmarks/eval_retrieval.py --synthetic 20000    # clustered random vectors, offline
+#
+# ground truth is an exact (numpy) cosine scan; every index is built on a scratch
+# copy of the embeddings, so the live database is only read
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from rich.console import Console
+from rich.table import Table
+
+from core.settings import settings
+from run_benchmarks import RESULTS_DIR, git_revision
+
+
+def load_embeddings(path: str, table: str) -> np.ndarray:
+    async def read():
+        db = await lancedb.connect_async(path)
+        arrow = await (await db.open_table(table)).query().select(["embedding"]).to_arrow()
+        return arrow["embedding"].to_pylist()
+    return np.asarray(asyncio.run(read()), dtype=np.float32)
+
+
+def synthetic_embeddings(rows: int, dim: int, seed: int) -> np.ndarray:
+    """Vectors around a few hundred centers; real embeddings cluster by topic, uniform noise does not."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, rows // 100), dim), dtype=np.float32)
+    assignment = rng.integers(0, len(centers), rows)
+    return centers[assignment] + 0.6 * rng.standard_normal((rows, dim), dtype=np.float32)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def make_queries(data: np.ndarray, n: int, noise: float, seed: int) -> np.ndarray:
+    """Perturbed copies of random rows: near their source entry, but not an exact match for it."""
+    rng = np.random.default_rng(seed)
+    picked = data[rng.choice(len(data), size=min(n, len(data)), replace=False)]
+    jitter = rng.standard_normal(picked.shape, dtype=np.float32) / math.sqrt(data.shape[1])
+    return normalize(normalize(picked) + noise * jitter)
+
+
+def exact_neighbors(data: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    similarity = queries @ normalize(data).T
+    top = np.argpartition(-similarity, kth=min(k, data.shape[0] - 1), axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def candidate_configs(rows: int, dim: int, k: int) -> list[tuple[str, dict, object, list[dict]]]:
+    """(index name, build params, index config or None for an exact scan, search parameter grid)."""
+    partitions = sorted({max(1, round(math.sqrt(rows) * f)) for f in (0.5, 1, 2)})
+    sub_vectors = [s for s in (dim // 16, dim // 8) if s and dim % s == 0]
+    nprobes = [n for n in (5, 10, 20, 50) if n <= max(partitions)]
+    configs = [("flat", {}, None, [{}])]
+    for p in partitions:
+        probe_grid = [{"nprobes": n} for n in nprobes if n <= p] or [{"nprobes": p}]
+        configs.append((
+            "ivf_flat", {"num_partitions": p},
+            lancedb.index.IvfFlat(distance_type="cosine", num_partitions=p), probe_grid,
+        ))
+        for s in sub_vectors:
+            configs.append((
+                "ivf_pq", {"num_partitions": p, "num_sub_vectors": s},
+                lancedb.index.IvfPq(distance_type="cosine", num_partitions=p, num_sub_vectors=s),
+                [{**g, "refine_factor": r} for g in probe_grid for r in (None, 5, 20)],
+            ))
+        configs.append((
+            "ivf_hnsw_sq", {"num_partitions": p},
+            lancedb.index.HnswSq(distance_type="cosine", num_partitions=p),
+            [{**g, "ef": ef} for g in probe_grid for ef in (max(k * 4, 20), 100, 300)],
+        ))
+    return configs
+
+
+async def sweep(data: np.ndarray, queries: np.ndarray, truth: list[set[int]], args) -> list[dict]:
+    scratch = tempfile.mkdtemp(prefix="journal-retrieval-eval-")
+    try:
+        db = await lancedb.connect_async(scratch)
+        vectors = pa.FixedSizeListArray.from_arrays(pa.array(data.ravel(), pa.float32()), data.shape[1])
+        source = pa.table({"id": pa.array(range(len(data)), pa.int64()), "embedding": vectors})
+        results = []
+        for name, build, config, grid in candidate_configs(len(data), data.shape[1], args.k):
+            table = await db.create_table("eval", data=source, mode="overwrite")
+            start = time.perf_counter()
+            if config is not None:
+                try:
+                    await table.create_index("embedding", config=config)
+                except Exception as e:  # e.g. too few rows to train PQ codebooks
+                    results.append({"index": name, **build, "error": str(e).splitlines()[0]})
+                    continue
+            build_ms = (time.perf_counter() - start) * 1000
+            for params in grid:
+                results.append({
+                    "index": name, **build, **{p: v for p, v in params.items() if v is not None},
+                    "build_ms": round(build_ms, 1),
+                    **await run_queries(table, queries, truth, args.k, params),
+                })
+        return results
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def build_search(table, query: np.ndarray, k: int, params: dict):
+    search = table.vector_search(query.tolist()).distance_type("cosine").select(["id"]).limit(k)
+    if params.get("nprobes"):
+        search = search.nprobes(params["nprobes"])
+    if params.get("refine_factor"):
+        search = search.refine_factor(params["refine_factor"])
+    if params.get("ef"):
+        search = search.ef(params["ef"])
+    return search
+
+
+async def run_queries(table, queries: np.ndarray, truth: list[set[int]], k: int, params: dict) -> dict:
+    await build_search(table, queries[0], k, params).to_arrow()  # warm the index cache, untimed
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        search = build_search(table, query, k, params)
+        start = time.perf_counter()
+        found = await search.to_arrow()
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & set(found["id"].to_pylist()))
+    latencies.sort()
+    return {
+        "recall": round(hits / (k * len(queries)), 4),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))], 3),
+    }
+
+
+def recommend(results: list[dict], target_recall: float) -> dict | None:
+    """Fastest setting (by p50) that reaches the target recall; the exact scan always qualifies."""
+    good = [r for r in results if "error" not in r and r["recall"] >= target_recall]
+    return min(good, key=lambda r: (r["p50_ms"], r["p99_ms"])) if good else None
+
+
+def describe(result: dict) -> str:
+    skip = {"index", "recall", "p50_ms", "p99_ms", "build_ms", "error"}
+    params = ", ".join(f"{k}={v}" for k, v in result.items() if k not in skip)
+    return f"{result['index']}({params})" if params else result["index"]
+
+
+def print_results(results: list[dict], best: dict | None, rows: int, args) -> None:
+    table = Table(title=f"recall@{args.k} vs latency over {rows} rows, {args.queries} queries")
+    for column in ("config", "recall", "p50 ms", "p99 ms", "build ms"):
+        table.add_column(column, no_wrap=column == "config")
+    for r in results:
+        if "error" in r:
+            table.add_row(describe(r), "-", "-", "-", f"failed: {r['error']}")
+            continue
+        style = "bold green" if r is best else None
+        table.add_row(describe(r), f"{r['recall']:.3f}", f"{r['p50_ms']:.2f}", f"{r['p99_ms']:.2f}",
+                      f"{r['build_ms']:.0f}", style=style)
+    console = Console()
+    console.print(table)
+    if best:
+        console.print(f"Recommended for {rows} rows at recall@{args.k} >= {args.target_recall}: {describe(best)}")
+    else:
+        console.print(f"No configuration reached recall@{args.k} >= {args.target_recall}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency sweep over vector index settings")
+    parser.add_argument("--lance", default=settings.file_storage.lance_storage_path, help="LanceDB directory")
+    parser.add_argument("--table", default="journal", choices=["journal", "journal_chunks"])
+    parser.add_argument("--synthetic", type=int, help="evaluate N clustered random vectors instead of a table")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of --synthetic vectors")
+    parser.add_argument("--k", type=int, default=5, help="neighbors per query (the chat flows use top_k=5)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.5, help="perturbation of query vectors")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/retrieval-<commit>.json)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        data = synthetic_embeddings(args.synthetic, args.dim, args.seed)
+        source = f"synthetic:{args.synthetic}x{args.dim}"
+    else:
+        data = load_embeddings(args.lance, args.table)
+        source = f"{args.lance}:{args.table}"
+    if len(data) <= args.k:
+        parser.error(f"{source} has {len(data)} rows; need more than k={args.k}")
+
+    queries = make_queries(data, args.queries, args.query_noise, args.seed)
+    args.queries = len(queries)
+    truth = exact_neighbors(data, queries, args.k)
+    results = asyncio.run(sweep(data, queries, truth, args))
+    best = recommend(results, args.target_recall)
+    print_results(results, best, len(data), args)
+
+    commit, dirty = git_revision()
+    output = args.output or os.path.join(RESULTS_DIR, f"retrieval-{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "source": source,
+            "rows": len(data),
+            "dim": int(data.shape[1]),
+            "params": {k: getattr(args, k) for k in ("k", "queries", "query_noise", "target_recall", "seed")},
+            "recommended": best,
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote results to {output}")
+
+
+if __name__ == "__main__":
+    main()
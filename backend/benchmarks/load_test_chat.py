@@ -0,0 +1,92 @@
+# fires concurrent chat requests at a running API and reports latency percentiles
+#
+# start the API with stubbed models so no provider is called (from backend/):
+#   STUB_MODELS=1 uv run uvicorn backend.api:app --app-dir src
+# then:
+#   uv run python benchmarks/load_test_chat.py [--endpoint agent] [--requests 200] [--concurrency 20]
+#
+# stub latency and generation speed are set in `settings.stub_models`
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+ENDPOINTS = {"direct": "/journal_chat", "agent": "/journal_chat_agent/stream"}
+QUERIES = [
+    "what did I do last weekend?",
+    "how has my running been going?",
+    "summarize my notes about the garden",
+    "when did I last see my family?",
+    "what ideas did I have for the project?",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def one_request(client: httpx.AsyncClient, args, i: int) -> dict:
+    body = {
+        "query": QUERIES[i % len(QUERIES)],
+        "provider": "stub",
+        "model": "stub",
+        "thread_id": None,
+    }
+    start = time.perf_counter()
+    first_event = None
+    try:
+        async with client.stream("POST", ENDPOINTS[args.endpoint], json=body) as response:
+            async for line in response.aiter_lines():
+                if first_event is None and line.startswith("data:"):
+                    first_event = time.perf_counter() - start
+                if line == "event: error":
+                    return {"ok": False}
+            ok = response.status_code == 200
+    except httpx.HTTPError:
+        return {"ok": False}
+    return {"ok": ok, "total": time.perf_counter() - start, "first_event": first_event}
+
+
+async def run(args) -> tuple[list[dict], float]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i: int) -> dict:
+            async with semaphore:
+                return await one_request(client, args, i)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+        return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the chat endpoints")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="direct")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    results, wall = asyncio.run(run(args))
+    ok = [r for r in results if r["ok"]]
+    table = Table(title=f"{ENDPOINTS[args.endpoint]}: {len(ok)}/{len(results)} ok, {len(ok) / wall:.1f} req/s")
+    for column in ("metric", "p50 ms", "p95 ms", "p99 ms", "mean ms"):
+        table.add_column(column)
+    for metric in ("total", "first_event"):
+        values = [r[metric] * 1000 for r in ok if r.get(metric) is not None]
+        if values:
+            table.add_row(metric, *(f"{percentile(values, q):.0f}" for q in (0.5, 0.95, 0.99)),
+                          f"{statistics.fmean(values):.0f}")
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# times retrieval and ingestion hot paths against a synthetic vault, offline
+#
+# usage (from backend/): uv run python benchmarks/run_benchmarks.py [--days 3000] [--compare benchmarks/results/<sha>.json]
+#
+# results are written to benchmarks/results/<commit>.json (or --output) so runs
+# can be compared across commits with --compare
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# no real credentials are needed; LLM and embedding calls are stubbed below
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from rich.console import Console
+from rich.table import Table
+
+import core.llm as llm
+from core.ingest import load_notes_to_df
+from core.lancedb_client import AsyncLocalLanceDB
+from core.navigation import crawl_journal_entries
+from core.settings import settings
+from core.state import ProcessingStateStore
+from synthetic_vault import build_vault
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+async def _no_network(*args, **kwargs):
+    raise RuntimeError("benchmarks must not call the embedding API")
+
+
+def git_revision() -> tuple[str, bool]:
+    """Short commit hash and whether the tree has uncommitted changes."""
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+        return sha.stdout.strip(), bool(dirty.stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+async def measure(fn, repeat: int, setup=None) -> dict:
+    """Run `fn` `repeat` times (after `setup`, untimed, if given) and summarize wall times in ms."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            await setup()
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "max_ms": round(max(times), 3),
+    }
+
+
+async def run(args, paths: dict[str, str]) -> dict[str, dict]:
+    rng = random.Random(args.seed)
+    query = [rng.gauss(0, 1) for _ in range(args.dim)]
+    results = {}
+
+    async def fresh_state():
+        if os.path.exists(paths["state"]):
+            os.remove(paths["state"])
+
+    def crawl():
+        state = ProcessingStateStore(paths["state"])
+        crawl_journal_entries(paths["journal"], state)
+        state.close()
+
+    results["crawl_journal_entries.cold"] = await measure(crawl, args.repeat, setup=fresh_state)
+    crawl()
+    results["crawl_journal_entries.warm"] = await measure(crawl, args.repeat)
+
+    results["load_notes_to_df"] = await measure(
+        lambda: load_notes_to_df(paths["embeddings"], paths["journal"]), args.repeat
+    )
+
+    lance = AsyncLocalLanceDB(paths["lance"])
+    await lance.connect()
+
+    async def reset_lance():
+        # threads/messages are only created when missing, so start each ingest from scratch
+        shutil.rmtree(paths["lance"], ignore_errors=True)
+        await lance.connect()
+
+    results["startup_ingest"] = await measure(lance.startup_ingest, args.ingest_repeat, setup=reset_lance)
+
+    results["get_recent_entries"] = await measure(lambda: lance.get_recent_entries(7), args.repeat)
+    results["get_similar_entries"] = await measure(lambda: lance.get_similar_entries(query, 5), args.repeat)
+    results["get_similar_passages"] = await measure(lambda: lance.get_similar_passages(query, 5), args.repeat)
+    results["get_entries_by_date_range"] = await measure(
+        lambda: lance.get_entries_by_date_range("2023-01-01", "2023-12-31", 20), args.repeat
+    )
+    results["get_thread_messages"] = await measure(lambda: lance.get_thread_messages("thread-000"), args.repeat)
+    return results
+
+
+def print_results(results: dict[str, dict], baseline: dict | None) -> None:
+    table = Table(title="benchmarks (ms)")
+    columns = ["benchmark", "runs", "min", "median", "mean", "max"]
+    if baseline:
+        columns += ["baseline median", "change"]
+    for column in columns:
+        table.add_column(column, no_wrap=column == "benchmark")
+    for name, r in results.items():
+        row = [name, str(r["runs"]), *(f"{r[k]:.1f}" for k in ("min_ms", "median_ms", "mean_ms", "max_ms"))]
+        if baseline:
+            before = baseline["benchmarks"].get(name)
+            if before:
+                change = (r["median_ms"] - before["median_ms"]) / before["median_ms"] * 100
+                row += [f"{before['median_ms']:.1f}", f"{change:+.1f}%"]
+            else:
+                row += ["-", "-"]
+        table.add_row(*row)
+    Console().print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for retrieval and ingestion hot paths")
+    parser.add_argument("--days", type=int, default=3000, help="daily pages in the synthetic vault")
+    parser.add_argument("--evergreen", type=int, default=300, help="evergreen notes in the synthetic vault")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimension")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per benchmark")
+    parser.add_argument("--ingest-repeat", type=int, default=2, help="timed runs of startup_ingest")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to show median changes against")
+    parser.add_argument("--keep-vault", action="store_true", help="leave the synthetic vault on disk")
+    args = parser.parse_args()
+
+    llm.get_embedding = _no_network
+    root = tempfile.mkdtemp(prefix="journal-bench-")
+    try:
+        start = time.perf_counter()
+        paths = build_vault(root, days=args.days, evergreen=args.evergreen, dim=args.dim, seed=args.seed)
+        print(f"Built synthetic vault in {time.perf_counter() - start:.1f}s at {root}")
+        storage = settings.file_storage
+        storage.journal_storage_path = paths["journal"]
+        storage.evergreen_storage_path = paths["evergreen"]
+        storage.embedding_storage_path = paths["embeddings"]
+        storage.chat_storage_path = paths["chats"]
+        storage.state_storage_path = paths["state"]
+
+        results = asyncio.run(run(args, paths))
+    finally:
+        if args.keep_vault:
+            print(f"Synthetic vault kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    commit, dirty = git_revision()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: getattr(args, k) for k in ("days", "evergreen", "dim", "repeat", "ingest_repeat", "seed")},
+        "benchmarks": results,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("params") != report["params"]:
+            print(f"warning: {args.compare} was run with different parameters: {baseline.get('params')}")
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote results to {output}")
+
+
+if __name__ == "__main__":
+    main()
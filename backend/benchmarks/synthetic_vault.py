@@ -0,0 +1,103 @@
+# synthetic_vault.py
+# builds a fake journal vault (daily pages, evergreen notes, embeddings, chats)
+# for the benchmark suite; nothing here touches the network
+import json
+import os
+import random
+from datetime import date, timedelta
+
+WORDS = (
+    "morning run coffee read wrote meeting project garden walk dinner family call "
+    "train idea plan tired slept worked cooked music book notes travel rain weekend"
+).split()
+TAGS = [f"#{t}" for t in (
+    "run", "work", "family", "marguerite", "reading", "garden", "travel", "health",
+    "music", "cooking", "project-x", "ostrava", "friends", "sleep", "idea",
+)]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    tokens = [rng.choice(WORDS) for _ in range(words)]
+    for _ in range(max(1, words // 60)):
+        tokens.insert(rng.randrange(len(tokens)), rng.choice(TAGS))
+    return " ".join(tokens)
+
+
+def _vector(rng: random.Random, dim: int) -> list[float]:
+    return [rng.gauss(0, 1) for _ in range(dim)]
+
+
+def build_vault(
+    root: str,
+    days: int = 3000,
+    evergreen: int = 300,
+    dim: int = 768,
+    threads: int = 20,
+    messages_per_thread: int = 40,
+    seed: int = 7
+) -> dict[str, str]:
+    """Write a synthetic vault under `root` and return the paths settings should point at.
+
+    Daily pages follow the real layout (`<year>/MM-DD-YYYY.md` beside a
+    `MM-DD-YYYY AM.pdf` scan) so the crawler and loaders take their normal paths;
+    every page and note gets a random embedding in `embeddings.jsonl`. Assistant
+    messages carry slim `context_entries` so reading a thread exercises hydration.
+    """
+    rng = random.Random(seed)
+    journal = os.path.join(root, "Daily Pages")
+    evergreen_dir = os.path.join(root, "Evergreen")
+    embeddings = os.path.join(root, "embeddings.jsonl")
+    chats = os.path.join(root, "chats.json")
+    os.makedirs(evergreen_dir, exist_ok=True)
+
+    titles = []
+    start = date(2024, 12, 31) - timedelta(days=days - 1)
+    with open(embeddings, "w") as emb:
+        for i in range(days):
+            day = start + timedelta(days=i)
+            title = day.strftime("%m-%d-%Y")
+            year_dir = os.path.join(journal, str(day.year))
+            os.makedirs(year_dir, exist_ok=True)
+            md_path = os.path.join(year_dir, f"{title}.md")
+            with open(os.path.join(year_dir, f"{title} AM.pdf"), "wb"):
+                pass
+            with open(md_path, "w") as f:
+                f.write(f"#day\n### Page\n![[{title} AM.pdf]]\n### Transcription\n{_text(rng, rng.randint(80, 400))}\n")
+            emb.write(json.dumps({"path": md_path, "embedding": _vector(rng, dim)}) + "\n")
+            titles.append((day.isoformat(), title))
+
+        for i in range(evergreen):
+            path = os.path.join(evergreen_dir, f"note-{i:04d}.md")
+            with open(path, "w") as f:
+                f.write(f"# Note {i}\n{_text(rng, rng.randint(100, 600))}\n")
+            emb.write(json.dumps({"path": path, "embedding": _vector(rng, dim)}) + "\n")
+
+    chat_data = {"threads": [], "messages": []}
+    for t in range(threads):
+        thread_id = f"thread-{t:03d}"
+        chat_data["threads"].append({
+            "thread_id": thread_id, "title": f"Thread {t}", "tags": [],
+            "created_at": "2025-01-01T00:00:00", "updated_at": f"2025-01-01T00:{t:02d}:00",
+        })
+        for m in range(messages_per_thread):
+            role = "user" if m % 2 == 0 else "assistant"
+            metadata = None
+            if role == "assistant":
+                context = [{"date": d, "title": title, "source": "journal"} for d, title in rng.sample(titles, 5)]
+                metadata = {"context_entries": context}
+            chat_data["messages"].append({
+                "message_id": f"{thread_id}-{m:03d}", "thread_id": thread_id,
+                "timestamp": f"2025-01-01T01:00:{m:02d}", "role": role, "content": _text(rng, 60),
+                "metadata_json": json.dumps(metadata) if metadata else None,
+            })
+    with open(chats, "w") as f:
+        json.dump(chat_data, f)
+
+    return {
+        "journal": journal,
+        "evergreen": evergreen_dir,
+        "embeddings": embeddings,
+        "chats": chats,
+        "lance": os.path.join(root, "lance"),
+        "state": os.path.join(root, "state.db"),
+    }
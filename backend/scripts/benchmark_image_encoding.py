@@ -0,0 +1,92 @@
+# compares image preprocessing variants for transcription uploads:
+# payload size, encode time and (with --transcribe) transcription accuracy
+#
+# usage: uv run python scripts/benchmark_image_encoding.py page1.pdf page2.jpg [--transcribe] [--json out.json]
+import argparse
+import asyncio
+import base64
+import os
+import json
+import time
+from difflib import SequenceMatcher
+
+from rich.console import Console
+from rich.table import Table
+
+from core.settings import ImageSettings, settings
+from pipeline.transcription import encode_entry, transcribe_images
+
+VARIANTS = {
+    "png-200dpi-full": ImageSettings(dpi=200, max_long_edge=None, grayscale=False, format="PNG"),
+    "jpeg-150dpi-2048": ImageSettings(dpi=150, max_long_edge=2048, grayscale=False, format="JPEG", quality=85),
+    "jpeg-gray-150dpi-2048": ImageSettings(dpi=150, max_long_edge=2048, grayscale=True, format="JPEG", quality=85),
+    "jpeg-gray-150dpi-1600-q75": ImageSettings(dpi=150, max_long_edge=1600, grayscale=True, format="JPEG", quality=75),
+    "webp-gray-150dpi-2048": ImageSettings(dpi=150, max_long_edge=2048, grayscale=True, format="WEBP", quality=80),
+    "configured": settings.images,
+}
+
+BASELINE = "png-200dpi-full"
+
+
+def similarity(reference: str, candidate: str) -> float:
+    """Character-level similarity (1.0 = identical), a cheap stand-in for 1 - CER."""
+    return SequenceMatcher(None, reference, candidate).ratio()
+
+
+async def run(paths: list[str], transcribe: bool) -> list[dict]:
+    results = []
+    references: dict[str, str] = {}
+    for name, options in VARIANTS.items():
+        for path in paths:
+            start = time.perf_counter()
+            images = encode_entry(path, options)
+            encode_ms = (time.perf_counter() - start) * 1000
+            result = {
+                "variant": name,
+                "file": path,
+                "pages": len(images),
+                "payload_kb": sum(len(i) for i in images) / 1024,
+                "decoded_kb": sum(len(base64.b64decode(i)) for i in images) / 1024,
+                "encode_ms": encode_ms,
+            }
+            if transcribe:
+                start = time.perf_counter()
+                text = await transcribe_images(images, "", options.format)
+                result["transcribe_ms"] = (time.perf_counter() - start) * 1000
+                # the lossless full-resolution upload is the reference transcription
+                references.setdefault(path, text)
+                result["similarity"] = similarity(references[path], text)
+            results.append(result)
+    return results
+
+
+def print_results(results: list[dict]) -> None:
+    table = Table(title="image encoding benchmark")
+    columns = ["variant", "file", "pages", "payload_kb", "encode_ms", "transcribe_ms", "similarity"]
+    for column in columns:
+        table.add_column(column)
+    for r in results:
+        r = {**r, "file": os.path.basename(r["file"])}
+        table.add_row(*[
+            f"{r[c]:.1f}" if isinstance(r.get(c), float) else str(r.get(c, "-"))
+            for c in columns
+        ])
+    Console().print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help="sample scans (PDF or image)")
+    parser.add_argument("--transcribe", action="store_true", help="also transcribe each variant (uses the API)")
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.paths, args.transcribe))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.json}")
+
+if __name__ == "__main__":
+    main()
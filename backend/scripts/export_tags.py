@@ -3,13 +3,17 @@ from pathlib import Path
 
 from core.navigation import extract_tags
 from core.settings import settings
+from core.state import ProcessingStateStore
 
 def main():
     project_root = Path(__file__).resolve().parent.parent.parent
     backend_path = project_root / "backend" / "tags_export.json"
     ui_path = project_root / "ui" / "public" / "tags.json"
 
-    tags = extract_tags(settings.file_storage.journal_storage_path, output_format="frequency")
+    # reads the pipeline's tag index, re-reading only files changed since it was last updated
+    state = ProcessingStateStore()
+    tags = extract_tags(settings.file_storage.journal_storage_path, output_format="frequency", state=state)
+    state.close()
 
     for path in [backend_path, ui_path]:
         path.parent.mkdir(parents=True, exist_ok=True)
@@ -2,13 +2,18 @@ from contextlib import asynccontextmanager
 import json
 import logging
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-from backend.flows import default_llm_flow, agentic_llm_flow_stream
+from backend.flows import default_llm_flow, agentic_llm_flow_stream, refresh_thread_summary
 from backend.completions import generate_thread_title
+from backend.response_cache import response_cache
 from core.lancedb_client import AsyncLocalLanceDB
+from core.settings import settings
+from core.state import ProcessingStateStore
+from core.tracing import configure_otel, log_trace, start_trace
+from core.metrics import REGISTRY, HTTP_REQUEST_SECONDS, INGESTION_FILES, TABLE_FRAGMENTS, TABLE_ROWS
 logger = logging.getLogger(__name__)
 
 from core.models import (
@@ -23,15 +28,18 @@ app_status = {"status": "starting"}
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("initializing database")
-    db = AsyncLocalLanceDB("lance.journal-app")
+    configure_otel()
+    db = AsyncLocalLanceDB(settings.file_storage.lance_storage_path)
     await db.connect()
     await db.startup_ingest()
     app.state.db = db
+    app.state.processing_state = ProcessingStateStore()
     app_status["status"] = "ready"
 
     yield
 
     print("shutting down")
+    app.state.processing_state.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -40,6 +48,11 @@ async def get_db() -> AsyncLocalLanceDB:
     """Dependency injection for database access."""
     return app.state.db
 
+
+async def get_processing_state() -> ProcessingStateStore:
+    """Dependency injection for the pipeline's state store (tag index)."""
+    return app.state.processing_state
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000", "http://frontend:80"],
@@ -48,20 +61,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+### request tracing
+
+DEBUG_TIMINGS_HEADER = "X-Debug-Timings"
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Record per-stage timings for each request and log them to journal_app.jsonl.
+
+    The breakdown is returned as a `Server-Timing` header when the request sets
+    `X-Debug-Timings` (or `settings.tracing.debug_header` is on). Streaming
+    responses send headers before their stages run, so for those the breakdown
+    is only in the log line written once the stream ends.
+    """
+    with start_trace("request") as trace:
+        response = await call_next(request)
+    if settings.tracing.debug_header or request.headers.get(DEBUG_TIMINGS_HEADER):
+        response.headers["Server-Timing"] = trace.server_timing()
+
+    body = response.body_iterator
+    # the route template keeps label cardinality bounded (/threads/{thread_id}, not every id)
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+
+    async def logged_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                request.method, route, str(response.status_code), value=trace.elapsed_ms() / 1000
+            )
+            log_trace(trace, method=request.method, path=request.url.path, status_code=response.status_code)
+
+    response.body_iterator = logged_body()
+    return response
+
 ### status endpoint
 
 @app.get("/status")
 async def get_status() -> StatusResponse:
     return StatusResponse(status=app_status["status"])
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    db: AsyncLocalLanceDB = Depends(get_db),
+    state: ProcessingStateStore = Depends(get_processing_state)
+) -> PlainTextResponse:
+    """Prometheus text exposition of request, LLM, cache, LanceDB and ingestion metrics.
+
+    Table and ingestion gauges are read at scrape time; everything else is
+    accumulated in-process as requests are served.
+    """
+    TABLE_ROWS.clear()
+    TABLE_FRAGMENTS.clear()
+    for table, stats in (await db.table_stats()).items():
+        TABLE_ROWS.set(table, value=stats["rows"])
+        TABLE_FRAGMENTS.set(table, value=stats["fragments"])
+    INGESTION_FILES.clear()
+    for kind, stage, status, count in state.status_counts():
+        INGESTION_FILES.set(kind, stage, status, value=count)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+### tag endpoints
+
+@app.get("/tags")
+async def get_tags(
+    limit: int | None = Query(default=None, ge=1),
+    state: ProcessingStateStore = Depends(get_processing_state)
+) -> dict[str, int]:
+    """Journal tags and how often each is used, most frequent first.
+
+    Read from the tag index the ingestion pipeline maintains; the vault is not scanned.
+    """
+    return state.tag_frequencies(settings.file_storage.journal_storage_path, limit=limit)
+
 ### completion endpoints
 
+def _sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
 @app.post("/journal_chat")
 async def journal_chat(
     request: ChatRequest,
     db: AsyncLocalLanceDB = Depends(get_db)
 ) -> ChatResponse:
-    return await default_llm_flow(db, request)
+    key = await response_cache.key(db, "default", request)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
+    response = await default_llm_flow(db, request)
+    response_cache.put(key, response)
+    return response
 
 
 @app.post("/journal_chat_agent/stream")
@@ -72,10 +163,18 @@ async def journal_chat_agent_stream(
     """Streaming agentic chat endpoint that sends SSE events for each search iteration."""
     async def event_generator():
         try:
+            key = await response_cache.key(db, "agent", request)
+            events = response_cache.get(key)
+            if events is not None:
+                # replay the finished stream of a repeated question
+                for event in events:
+                    yield _sse(event)
+                return
+            events = []
             async for event in agentic_llm_flow_stream(db, request):
-                event_type = event["event"]
-                data = json.dumps(event["data"])
-                yield f"event: {event_type}\ndata: {data}\n\n"
+                events.append(event)
+                yield _sse(event)
+            response_cache.put(key, events)
         except Exception as e:
             logger.error(f"Stream error: {e}")
             error_data = json.dumps({"error": str(e)})
@@ -132,14 +231,17 @@ async def get_thread_messages_endpoint(
 async def add_message_to_thread(
     thread_id: str,
     req: AddMessageRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncLocalLanceDB = Depends(get_db)
 ) -> Message:
-    """Add a message to a thread"""
+    """Add a message to a thread; assistant turns refresh the thread summary after responding."""
     if not await db.get_thread(thread_id):
         raise HTTPException(status_code=404, detail="Thread not found")
 
     metadata = req.metadata.model_dump(mode="json") if req.metadata else None
     message_doc = await db.save_message(thread_id, req.role, req.content, metadata)
+    if req.role == "assistant":
+        background_tasks.add_task(refresh_thread_summary, db, thread_id)
     return Message(**message_doc)
 
 
@@ -1,14 +1,20 @@
 # completions.py
 # code for dealing with LLM stuff in the app
+import time
 import logging
+from datetime import date
 from pathlib import Path
 
-from baml_py import ClientRegistry
+from baml_py import ClientRegistry, Collector
 
 from core.baml_client.async_client import b
 from core.baml_client.types import SearchOptions, SearchToolCall
 from core.models import ChatRequest
 from core.llm import get_embedding
+from core.tracing import traced
+from core.metrics import LLM_CALLS, LLM_SECONDS, LLM_TOKENS
+from core.settings import settings
+from core.stub_models import stub_baml_client
 from backend.personalities import Personality
 
 logger = logging.getLogger(__name__)
@@ -27,22 +33,58 @@ def load_custom_instructions() -> str:
         return ""
 
 
+def _baml_client():
+    """The generated BAML client, or the offline stub when `settings.stub_models.enabled` is on."""
+    return stub_baml_client if settings.stub_models.enabled else b
+
+
+async def _call_baml(function: str, *args, baml_options: dict | None = None):
+    """Call a BAML function, recording its latency, outcome and token usage for /metrics."""
+    collector = Collector(name=function)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        result = await getattr(_baml_client(), function)(*args, baml_options={**(baml_options or {}), "collector": collector})
+        status = "ok"
+        return result
+    finally:
+        LLM_CALLS.inc(function, status)
+        LLM_SECONDS.observe(function, value=time.perf_counter() - start)
+        usage = collector.usage
+        LLM_TOKENS.inc(function, "input", amount=usage.input_tokens or 0)
+        LLM_TOKENS.inc(function, "output", amount=usage.output_tokens or 0)
+        LLM_TOKENS.inc(function, "cached_input", amount=usage.cached_input_tokens or 0)
+
+
+def format_messages(messages: list[dict]) -> str:
+    """Render chat messages as the `[ROLE]: content` transcript the BAML prompts expect."""
+    return "\n\n".join(
+        f"[{m.get('role', 'unknown').upper()}]: {m.get('content', '')}"
+        for m in messages
+    )
+
+
+@traced("intent_classification")
 async def intent_classifier(query: str) -> SearchOptions:
-    return await b.IntentClassifier(query)
+    return await _call_baml("IntentClassifier", query)
 
 
+@traced("title_generation")
 async def generate_thread_title(messages: list[dict]) -> str:
     """Generate a concise title summarizing a chat thread."""
     if not messages:
         return "Untitled"
-    formatted = "\n\n".join(
-        f"[{m.get('role', 'unknown').upper()}]: {m.get('content', '')}"
-        for m in messages
-    )
-    title = (await b.GenerateThreadTitle(formatted)).strip().strip('"').strip("'")
+    title = (await _call_baml("GenerateThreadTitle", format_messages(messages))).strip().strip('"').strip("'")
     return title or "Untitled"
 
 
+@traced("thread_summary")
+async def summarize_thread(previous_summary: str, messages: list[dict]) -> str:
+    """Fold `messages` into a thread's rolling summary."""
+    return (await _call_baml("SummarizeThread", previous_summary, format_messages(messages))).strip()
+
+
+@traced("personality_classification")
 async def classify_personality(query: str, personalities: list[Personality]) -> Personality | None:
     """Classify the query and return the matching personality, or None for default."""
     if not personalities:
@@ -51,7 +93,7 @@ async def classify_personality(query: str, personalities: list[Personality]) ->
     options_str = "\n".join(
         f"- {p.title}: {p.description}" for p in personalities
     )
-    selected_title = await b.PersonalityClassifier(query, options_str)
+    selected_title = await _call_baml("PersonalityClassifier", query, options_str)
     selected_title = selected_title.strip()
 
     for p in personalities:
@@ -63,6 +105,7 @@ async def classify_personality(query: str, personalities: list[Personality]) ->
     return None
 
 
+@traced("synthesis")
 async def chat_response(request: ChatRequest, chat_history: list, entries_str: str, personality_prompt: str = "") -> str:
     cr = ClientRegistry()
     cr.set_primary(f"{request.provider}/{request.model}")
@@ -77,27 +120,30 @@ async def chat_response(request: ChatRequest, chat_history: list, entries_str: s
     })
 
     # convert messages to string for LLM
-    messages_intermediate = []
-    for msg in chat_history:
-        role = msg.get("role", "unknown")
-        content = msg.get("content", "")
-        messages_intermediate.append(f"[{role.upper()}]: {content}")
-    messages_str = "\n\n".join(messages_intermediate)
+    messages_str = format_messages(chat_history)
 
-    return await b.DirectChat(messages_str, entries_str, custom_instructions, personality_prompt, {"client_registry": cr})
+    return await _call_baml(
+        "DirectChat", messages_str, entries_str, custom_instructions, personality_prompt,
+        baml_options={"client_registry": cr}
+    )
 
 
+@traced("tool_selection")
 async def agent_tool_selector(
     user_query: str,
     accumulated_context: str,
     search_trace: str,
     iteration: int,
     max_iterations: int
-) -> SearchToolCall:
-    """Select the next search tool to use in the agent loop."""
-    return await b.AgentToolSelector(user_query, accumulated_context, search_trace, iteration, max_iterations)
+) -> list[SearchToolCall]:
+    """Select the next search tools to run (in parallel) in the agent loop."""
+    current_date = date.today().isoformat()
+    return await _call_baml(
+        "AgentToolSelector", user_query, accumulated_context, search_trace, iteration, max_iterations, current_date
+    )
 
 
+@traced("synthesis")
 async def agent_synthesizer(
     request: ChatRequest,
     chat_history: list,
@@ -116,19 +162,15 @@ async def agent_synthesizer(
         "content": f"<QUERY>{request.query}</QUERY>"
     })
 
-    messages_intermediate = []
-    for msg in chat_history:
-        role = msg.get("role", "unknown")
-        content = msg.get("content", "")
-        messages_intermediate.append(f"[{role.upper()}]: {content}")
-    messages_str = "\n\n".join(messages_intermediate)
+    messages_str = format_messages(chat_history)
 
-    return await b.AgentSynthesizer(
+    return await _call_baml(
+        "AgentSynthesizer",
         request.query,
         messages_str,
         accumulated_context,
         search_trace,
         custom_instructions,
         personality_prompt,
-        {"client_registry": cr}
+        baml_options={"client_registry": cr}
     )
@@ -1,13 +1,17 @@
+import asyncio
+from dataclasses import asdict
 from typing import AsyncGenerator
 
-from core.baml_client.types import SearchOptions, SearchToolType
+from core.baml_client.types import SearchOptions, SearchToolCall, SearchToolType
 from core.lancedb_client import AsyncLocalLanceDB
 from core.log_config import setup_logging
+from core.settings import settings
+from core.tracing import span, traced
 from core.models import (
     AgentSearchState,
     ChatRequest,
     ChatResponse,
-    Entry,
+    EntryView,
     MessageContextEntry,
     MessageMetadata,
     MessageModelMetadata,
@@ -15,8 +19,10 @@ from core.models import (
     RetrievedDoc,
     SearchIteration,
 )
-from core.llm import get_embedding
-from backend.completions import intent_classifier, chat_response, agent_tool_selector, agent_synthesizer, classify_personality
+from core.llm import get_query_embedding
+from backend.completions import (
+    intent_classifier, chat_response, agent_tool_selector, agent_synthesizer, classify_personality, summarize_thread,
+)
 from backend.personalities import Personality, load_personalities
 
 logger = setup_logging()
@@ -33,7 +39,7 @@ def _personality_metadata(personality: Personality | None) -> MessagePersonality
     )
 
 
-def _entry_metadata(entry: Entry, distance: float | None = None, source: str = "journal") -> MessageContextEntry:
+def _entry_metadata(entry: EntryView, distance: float | None = None, source: str = "journal") -> MessageContextEntry:
     "Store entry metadata"
     return MessageContextEntry(
         date=entry.date,
@@ -101,16 +107,14 @@ async def default_llm_flow(lance: AsyncLocalLanceDB, req: ChatRequest) -> ChatRe
         logger.info(f"Query intent: {query_intent}")
 
         if query_intent == SearchOptions.VECTOR:
-            query_embedding = await get_embedding(req.query)
-            entries = await lance.get_similar_entries(query_embedding, req.top_k)
+            query_embedding = await get_query_embedding(req.query)
+            entries = await lance.get_similar_passages(query_embedding, req.top_k)
             for i, (entry, distance) in enumerate(entries, 1):
-                entry_dict = entry.model_dump(exclude={"embedding"})
                 entries_str += f"Entry {i} (Distance: {distance})\n"
-                for k, v in entry_dict.items():
+                for k, v in asdict(entry).items():
                     entries_str += f"   {k}: {v}\n"
                 entries_str += "\n"
-                entry_for_response = entry.model_copy(update={"embedding": None})
-                response_docs.append(RetrievedDoc(entry=entry_for_response, distance=distance))
+                response_docs.append(RetrievedDoc(entry=entry.to_entry(), distance=distance))
                 context_entries.append(_entry_metadata(entry, distance))
 
             retrieval_trace.append(SearchIteration(
@@ -122,16 +126,34 @@ async def default_llm_flow(lance: AsyncLocalLanceDB, req: ChatRequest) -> ChatRe
                 new_entries_added=len(entries),
             ))
 
+        elif query_intent == SearchOptions.HYBRID:
+            query_embedding = await get_query_embedding(req.query)
+            entries = await lance.get_hybrid_entries(req.query, query_embedding, req.top_k)
+            for i, (entry, score) in enumerate(entries, 1):
+                entries_str += f"Entry {i} (Relevance: {score})\n"
+                for k, v in asdict(entry).items():
+                    entries_str += f"   {k}: {v}\n"
+                entries_str += "\n"
+                response_docs.append(RetrievedDoc(entry=entry.to_entry(), distance=None))
+                context_entries.append(_entry_metadata(entry))
+
+            retrieval_trace.append(SearchIteration(
+                iteration=0,
+                tool="HYBRID",
+                reasoning="Intent classifier selected hybrid keyword + vector search.",
+                query=req.query,
+                results_count=len(entries),
+                new_entries_added=len(entries),
+            ))
+
         elif query_intent == SearchOptions.RECENT:
             entries = await lance.get_recent_entries()
             for i, entry in enumerate(entries, 1):
-                entry_dict = entry.model_dump(exclude={"embedding"})
                 entries_str += f"Entry {i}:\n"
-                for k, v in entry_dict.items():
+                for k, v in asdict(entry).items():
                     entries_str += f"   {k}: {v}\n"
                 entries_str += "\n"
-                entry_for_response = entry.model_copy(update={"embedding": None})
-                response_docs.append(RetrievedDoc(entry=entry_for_response, distance=None))
+                response_docs.append(RetrievedDoc(entry=entry.to_entry(), distance=None))
                 context_entries.append(_entry_metadata(entry))
 
             retrieval_trace.append(SearchIteration(
@@ -146,7 +168,8 @@ async def default_llm_flow(lance: AsyncLocalLanceDB, req: ChatRequest) -> ChatRe
     chat_history = await _load_chat_history(lance, req)
 
     # classify personality for this message
-    personalities = load_personalities()
+    with span("personality_load"):
+        personalities = load_personalities()
     personality = await classify_personality(req.query, personalities)
     personality_prompt = personality.prompt if personality else ""
 
@@ -161,19 +184,17 @@ async def default_llm_flow(lance: AsyncLocalLanceDB, req: ChatRequest) -> ChatRe
     )
 
 
+@traced("history_load")
 async def _load_chat_history(lance: AsyncLocalLanceDB, request: ChatRequest) -> list[dict]:
-    # get thread history from lancedb if present
+    # get thread history from lancedb if present: its rolling summary plus the messages after it
     db_messages = []
     if request.thread_id:
         try:
-            thread_messages = await lance.get_thread_messages(request.thread_id)
-            if thread_messages:
-                for msg in thread_messages:
-                    role = msg.get("role", "user")
-                    if role not in ["user", "assistant"]:
-                        role = "user"
-                    content = msg.get("content", "")
-                    db_messages.append({"role": role, "content": content})
+            thread_messages, summary = await asyncio.gather(
+                lance.get_thread_history(request.thread_id),
+                lance.get_thread_summary(request.thread_id),
+            )
+            db_messages = _summarized_history(thread_messages, summary)
         except Exception as e:
             logger.error(f"Error loading thread messages: {e}")
 
@@ -190,12 +211,68 @@ async def _load_chat_history(lance: AsyncLocalLanceDB, request: ChatRequest) ->
     return db_messages + temp_messages
 
 
+def _summarized_history(messages: list[dict], summary: dict | None) -> list[dict]:
+    """The thread summary followed by every message it does not cover.
+
+    While summaries keep up, that is at most `recent_messages + summary_batch`
+    messages. If a refresh failed or never ran, the uncovered messages are all
+    sent rather than dropped.
+    """
+    covered = summary["message_count"] if summary else 0
+    recent = messages[covered:]
+    history = []
+    if summary and summary["summary"]:
+        history.append({"role": "summary", "content": summary["summary"]})
+    for msg in recent:
+        role = msg.get("role", "user")
+        history.append({"role": role if role in ["user", "assistant"] else "user", "content": msg.get("content", "")})
+    return history
+
+
+_summarizing: set[str] = set()
+
+
+async def refresh_thread_summary(lance: AsyncLocalLanceDB, thread_id: str) -> None:
+    """Fold messages that left the verbatim window into the thread's rolling summary.
+
+    Runs after an assistant turn is saved. The summary is only rewritten once
+    `summary_batch` messages are waiting, so most turns cost a single read.
+    """
+    if thread_id in _summarizing:
+        return
+    _summarizing.add(thread_id)
+    try:
+        options = settings.history
+        messages, summary = await asyncio.gather(
+            lance.get_thread_history(thread_id),
+            lance.get_thread_summary(thread_id),
+        )
+        covered = summary["message_count"] if summary else 0
+        cutoff = len(messages) - options.recent_messages
+        if cutoff - covered < options.summary_batch:
+            return
+        text = await summarize_thread(summary["summary"] if summary else "", messages[covered:cutoff])
+        await lance.save_thread_summary(thread_id, text, cutoff)
+        logger.info(f"Summarized {cutoff} messages of thread {thread_id}")
+    except Exception as e:
+        logger.error(f"Error summarizing thread {thread_id}: {e}")
+    finally:
+        _summarizing.discard(thread_id)
+
+
 MAX_AGENT_ITERATIONS = 5
 
 
+MAX_PARALLEL_TOOL_CALLS = 4
+
+
 RECENT_PRESEED_COUNT = 4
 
 
+# upper bound on entries a single tool call may return, whatever limit the model asks for
+MAX_TOOL_RESULTS = 20
+
+
 async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) -> AsyncGenerator[dict, None]:
     """
     Streaming version of agentic_llm_flow that yields SSE events
@@ -221,23 +298,25 @@ async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) ->
         "data": _event_data(state.search_trace[-1]),
     }
 
-    # agent loop - iteratively select and execute tools
+    # agent loop - iteratively select tools and execute each round in parallel
     for iteration in range(1, MAX_AGENT_ITERATIONS + 1):
         try:
-            tool_call = await agent_tool_selector(
+            tool_calls = await agent_tool_selector(
                 user_query=req.query,
                 accumulated_context=state.get_context_string(),
                 search_trace=state.get_trace_string(),
                 iteration=iteration,
                 max_iterations=MAX_AGENT_ITERATIONS
             )
-            logger.info(f"Agent iteration {iteration}: {tool_call.tool} - {tool_call.reasoning[:80]}...")
+            done_calls = [c for c in tool_calls if c.tool == SearchToolType.DONE]
+            search_calls = [c for c in tool_calls if c.tool != SearchToolType.DONE][:MAX_PARALLEL_TOOL_CALLS]
+            logger.info(f"Agent iteration {iteration}: {[c.tool.value for c in tool_calls]}")
 
-            if tool_call.tool == SearchToolType.DONE:
+            if not search_calls:
                 state.record_iteration(
                     iteration=iteration,
                     tool="DONE",
-                    reasoning=tool_call.reasoning,
+                    reasoning=done_calls[0].reasoning if done_calls else "No further searches selected.",
                     query=None,
                     results_count=0,
                     new_entries=0
@@ -248,32 +327,35 @@ async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) ->
                 }
                 break
 
-            # execute the selected tool
-            entries = await _execute_agent_tool(lance, tool_call)
-            new_count = state.add_entries(entries)
+            # execute the selected tools concurrently, streaming each as it finishes
+            async for tool_call, entries in _execute_agent_tools(lance, search_calls):
+                new_count = state.add_entries(entries)
 
-            state.record_iteration(
-                iteration=iteration,
-                tool=tool_call.tool.value,
-                reasoning=tool_call.reasoning,
-                query=tool_call.query,
-                results_count=len(entries),
-                new_entries=new_count
-            )
+                state.record_iteration(
+                    iteration=iteration,
+                    tool=tool_call.tool.value,
+                    reasoning=tool_call.reasoning,
+                    query=tool_call.query or (" ".join(tool_call.tags) if tool_call.tags else None),
+                    results_count=len(entries),
+                    new_entries=new_count
+                )
+
+                yield {
+                    "event": "search_iteration",
+                    "data": _event_data(state.search_trace[-1]),
+                }
 
-            yield {
-                "event": "search_iteration",
-                "data": _event_data(state.search_trace[-1]),
-            }
+                logger.info(f"Agent {tool_call.tool.value} retrieved {len(entries)} entries, {new_count} new")
 
-            logger.info(f"Agent retrieved {len(entries)} entries, {new_count} new")
+            if done_calls:
+                break
 
         except Exception as e:
             logger.error(f"Error in agent iteration {iteration}: {e}")
             if not state.accumulated_entries:
-                query_embedding = await get_embedding(req.query)
+                query_embedding = await get_query_embedding(req.query)
                 if query_embedding:
-                    fallback_entries = await lance.get_similar_entries(query_embedding, req.top_k)
+                    fallback_entries = await lance.get_similar_passages(query_embedding, req.top_k)
                     for entry, _ in fallback_entries:
                         state.add_entry(entry)
             break
@@ -282,7 +364,8 @@ async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) ->
     chat_history = await _load_chat_history(lance, req)
 
     # classify personality for this message
-    personalities = load_personalities()
+    with span("personality_load"):
+        personalities = load_personalities()
     personality = await classify_personality(req.query, personalities)
     personality_prompt = personality.prompt if personality else ""
 
@@ -299,8 +382,7 @@ async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) ->
     response_docs: list[RetrievedDoc] = []
     context_entries: list[MessageContextEntry] = []
     for entry in state.accumulated_entries.values():
-        entry_for_response = entry.model_copy(update={"embedding": None})
-        response_docs.append(RetrievedDoc(entry=entry_for_response, distance=None))
+        response_docs.append(RetrievedDoc(entry=entry.to_entry(), distance=None))
         context_entries.append(_entry_metadata(entry))
 
     metadata = _message_metadata(req, personality, context_entries, state.search_trace)
@@ -316,19 +398,64 @@ async def agentic_llm_flow_stream(lance: AsyncLocalLanceDB, req: ChatRequest) ->
     }
 
 
-async def _execute_agent_tool(lance: AsyncLocalLanceDB, tool_call) -> list[Entry]:
+async def _execute_agent_tools(
+    lance: AsyncLocalLanceDB,
+    tool_calls: list[SearchToolCall],
+) -> AsyncGenerator[tuple[SearchToolCall, list[EntryView]], None]:
+    """Run tool calls concurrently and yield (tool_call, entries) in completion order.
+
+    A failing tool yields no entries instead of discarding the other calls' results.
+    """
+    async def run(tool_call: SearchToolCall) -> tuple[SearchToolCall, list[EntryView]]:
+        try:
+            return tool_call, await _execute_agent_tool(lance, tool_call)
+        except Exception as e:
+            logger.error(f"Agent tool {tool_call.tool.value} failed: {e}")
+            return tool_call, []
+
+    tasks = [asyncio.create_task(run(c)) for c in tool_calls]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _execute_agent_tool(lance: AsyncLocalLanceDB, tool_call: SearchToolCall) -> list[EntryView]:
     """Execute the selected search tool and return entries."""
-    limit = tool_call.limit or 5
+    limit = max(1, min(tool_call.limit or 5, MAX_TOOL_RESULTS))
 
     match tool_call.tool:
         case SearchToolType.VECTOR_SEARCH:
             query = tool_call.query or ""
-            query_embedding = await get_embedding(query)
+            query_embedding = await get_query_embedding(query)
+            if not query_embedding:
+                return []
+            results = await lance.get_similar_passages(query_embedding, limit)
+            return [entry for entry, _ in results]
+
+        case SearchToolType.HYBRID_SEARCH:
+            query = tool_call.query or ""
+            if not query:
+                return []
+            query_embedding = await get_query_embedding(query)
             if not query_embedding:
                 return []
-            results = await lance.get_similar_entries(query_embedding, limit)
+            results = await lance.get_hybrid_entries(query, query_embedding, limit)
             return [entry for entry, _ in results]
 
+        case SearchToolType.TAG_SEARCH:
+            tags = tool_call.tags or []
+            if not tags:
+                return []
+            if tool_call.query:
+                query_embedding = await get_query_embedding(tool_call.query)
+                if query_embedding:
+                    results = await lance.get_similar_entries_by_tags(tags, query_embedding, limit)
+                    return [entry for entry, _ in results]
+            return await lance.get_entries_by_tags(tags, limit)
+
         case SearchToolType.RECENT_ENTRIES:
             return await lance.get_recent_entries(limit)
 
@@ -337,7 +464,8 @@ async def _execute_agent_tool(lance: AsyncLocalLanceDB, tool_call) -> list[Entry
             end = tool_call.end_date
             if not start or not end:
                 return []
-            return await lance.get_entries_by_date_range(start, end, limit)
+            sampling = tool_call.sampling.value.lower() if tool_call.sampling else "evenly_spaced"
+            return await lance.get_entries_by_date_range(start, end, limit, sampling)
 
         case _:
             return []
@@ -0,0 +1,77 @@
+# response_cache.py
+# opt-in cache of chat flow results, so a repeated question (or a UI retry) skips
+# classification, retrieval and synthesis
+import json
+import time
+import hashlib
+from collections import OrderedDict
+
+from core.lancedb_client import AsyncLocalLanceDB
+from core.metrics import RESPONSE_CACHE
+from core.models import ChatRequest
+from core.settings import settings
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query."""
+    return " ".join(query.casefold().split())
+
+
+class ResponseCache:
+    """LRU of flow results with a TTL, sized by `settings.cache`.
+
+    Keys include the thread's `updated_at` and the journal table versions, so a
+    new message in the thread or newly ingested entries make older results
+    unreachable; they age out through the LRU and TTL.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+
+    async def key(self, lance: AsyncLocalLanceDB, flow: str, req: ChatRequest) -> tuple | None:
+        """Cache key for `req` in `flow`, or None when the response cache is off."""
+        if not settings.cache.responses:
+            return None
+        thread_version = None
+        if req.thread_id:
+            thread = await lance.get_thread(req.thread_id)
+            thread_version = thread["updated_at"] if thread else None
+        supplied = json.dumps([req.message_history, req.existing_docs], sort_keys=True, default=str)
+        return (
+            flow,
+            normalize_query(req.query),
+            req.provider,
+            req.model,
+            req.top_k,
+            req.thread_id,
+            thread_version,
+            await lance.content_version(),
+            hashlib.sha256(supplied.encode()).hexdigest(),
+        )
+
+    def get(self, key: tuple | None):
+        if key is None:
+            return None
+        item = self._entries.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                del self._entries[key]
+            RESPONSE_CACHE.inc("miss")
+            return None
+        self._entries.move_to_end(key)
+        RESPONSE_CACHE.inc("hit")
+        return item[1]
+
+    def put(self, key: tuple | None, value) -> None:
+        if key is None:
+            return
+        self._entries[key] = (time.monotonic() + settings.cache.response_ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.cache.response_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+response_cache = ResponseCache()
@@ -1,7 +1,6 @@
 # ingest.py
 # for loading data into things
 import os
-import re
 import json
 import glob
 import logging
@@ -10,24 +9,23 @@ from datetime import datetime
 import polars as pl
 from dotenv import load_dotenv
 
-from core.navigation import strip_frontmatter
+from core.navigation import TAG_PATTERN, strip_frontmatter, extract_transcription
 
 load_dotenv()
 os.makedirs("logs", exist_ok=True)
 logging.basicConfig(filename="logs/loader.log")
 
-def extract_transcription(text: str) -> str:
-    """ Given a markdown file, extracts anything within the Transcription header """
-    match = re.search(r'### Transcription\s*(.*?)\s*(^###|\Z)', text, re.DOTALL | re.MULTILINE)
-    return match.group(1).strip() if match else ""
-
 def extract_tags(text: str) -> list[str]:
     """ Extract all tags from a markdown doc (anything starting with `#`) """
-    return list(set(re.findall(r'#\w+', text)))
+    return list({f"#{tag}" for tag in TAG_PATTERN.findall(text)})
 
 def get_date_part(filepath):
     return os.path.basename(filepath).replace(".md", "")
 
+def chunk_embeddings_path(embeddings_path: str) -> str:
+    """Chunk embeddings live next to the document embeddings file."""
+    return os.path.join(os.path.dirname(embeddings_path), "chunk_embeddings.jsonl")
+
 def load_chats_to_dfs(chats_file: str) -> tuple[pl.DataFrame, pl.DataFrame]:
     """Loads chat history into separate Polars DataFrames for threads and messages.
 
@@ -53,6 +51,41 @@ def load_chats_to_dfs(chats_file: str) -> tuple[pl.DataFrame, pl.DataFrame]:
 
     return threads_df, messages_df
 
+def note_rows(path: str, embedding: list[float]) -> list[dict]:
+    """Journal rows for one daily note; doubleheader notes (`date1_date2`) yield one row per date."""
+    date_part = get_date_part(path)
+
+    # skip weekly notes
+    if date_part.endswith("- Week"):
+        logging.info(f"Skipping file: {date_part}")
+        return []
+
+    # handle doubleheaders
+    date_parts = date_part.split('_')
+    try:
+        dates = [datetime.strptime(d, "%m-%d-%Y") for d in date_parts]
+    except ValueError:
+        logging.warning(f"Skipping file with invalid date format: {date_part}")
+        return []
+
+    # get content from note
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    transcription = extract_transcription(content)
+    tags = extract_tags(content)
+
+    return [
+        {
+            "date": date.strftime("%Y-%m-%d"),
+            "title": date_part,
+            "text": transcription,
+            "tags": tags,
+            "embedding": embedding,
+            "entry_type": "daily",
+        }
+        for date in dates
+    ]
+
 def load_notes_to_df(embeddings_path: str, notes_dir: str):
     # Load embeddings map
     embeddings_map = {}
@@ -71,42 +104,12 @@ def load_notes_to_df(embeddings_path: str, notes_dir: str):
 
     for path in glob.glob(f"{notes_dir}/**/*.md", recursive=True):
         date_part = get_date_part(path)
-
-        # skip weekly notes
-        if date_part.endswith("- Week"):
-            logging.info(f"Skipping file: {date_part}")
-            continue
-
-        # handle doubleheaders
-        date_parts = date_part.split('_')
-        try:
-            dates = [datetime.strptime(d, "%m-%d-%Y") for d in date_parts]
-        except ValueError:
-            logging.warning(f"Skipping file with invalid date format: {date_part}")
-            continue
-
-        # get content from note
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        transcription = extract_transcription(content)
-        tags = extract_tags(content)
-
-        # prepare data rows
-        for date in dates:
-            if date_part not in embeddings_map:
+        if date_part not in embeddings_map:
+            if not date_part.endswith("- Week"):
                 logging.warning(f"no embedding for {date_part}")
                 missing_embeddings += 1
-                continue
-
-            row = {
-                "date": date.strftime("%Y-%m-%d"),
-                "title": date_part,
-                "text": transcription,
-                "tags": tags,
-                "embedding": embeddings_map[date_part],
-                "entry_type": "daily",
-            }
-            rows.append(row)
+            continue
+        rows.extend(note_rows(path, embeddings_map[date_part]))
 
     # Create DataFrame
     df = pl.DataFrame(rows)
@@ -119,6 +122,30 @@ EMPTY_EVERGREEN_SCHEMA = {
     "entry_type": pl.Utf8,
 }
 
+EMPTY_CHUNK_SCHEMA = {
+    "parent_date": pl.Utf8, "parent_title": pl.Utf8, "tags": pl.List(pl.Utf8),
+    "entry_type": pl.Utf8, "chunk_index": pl.Int64, "heading": pl.Utf8,
+    "text": pl.Utf8, "embedding": pl.List(pl.Float64),
+}
+
+def evergreen_row(path: str, embedding: list[float]) -> dict | None:
+    """Journal row for one evergreen note, or None if its body is empty."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    body = strip_frontmatter(content)
+    if not body.strip():
+        return None
+
+    return {
+        "date": datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d"),
+        "title": os.path.basename(path).replace(".md", ""),
+        "text": body,
+        "tags": extract_tags(content),
+        "embedding": embedding,
+        "entry_type": "evergreen",
+    }
+
 def load_evergreen_to_df(embeddings_path: str, evergreen_dir: str) -> pl.DataFrame:
     """Load evergreen markdown entries and their embeddings into a Polars DataFrame."""
     if not os.path.exists(evergreen_dir):
@@ -138,26 +165,85 @@ def load_evergreen_to_df(embeddings_path: str, evergreen_dir: str) -> pl.DataFra
 
     rows = []
     for path in glob.glob(f"{evergreen_dir}/**/*.md", recursive=True):
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        body = strip_frontmatter(content)
-        if not body.strip():
-            continue
-
         if path not in embeddings_map:
             continue
-
-        rows.append({
-            "date": datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d"),
-            "title": os.path.basename(path).replace(".md", ""),
-            "text": body,
-            "tags": extract_tags(content),
-            "embedding": embeddings_map[path],
-            "entry_type": "evergreen",
-        })
+        row = evergreen_row(path, embeddings_map[path])
+        if row:
+            rows.append(row)
 
     if not rows:
         return pl.DataFrame(schema=EMPTY_EVERGREEN_SCHEMA)
 
     return pl.DataFrame(rows)
+
+def chunk_rows(entry: dict, chunks: list[dict] | None) -> list[dict]:
+    """Passage rows for one journal row; without chunks the whole entry is a single passage."""
+    parent = {
+        "parent_date": entry["date"],
+        "parent_title": entry["title"],
+        "tags": entry["tags"],
+        "entry_type": entry["entry_type"],
+    }
+    if not chunks:
+        return [{**parent, "chunk_index": 0, "heading": "",
+                 "text": entry["text"], "embedding": entry["embedding"]}]
+    return [
+        {**parent, "chunk_index": chunk["chunk_index"], "heading": chunk["heading"],
+         "text": chunk["text"], "embedding": chunk["embedding"]}
+        for chunk in chunks
+    ]
+
+def read_chunk_sets(chunks_path: str) -> dict[str, list[dict]]:
+    """Latest chunk set per source path in the append-only chunk embeddings file.
+
+    Each re-embed appends a set starting at chunk_index 0, which replaces
+    earlier sets for the same path.
+    """
+    chunk_sets: dict[str, list[dict]] = {}
+    if not os.path.exists(chunks_path):
+        return chunk_sets
+    with open(chunks_path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk["chunk_index"] == 0:
+                chunk_sets[chunk["path"]] = []  # a re-embed starts a fresh chunk set
+            chunk_sets.setdefault(chunk["path"], []).append(chunk)
+    return chunk_sets
+
+def compact_chunk_embeddings(chunks_path: str) -> None:
+    """Rewrite the chunk embeddings file with only the latest chunk set per path."""
+    if not os.path.exists(chunks_path):
+        return
+    chunk_sets = read_chunk_sets(chunks_path)
+    tmp_path = chunks_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        for chunks in chunk_sets.values():
+            for chunk in chunks:
+                f.write(json.dumps(chunk) + "\n")
+    os.replace(tmp_path, chunks_path)
+
+def load_chunks_to_df(chunks_path: str, journal_df: pl.DataFrame) -> pl.DataFrame:
+    """Build passage rows for every journal entry.
+
+    Entries chunked at embedding time contribute their chunks; short entries
+    contribute a single chunk reusing the whole-document embedding. Each row
+    references its parent entry by (parent_date, parent_title).
+    """
+    # latest chunk set per source file, keyed like journal titles; sets without
+    # embeddings mark short documents that use their document embedding
+    chunks_map: dict[str, list[dict]] = {}
+    try:
+        for path, chunks in read_chunk_sets(chunks_path).items():
+            chunks_map[get_date_part(path)] = [c for c in chunks if c["embedding"] is not None]
+    except Exception as e:
+        logging.error(f"Failed to load chunk embeddings: {e}")
+
+    rows = []
+    for entry in journal_df.iter_rows(named=True):
+        rows.extend(chunk_rows(entry, chunks_map.get(entry["title"])))
+
+    if not rows:
+        return pl.DataFrame(schema=EMPTY_CHUNK_SCHEMA)
+    return pl.DataFrame(rows)
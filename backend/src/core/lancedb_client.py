@@ -1,20 +1,166 @@
 # lancedb_client.py
 import json
+import math
 import uuid
+import hashlib
 import logging
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Literal, Optional
 
 import lancedb
 import polars as pl
 import pyarrow as pa
-
-from core.ingest import load_chats_to_dfs, load_notes_to_df, load_evergreen_to_df
-from core.models import Entry
+from lancedb.rerankers import RRFReranker
+from lancedb._lancedb import MergeResult
+
+from core.ingest import (
+    chunk_embeddings_path, load_chats_to_dfs, load_chunks_to_df,
+    load_notes_to_df, load_evergreen_to_df,
+)
+from core.models import EntryView
+from core.navigation import TAG_PATTERN
 from core.settings import settings
+from core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# journal columns needed to build entries; reads project out `embedding`
+ENTRY_COLUMNS = ["date", "title", "text", "tags", "entry_type"]
+
+CHUNK_COLUMNS = ["parent_date", "parent_title", "chunk_index", "heading", "text", "tags", "entry_type"]
+
+# candidate chunks fetched per requested parent entry when grouping passages
+PASSAGE_OVERSAMPLE = 4
+
+DATE_RANGE_DEFAULT_LIMIT = 10
+DATE_RANGE_MAX_LIMIT = 50
+
+DateRangeSampling = Literal["evenly_spaced", "most_recent", "tag_weighted"]
+
+THREAD_SUMMARIES_SCHEMA = pa.schema([
+    pa.field("thread_id", pa.string()),
+    pa.field("summary", pa.string()),
+    pa.field("message_count", pa.int64()),
+    pa.field("updated_at", pa.string()),
+])
+
+VECTOR_INDEX = "embedding_idx"
+
+# list_indices() names for the vector index configs startup can choose
+VECTOR_INDEX_TYPES = {lancedb.index.HnswSq: "IvfHnswSq", lancedb.index.IvfPq: "IvfPq"}
+
+# scalar and full-text indexes on the journal table, created when missing
+JOURNAL_INDEXES = [
+    ("date", lancedb.index.BTree(), "date_idx"),
+    ("tags", lancedb.index.LabelList(), "tags_label_idx"),  # inverted tag -> rows index for tag filters
+    ("text", lancedb.index.FTS(), "text_idx"),  # full-text (BM25) indexes for hybrid search
+    ("tags", lancedb.index.FTS(), "tags_fts_idx"),
+]
+
+
+def _iso_date(value: str) -> str:
+    """Validate a YYYY-MM-DD date before interpolating it into a filter."""
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def _normalize_tag(tag: str) -> str:
+    """Return a tag in its stored `#tag` form; rejects anything `TAG_PATTERN` would not produce."""
+    name = tag.strip().lstrip("#")
+    if not TAG_PATTERN.fullmatch(f"#{name}"):
+        raise ValueError(f"invalid tag: {tag!r}")
+    return f"#{name}"
+
+
+def _tag_filter(tags: list[str], match_all: bool = False) -> str:
+    """Build a filter on the tags column (served by its LabelList index)."""
+    values = ", ".join("'" + _normalize_tag(t).replace("'", "''") + "'" for t in tags)
+    fn = "array_has_all" if match_all else "array_has_any"
+    return f"{fn}(tags, [{values}])"
+
+
+def vector_index_config(rows: int, dim: int) -> lancedb.index.HnswSq | lancedb.index.IvfPq | None:
+    """Vector index for a table of `rows` embeddings of size `dim`; None means exact search.
+
+    Tiers are set by `settings.vector_index`. IVF partitions scale with the
+    square root of the row count, and IVF-PQ codes 16-dimensional sub-vectors.
+    """
+    options = settings.vector_index
+    if rows < options.flat_max_rows:
+        return None
+    partitions = max(1, round(math.sqrt(rows)))
+    if rows < options.hnsw_max_rows:
+        return lancedb.index.HnswSq(distance_type="cosine", num_partitions=partitions)
+    sub_vectors = dim // 16 if dim % 16 == 0 else (dim // 8 if dim % 8 == 0 else None)
+    return lancedb.index.IvfPq(distance_type="cosine", num_partitions=partitions, num_sub_vectors=sub_vectors)
+
+
+def _vector_search(query, nprobes: int | None = None, refine_factor: int | None = None):
+    """Apply cosine distance and the IVF search settings to a vector query."""
+    options = settings.vector_index
+    query = query.distance_type("cosine").nprobes(nprobes or options.nprobes)
+    refine_factor = refine_factor or options.refine_factor
+    return query.refine_factor(refine_factor) if refine_factor else query
+
+
+def _with_content_hash(df: pl.DataFrame) -> pl.DataFrame:
+    """Tag rows with a sha256 of their content so merges can skip unchanged rows.
+
+    Unlike `DataFrame.hash_rows`, the digest is stable across polars versions,
+    so an upgrade doesn't rewrite every row.
+    """
+    hashes = [
+        hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+        for row in df.iter_rows(named=True)
+    ]
+    return df.with_columns(pl.Series("content_hash", hashes, dtype=pl.Utf8))
+
+
+def _journal_arrow(df: pl.DataFrame) -> pa.Table:
+    """Convert journal rows to arrow with plain utf8 strings; scalar indexes reject large_string."""
+    arrow_table = df.to_arrow()
+    fields = []
+    for f in arrow_table.schema:
+        if pa.types.is_large_string(f.type):
+            f = f.with_type(pa.string())
+        elif f.name == "tags":
+            f = f.with_type(pa.list_(pa.string()))
+        fields.append(f)
+    return arrow_table.cast(pa.schema(fields))
+
+
+def sample_date_range(df: pl.DataFrame, n: int, sampling: DateRangeSampling = "evenly_spaced") -> pl.DataFrame:
+    """Pick at most `n` rows from date-range candidates.
+
+    - evenly_spaced: rows spread across the range, including both ends
+    - most_recent: the latest `n` rows, newest first
+    - tag_weighted: the most-tagged row from each of `n` evenly sized buckets
+    """
+    df = df.sort("date")
+    if df.height <= n:
+        return df.reverse() if sampling == "most_recent" else df
+
+    match sampling:
+        case "most_recent":
+            return df.tail(n).reverse()
+        case "tag_weighted":
+            return (
+                df.with_row_index("_pos")
+                .with_columns(
+                    (pl.col("_pos") * n // df.height).alias("_bucket"),
+                    pl.col("tags").list.len().alias("_tag_count"),
+                )
+                .sort(["_bucket", "_tag_count", "date"], descending=[False, True, True])
+                .group_by("_bucket", maintain_order=True)
+                .first()
+                .sort("date")
+                .drop("_pos", "_bucket", "_tag_count")
+            )
+        case _:
+            if n == 1:
+                return df.tail(1)
+            step = (df.height - 1) / (n - 1)
+            return df[[round(i * step) for i in range(n)]]
+
 
 class AsyncLocalLanceDB:
     def __init__(self, path: str):
@@ -45,8 +191,13 @@ class AsyncLocalLanceDB:
             journal_df = pl.concat([journal_df, evergreen_df])
             logging.info(f"[lancedb] added {len(evergreen_df)} evergreen entries")
 
-        # journal: always overwrite (source of truth is markdown files)
-        await self.db.create_table("journal", data=journal_df, mode="overwrite")
+        # journal: mirror the markdown files (the source of truth), rewriting only changed rows
+        await self._sync_table("journal", journal_df, ["date", "title"])
+
+        # passages: chunks of long entries, whole text of short ones
+        chunks_df = load_chunks_to_df(chunk_embeddings_path(embeddings), journal_df)
+        await self._sync_table("journal_chunks", chunks_df, ["parent_date", "parent_title", "chunk_index"])
+        logging.info(f"[lancedb] loaded {len(chunks_df)} passages for {len(journal_df)} entries")
 
         # threads/messages: only create if not exists (source of truth is the db)
         existing_tables = await self.db.table_names()
@@ -84,48 +235,368 @@ class AsyncLocalLanceDB:
 
         await self._ensure_messages_metadata_column()
 
-        # create indexes
+        # indexes survive merges; create missing ones and resize the vector index
         journal_table = await self.db.open_table("journal")
-        await journal_table.create_index(
-            "embedding",
-            config=lancedb.index.IvfPq(distance_type="cosine"),
+        existing = {i.name for i in await journal_table.list_indices()}
+        for column, config, name in JOURNAL_INDEXES:
+            if name not in existing:
+                await journal_table.create_index(column, config=config, name=name)
+        await self._ensure_vector_index(journal_table)
+        await self._ensure_vector_index(await self.db.open_table("journal_chunks"))
+
+    async def _sync_table(
+        self,
+        name: str,
+        df: pl.DataFrame,
+        keys: list[str],
+        delete_filter: str | None = None
+    ) -> MergeResult | None:
+        """Merge `df` into table `name`, rewriting only rows whose content changed.
+
+        Merging (rather than overwriting) keeps the table's indexes; `optimize()`
+        folds changed rows into them. Without `delete_filter`, `df` is the whole
+        table: unmatched rows are deleted and a missing table, or one written with
+        other columns, is recreated. With it, only unmatched rows passing the
+        filter are deleted. Rows with duplicate keys can't be merged, so they
+        replace the table (or the filtered rows) instead. Returns the merge
+        counts, or None when rows were replaced rather than merged.
+        """
+        data = _journal_arrow(_with_content_hash(df))
+        table = None
+        if name in await self.db.table_names():
+            table = await self.db.open_table(name)
+            target = {f.name: f.type for f in await table.schema()}
+            # hashes from an older scheme never match, so treat them like other columns
+            stale_hash = target.get("content_hash", pa.string()) != pa.string()
+            if delete_filter is None and (stale_hash or set(target) != set(data.schema.names)):
+                table = None
+            elif stale_hash:
+                # until the next full sync rebuilds the table
+                await table.drop_columns(["content_hash"])
+                target.pop("content_hash")
+            if table is not None and "content_hash" not in target:
+                data = data.drop_columns(["content_hash"])
+        if table is None:
+            await self.db.create_table(name, data=data, mode="overwrite")
+            return None
+
+        duplicated = df.select(keys).is_duplicated().any()
+        if not duplicated and delete_filter is None:
+            # rows left duplicated by an earlier replace would all match one source row
+            duplicated = (await table.query().select(keys).to_polars()).is_duplicated().any()
+        if duplicated:
+            # merge_insert rejects several source rows for one key (e.g. same-named
+            # notes in different folders), so replace the affected rows wholesale
+            logger.warning(f"[lancedb] {name}: duplicate {keys} keys, replacing rows instead of merging")
+            if delete_filter is None:
+                await self.db.create_table(name, data=data, mode="overwrite")
+                return None
+            await table.delete(delete_filter)
+            await table.add(data)
+            await table.optimize()
+            return None
+
+        changed = "target.content_hash != source.content_hash" if "content_hash" in data.schema.names else None
+        result = await (
+            table.merge_insert(keys)
+            .when_matched_update_all(where=changed)
+            .when_not_matched_insert_all()
+            .when_not_matched_by_source_delete(delete_filter)
+            .execute(data)
+        )
+        logger.info(
+            f"[lancedb] {name}: {result.num_inserted_rows} inserted, "
+            f"{result.num_updated_rows} updated, {result.num_deleted_rows} deleted"
         )
+        if result.num_updated_rows or result.num_inserted_rows or result.num_deleted_rows:
+            # fold the new rows into the vector, scalar and FTS indexes
+            await table.optimize()
+        return result
+
+    async def _ensure_vector_index(self, table: lancedb.AsyncTable) -> None:
+        """Build, replace or drop the embedding index when the table moves to another size tier."""
+        rows = await table.count_rows()
+        config = vector_index_config(rows, (await table.schema()).field("embedding").type.list_size)
+        wanted = VECTOR_INDEX_TYPES[type(config)] if config else None
+        current = next((i.index_type for i in await table.list_indices() if i.name == VECTOR_INDEX), None)
+        if wanted == current:
+            return
+        if config is None:
+            await table.drop_index(VECTOR_INDEX)
+        else:
+            await table.create_index("embedding", config=config, name=VECTOR_INDEX, replace=True)
+        logger.info(f"[lancedb] {table.name} vector index: {current or 'flat'} -> {wanted or 'flat'} at {rows} rows")
+
+    async def upsert_entries(self, journal_df: pl.DataFrame, chunks_df: pl.DataFrame) -> None:
+        """Replace the rows of re-embedded entries in place, without a full startup ingest.
+
+        Rows are matched on (date, title); existing rows with the same titles but
+        no match (e.g. an evergreen note whose mtime date moved) are deleted in the
+        same commit. Passages of those entries are replaced the same way.
+        """
+        if journal_df.is_empty():
+            return
+        titles = ", ".join("'" + t.replace("'", "''") + "'" for t in journal_df["title"].unique().to_list())
+        await self._sync_table("journal", journal_df, ["date", "title"], delete_filter=f"title IN ({titles})")
+        await self._sync_table(
+            "journal_chunks", chunks_df, ["parent_date", "parent_title", "chunk_index"],
+            delete_filter=f"parent_title IN ({titles})",
+        )
+        await self._ensure_vector_index(await self.db.open_table("journal"))
+        await self._ensure_vector_index(await self.db.open_table("journal_chunks"))
+        logger.info(f"[lancedb] upserted {len(journal_df)} entries and {len(chunks_df)} passages")
 
     ### search and retrieval
 
-    async def get_recent_entries(self, n: int = 7) -> list[Entry]:
+    async def table_stats(self) -> dict[str, dict]:
+        """Row and fragment counts per table, for /metrics."""
+        stats = {}
+        for name in await self.db.table_names():
+            table_stats = await (await self.db.open_table(name)).stats()
+            stats[name] = {
+                "rows": table_stats["num_rows"],
+                "fragments": table_stats["fragment_stats"]["num_fragments"],
+            }
+        return stats
+
+    async def content_version(self) -> tuple[int, ...]:
+        """Versions of the journal and passage tables; they change whenever entries are ingested."""
+        names = await self.db.table_names()
+        return tuple([
+            await (await self.db.open_table(name)).version()
+            for name in ("journal", "journal_chunks") if name in names
+        ])
+
+    @traced("lancedb.recent_entries")
+    async def get_recent_entries(self, n: int = 7) -> list[EntryView]:
         table = await self.db.open_table("journal")
-        arrow_table = await table.to_arrow()
-        entries_df = (
-            pl.from_arrow(arrow_table)
-            .filter(pl.col("entry_type") != "evergreen")
-            .sort("date", descending=True)
+        candidates = await (
+            table.query()
+            .where("entry_type != 'evergreen'")
+            .select(["date"])
+            .with_row_id()
+            .to_polars()
+        )
+        if candidates.is_empty():
+            return []
+        row_ids = candidates.sort("date", descending=True).head(n)["_rowid"].to_list()
+        return await self._entries_by_row_ids(table, row_ids)
+
+    @traced("lancedb.similar_entries")
+    async def get_similar_entries(
+        self,
+        _embedding: list[float],
+        n: int = 5,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+    ) -> list[tuple[EntryView, float]]:
+        """Nearest entries by cosine distance; `nprobes`/`refine_factor` default to `settings.vector_index`."""
+        table = await self.db.open_table("journal")
+        entries_df = await (
+            _vector_search(table.vector_search(_embedding), nprobes, refine_factor)
+            .select(ENTRY_COLUMNS)
+            .limit(n)
+            .to_polars()
+        )
+        entries_df = entries_df.sort("_distance", descending=False)
+        entries = self.df_to_entries(entries_df)
+        distances = entries_df["_distance"].to_list()
+        return list(zip(entries, distances))
+
+    @traced("lancedb.similar_passages")
+    async def get_similar_passages(
+        self,
+        _embedding: list[float],
+        n: int = 5,
+        passages_per_entry: int = 3,
+    ) -> list[tuple[EntryView, float]]:
+        """Vector search over passages, grouped by parent entry.
+
+        Each returned entry's text holds its best matching passages in document
+        order; the distance is that of its closest passage. Falls back to
+        whole-entry search when no passage table exists.
+        """
+        if "journal_chunks" not in await self.db.table_names():
+            return await self.get_similar_entries(_embedding, n)
+
+        table = await self.db.open_table("journal_chunks")
+        chunks_df = await (
+            _vector_search(table.vector_search(_embedding))
+            .select(CHUNK_COLUMNS)
+            .limit(n * PASSAGE_OVERSAMPLE)
+            .to_polars()
+        )
+        if chunks_df.is_empty():
+            return []
+
+        grouped = (
+            chunks_df.sort("_distance")
+            .group_by(["parent_date", "parent_title"], maintain_order=True)
+            .agg(
+                pl.col("_distance").first(),
+                pl.col("tags").first(),
+                pl.col("entry_type").first(),
+                pl.struct("chunk_index", "text").head(passages_per_entry).alias("passages"),
+            )
             .head(n)
         )
-        return self.df_to_entries(entries_df)
 
-    async def get_similar_entries(self, _embedding: list[float], n: int = 5) -> list[tuple[Entry, float]]:
+        results = []
+        for row in grouped.iter_rows(named=True):
+            passages = sorted(row["passages"], key=lambda p: p["chunk_index"])
+            entry = EntryView(
+                date=row["parent_date"],
+                title=row["parent_title"],
+                text="\n\n[...]\n\n".join(p["text"] for p in passages),
+                tags=row["tags"] or [],
+                entry_type=row["entry_type"],
+            )
+            results.append((entry, row["_distance"]))
+        return results
+
+    @traced("lancedb.hybrid_entries")
+    async def get_hybrid_entries(
+        self,
+        query: str,
+        _embedding: list[float],
+        n: int = 5,
+    ) -> list[tuple[EntryView, float]]:
+        """BM25 over text/tags fused with vector search by reciprocal rank fusion.
+
+        Returns (entry, relevance score) pairs, highest score first.
+        """
         table = await self.db.open_table("journal")
-        search_result = await table.search(_embedding)
-        entries_df = await search_result.limit(n).to_polars()
+        entries_df = await (
+            _vector_search(table.query().nearest_to(_embedding))
+            .nearest_to_text(query, columns=["text", "tags"])
+            .rerank(RRFReranker())
+            .select(ENTRY_COLUMNS)
+            .limit(n)
+            .to_polars()
+        )
+        entries = self.df_to_entries(entries_df)
+        scores = entries_df["_relevance_score"].to_list()
+        return list(zip(entries, scores))
+
+    @traced("lancedb.entries_by_tags")
+    async def get_entries_by_tags(
+        self,
+        tags: list[str],
+        n: int | None = None,
+        match_all: bool = False,
+    ) -> list[EntryView]:
+        """List entries carrying any (or all) of `tags`, newest first; `n=None` returns every match."""
+        if not tags:
+            return []
+        table = await self.db.open_table("journal")
+        candidates = await (
+            table.query()
+            .where(_tag_filter(tags, match_all))
+            .select(["date"])
+            .with_row_id()
+            .to_polars()
+        )
+        if candidates.is_empty():
+            return []
+        candidates = candidates.sort("date", descending=True)
+        if n:
+            candidates = candidates.head(n)
+        return await self._entries_by_row_ids(table, candidates["_rowid"].to_list())
+
+    @traced("lancedb.similar_entries_by_tags")
+    async def get_similar_entries_by_tags(
+        self,
+        tags: list[str],
+        _embedding: list[float],
+        n: int = 5,
+        match_all: bool = False,
+    ) -> list[tuple[EntryView, float]]:
+        """Vector search restricted (pre-filtered) to entries carrying any (or all) of `tags`."""
+        if not tags:
+            return []
+        table = await self.db.open_table("journal")
+        entries_df = await (
+            _vector_search(table.vector_search(_embedding))
+            .where(_tag_filter(tags, match_all))
+            .select(ENTRY_COLUMNS)
+            .limit(n)
+            .to_polars()
+        )
         entries_df = entries_df.sort("_distance", descending=False)
         entries = self.df_to_entries(entries_df)
         distances = entries_df["_distance"].to_list()
         return list(zip(entries, distances))
 
-    async def get_entries_by_date_range(self, start_date: str, end_date: str, n: int = None) -> list[Entry]:
+    async def get_entry_embedding(self, date: str, title: str) -> list[float] | None:
+        """Load a single entry's embedding on demand."""
         table = await self.db.open_table("journal")
-        entries_df = await table.search().where(f"date >= '{start_date}' AND date <= '{end_date}'").to_polars()
+        safe_title = title.replace("'", "''")
+        df = await (
+            table.query()
+            .where(f"date = '{_iso_date(date)}' AND title = '{safe_title}'")
+            .select(["embedding"])
+            .limit(1)
+            .to_polars()
+        )
+        if df.is_empty():
+            return None
+        return df["embedding"][0].to_list()
+
+    @traced("lancedb.entries_by_date_range")
+    async def get_entries_by_date_range(
+        self,
+        start_date: str,
+        end_date: str,
+        n: int | None = DATE_RANGE_DEFAULT_LIMIT,
+        sampling: DateRangeSampling = "evenly_spaced",
+    ) -> list[EntryView]:
+        """Return at most `n` (capped at DATE_RANGE_MAX_LIMIT) entries dated within [start_date, end_date].
+
+        Candidates are chosen from the light date/tags columns (served by the
+        `date` scalar index); text is fetched only for the sampled rows and
+        embeddings are never read.
+        """
+        start, end = _iso_date(start_date), _iso_date(end_date)
+        n = min(n or DATE_RANGE_DEFAULT_LIMIT, DATE_RANGE_MAX_LIMIT)
+        table = await self.db.open_table("journal")
+        candidates = await (
+            table.query()
+            .where(f"date >= '{start}' AND date <= '{end}'")
+            .select(["date", "tags"])
+            .with_row_id()
+            .to_polars()
+        )
+        if candidates.is_empty():
+            return []
+
+        sampled = sample_date_range(candidates, n, sampling)
+        return await self._entries_by_row_ids(table, sampled["_rowid"].to_list())
+
+    async def _entries_by_row_ids(self, table: lancedb.AsyncTable, row_ids: list[int]) -> list[EntryView]:
+        """Fetch entry columns for the given row ids, preserving their order."""
+        if not row_ids:
+            return []
+        entries_df = await (
+            table.query()
+            .where(f"_rowid IN ({', '.join(str(r) for r in row_ids)})")
+            .select(ENTRY_COLUMNS)
+            .with_row_id()
+            .to_polars()
+        )
+        order = pl.DataFrame({
+            "_rowid": pl.Series(row_ids, dtype=pl.UInt64),
+            "_order": range(len(row_ids)),
+        })
+        entries_df = entries_df.join(order, on="_rowid").sort("_order")
         return self.df_to_entries(entries_df)
 
-    def df_to_entries(self, df: pl.DataFrame) -> list[Entry]:
+    def df_to_entries(self, df: pl.DataFrame) -> list[EntryView]:
         return [
-            Entry(
+            EntryView(
                 date=row["date"],
                 title=row["title"],
                 text=row["text"],
-                tags=row["tags"],
-                embedding=row["embedding"],
+                tags=row["tags"] or [],
                 entry_type=row.get("entry_type", "daily"),
             ) for row in df.iter_rows(named=True)
         ]
@@ -192,6 +663,9 @@ class AsyncLocalLanceDB:
 
             await threads_table.delete(f"thread_id = '{thread_id}'")
             await messages_table.delete(f"thread_id = '{thread_id}'")
+            if "thread_summaries" in await self.db.table_names():
+                summaries_table = await self.db.open_table("thread_summaries")
+                await summaries_table.delete(f"thread_id = '{thread_id}'")
             return True
         except Exception:
             return False
@@ -241,8 +715,7 @@ class AsyncLocalLanceDB:
         """Map (date, title) -> {text, tags, entry_type} for hydration."""
         try:
             table = await self.db.open_table("journal")
-            arrow_table = await table.to_arrow()
-            df = pl.from_arrow(arrow_table)
+            df = await table.query().select(ENTRY_COLUMNS).to_polars()
         except Exception as e:
             logger.warning(f"Failed to load entries for hydration: {e}")
             return {}
@@ -274,6 +747,7 @@ class AsyncLocalLanceDB:
                 e.setdefault("tags", [])
         return message
 
+    @traced("lancedb.thread_messages")
     async def get_thread_messages(self, thread_id: str) -> list[dict]:
         """Get all messages for a thread sorted by timestamp"""
         table = await self.db.open_table("messages")
@@ -286,6 +760,38 @@ class AsyncLocalLanceDB:
             messages = [self._hydrate_context_entries(m, lookup) for m in messages]
         return messages
 
+    @traced("lancedb.thread_history")
+    async def get_thread_history(self, thread_id: str) -> list[dict]:
+        """Role and content of a thread's messages, oldest first; skips metadata and hydration."""
+        table = await self.db.open_table("messages")
+        df = await (
+            table.query()
+            .where(f"thread_id = '{thread_id}'")
+            .select(["timestamp", "role", "content"])
+            .to_polars()
+        )
+        return df.sort("timestamp").select("role", "content").to_dicts()
+
+    async def get_thread_summary(self, thread_id: str) -> dict | None:
+        """A thread's rolling summary and the number of leading messages it covers."""
+        if "thread_summaries" not in await self.db.table_names():
+            return None
+        table = await self.db.open_table("thread_summaries")
+        df = await table.query().where(f"thread_id = '{thread_id}'").limit(1).to_polars()
+        return df.to_dicts()[0] if not df.is_empty() else None
+
+    async def save_thread_summary(self, thread_id: str, summary: str, message_count: int) -> None:
+        """Store the summary of a thread's first `message_count` messages, replacing the previous one."""
+        row = pa.Table.from_pylist([{
+            "thread_id": thread_id,
+            "summary": summary,
+            "message_count": message_count,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }], schema=THREAD_SUMMARIES_SCHEMA)
+        table = await self.db.create_table("thread_summaries", schema=THREAD_SUMMARIES_SCHEMA, exist_ok=True)
+        await table.merge_insert("thread_id").when_matched_update_all().when_not_matched_insert_all().execute(row)
+
+    @traced("lancedb.save_message")
     async def save_message(self, thread_id: str, role: str, content: str, metadata: dict | None = None) -> dict:
         """Save a message to a thread"""
         message_id = str(uuid.uuid4())
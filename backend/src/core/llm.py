@@ -2,17 +2,24 @@
 # shared LLM utilities used by both backend and pipeline
 import asyncio
 import random
+from collections import OrderedDict
 
 from google import genai
 
 from core.settings import settings
+from core.tracing import traced
+from core.metrics import EMBEDDING_CACHE
+from core.stub_models import stub_embedding
 
 
 google_client = genai.Client(api_key=settings.credentials.GOOGLE_API_KEY)
 
 
+@traced("embedding")
 async def get_embedding(text: str, max_retries: int = 5) -> list[float] | None:
     """Runs text transcription through Gemini embedding model, retrying on 429 errors."""
+    if settings.stub_models.enabled:
+        return await stub_embedding(text)
     for attempt in range(max_retries):
         try:
             response = await google_client.aio.models.embed_content(
@@ -36,3 +43,24 @@ async def get_embedding(text: str, max_retries: int = 5) -> list[float] | None:
             else:
                 raise
 
+
+
+_query_embeddings: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+
+
+async def get_query_embedding(text: str) -> list[float] | None:
+    """Embedding for a chat query, served from an in-memory LRU when the same query repeats."""
+    size = settings.cache.query_embeddings
+    model = "stub" if settings.stub_models.enabled else settings.models.embedding_model
+    key = (model, text)
+    if size and key in _query_embeddings:
+        _query_embeddings.move_to_end(key)
+        EMBEDDING_CACHE.inc("hit")
+        return _query_embeddings[key]
+    EMBEDDING_CACHE.inc("miss")
+    embedding = await get_embedding(text)
+    if size and embedding:
+        _query_embeddings[key] = embedding
+        while len(_query_embeddings) > size:
+            _query_embeddings.popitem(last=False)
+    return embedding
@@ -0,0 +1,160 @@
+# metrics.py
+# in-process Prometheus-style metrics, rendered in the text exposition format by /metrics
+import bisect
+import math
+
+# request and LLM latencies run from milliseconds (cache hits, LanceDB) to a minute (synthesis)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Point-in-time value per label set; scrape-time gauges are refreshed by /metrics."""
+    kind = "gauge"
+
+    def set(self, *label_values: str, value: float) -> None:
+        self.values[label_values] = value
+
+    def clear(self) -> None:
+        self.values.clear()
+
+
+class Histogram(_Metric):
+    """Bucketed observations per label set; observing is a bisect and three additions."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values: dict[tuple[str, ...], list] = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, *label_values: str, value: float) -> None:
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *label_values: str) -> int:
+        series = self.values.get(label_values)
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "journal_http_request_duration_seconds", "API request latency by route.", ("method", "route", "status")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "journal_stage_duration_seconds",
+    "Latency of traced request stages (LLM calls, embeddings, lancedb.* queries).", ("stage",)
+)
+LLM_CALLS = REGISTRY.counter("journal_llm_calls_total", "BAML function calls by outcome.", ("function", "status"))
+LLM_SECONDS = REGISTRY.histogram("journal_llm_call_duration_seconds", "BAML function call latency.", ("function",))
+LLM_TOKENS = REGISTRY.counter(
+    "journal_llm_tokens_total", "Tokens used by BAML function calls.", ("function", "direction")
+)
+EMBEDDING_CACHE = REGISTRY.counter(
+    "journal_query_embedding_cache_requests_total", "Query embedding cache lookups.", ("result",)
+)
+RESPONSE_CACHE = REGISTRY.counter(
+    "journal_response_cache_requests_total", "Chat response cache lookups.", ("result",)
+)
+TABLE_ROWS = REGISTRY.gauge("journal_lancedb_table_rows", "Rows per LanceDB table.", ("table",))
+TABLE_FRAGMENTS = REGISTRY.gauge("journal_lancedb_table_fragments", "Fragments per LanceDB table.", ("table",))
+INGESTION_FILES = REGISTRY.gauge(
+    "journal_ingestion_files", "Source files by pipeline stage and status.", ("kind", "stage", "status")
+)
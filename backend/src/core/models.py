@@ -20,6 +20,30 @@ class Entry(BaseModel):
     embedding: list[float] | None
     entry_type: str = "daily"
 
+@dataclass(slots=True)
+class EntryView:
+    """Lightweight read-path entry without the embedding vector.
+
+    Retrieval returns these instead of `Entry` so results skip pydantic validation
+    and never carry vectors; use `AsyncLocalLanceDB.get_entry_embedding` when one is needed.
+    """
+    date: str
+    title: str
+    text: str
+    tags: list[str]
+    entry_type: str = "daily"
+
+    def to_entry(self) -> Entry:
+        """Convert to the API model (embedding left empty)."""
+        return Entry(
+            date=self.date,
+            title=self.title,
+            text=self.text,
+            tags=self.tags,
+            embedding=None,
+            entry_type=self.entry_type,
+        )
+
 ### message metadata
 
 class MessageModelMetadata(BaseModel):
@@ -138,18 +162,25 @@ class UnprocessedDocs(BaseModel):
     to_transcribe: list[tuple[str, str]]
     to_embed: list[str]
 
+@dataclass(slots=True)
+class EmbeddedDoc:
+    """A freshly embedded source file: its document vector plus any passage chunks."""
+    path: str
+    embedding: list[float]
+    chunks: list[dict] = field(default_factory=list)
+
 ### agent loop state management
 
 @dataclass
 class AgentSearchState:
     """Accumulates entries and tracks search history during agent loop."""
-    accumulated_entries: dict[str, Entry] = field(default_factory=dict)  # keyed by date:title
+    accumulated_entries: dict[str, EntryView] = field(default_factory=dict)  # keyed by date:title
     search_trace: list[SearchIteration] = field(default_factory=list)
 
-    def _entry_id(self, entry: Entry) -> str:
+    def _entry_id(self, entry: EntryView) -> str:
         return f"{entry.date}:{entry.title}"
 
-    def add_entry(self, entry: Entry) -> bool:
+    def add_entry(self, entry: EntryView) -> bool:
         """Add an entry if not already present. Returns True if added."""
         entry_id = self._entry_id(entry)
         if entry_id not in self.accumulated_entries:
@@ -157,7 +188,7 @@ class AgentSearchState:
             return True
         return False
 
-    def add_entries(self, entries: list[Entry]) -> int:
+    def add_entries(self, entries: list[EntryView]) -> int:
         """Add multiple entries, returns count of new entries added."""
         added = 0
         for entry in entries:
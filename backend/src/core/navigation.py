@@ -5,13 +5,14 @@ import os
 import re
 import yaml
 import shutil
+import time
 import hashlib
 import logging
-from pathlib import Path
-from typing import Literal
+from typing import Iterator, Literal
 from collections import Counter
 
 from core.models import UnprocessedDocs
+from core.state import ManifestEntry, ProcessingStateStore
 
 page_template = """
 #day
@@ -19,10 +20,45 @@ page_template = """
 ![[{filename}]]
 """
 
-def crawl_journal_entries(root_dir:str="Daily Pages") -> UnprocessedDocs:
-    """ Recursively crawl through journal directories and identifies entries that need to be transcribed or embedded. """
+def extract_transcription(text: str) -> str:
+    """ Given a markdown file, extracts anything within the Transcription header """
+    match = re.search(r'### Transcription\s*(.*?)\s*(^###|\Z)', text, re.DOTALL | re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+def scan_files(root_dir: str) -> Iterator[os.DirEntry]:
+    """ Yield every file under `root_dir`; `os.scandir` entries carry cached type/stat info. """
+    stack = [root_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+def crawl_journal_entries(
+    root_dir: str = "Daily Pages",
+    state: ProcessingStateStore | None = None
+) -> UnprocessedDocs:
+    """ Recursively crawl through journal directories and identifies entries that need to be transcribed or embedded.
+
+    Status comes from the processing state store. Frontmatter is only read for
+    pages the store hasn't seen, to seed it from the legacy `transcription` and
+    `embedding` flags. A page needs embedding when the hash of its transcription
+    or the embedding model differs from what was recorded.
+
+    Markdown files are only opened when their size, mtime or inode differ from
+    the manifest kept in the state store; otherwise the manifest's transcription
+    hash is used.
+    """
+    start = time.perf_counter()
+    state = state or ProcessingStateStore()
+    manifest = state.load_manifest(root_dir)
+    manifest_updates: dict[str, ManifestEntry] = {}
+    md_stats: dict[str, os.stat_result] = {}
     to_transcribe = []
     to_embed = []
+    seen_md = set()
 
     def is_journal_entry(filename):
         """ Checks if the file is a journal entry, which are either PDF or image files. """
@@ -37,6 +73,34 @@ def crawl_journal_entries(root_dir:str="Daily Pages") -> UnprocessedDocs:
         date_part = filename.split()[0]
         return os.path.join(directory, f"{date_part}.md")
 
+    def read_transcription(md_path: str) -> str:
+        with open(md_path, 'r', encoding='utf-8') as f:
+            return extract_transcription(f.read())
+
+    def seed_from_frontmatter(md_path: str) -> None:
+        """ Record legacy frontmatter flags for a page the state store hasn't seen. """
+        frontmatter = check_frontmatter(md_path)
+        if frontmatter['transcription']:
+            state.record_transcription(md_path, model="unknown")
+        if frontmatter['embedding']:
+            transcription = read_transcription(md_path)
+            if transcription:
+                # embedded before hashes were tracked: adopt the current text as the baseline
+                state.record_embedding(md_path, compute_content_hash(transcription))
+
+    def transcription_hash(md_path: str) -> str | None:
+        """ Hash of the page's transcription, reading the file only when its stat info changed. """
+        st = md_stats[md_path]
+        known = manifest.get(md_path)
+        if known and known.matches(st):
+            return known.content_hash
+        if state.get(md_path) is None:
+            seed_from_frontmatter(md_path)
+        transcription = read_transcription(md_path)
+        content_hash = compute_content_hash(transcription) if transcription else None
+        manifest_updates[md_path] = ManifestEntry.from_stat(st, content_hash)
+        return content_hash
+
     def check_frontmatter(md_path: str) -> dict:
         """Returns a dict {transcription: bool, embedding: bool} based on YAML frontmatter."""
         result = {"transcription": False, "embedding": False}
@@ -63,32 +127,39 @@ def crawl_journal_entries(root_dir:str="Daily Pages") -> UnprocessedDocs:
             pass
         return result
 
-    def process_directory(current_dir):
-        """ Recursively process directories to find journal entries. """
-        for item in os.listdir(current_dir):
-            full_path = os.path.join(current_dir, item)
-
-            if os.path.isdir(full_path):
-                process_directory(full_path)
-            elif is_journal_entry(item):
-                md_path = get_markdown_path(full_path)
-                if not os.path.exists(md_path):
-                    with open(md_path, 'w') as f:
-                        f.write(page_template.format(filename=item))
-                    logging.info(f"Created new markdown file: {md_path}")
-
-                # only add note to list if transcription isn't true in frontmatter
-                frontmatter = check_frontmatter(md_path)
-                if not frontmatter['transcription']:
-                    to_transcribe.append((full_path, md_path))
-                    logging.info(f"Added {full_path} to transcribe list")
-                if not frontmatter['embedding']:
-                    to_embed.append(md_path)
-                    logging.info(f"Added {full_path} to embedding list")
+    def process_entry(entry: os.DirEntry) -> None:
+        md_path = get_markdown_path(entry.path)
+        if md_path not in md_stats:
+            with open(md_path, 'w') as f:
+                f.write(page_template.format(filename=entry.name))
+            md_stats[md_path] = os.stat(md_path)
+            logging.info(f"Created new markdown file: {md_path}")
+
+        content_hash = transcription_hash(md_path) if md_path not in seen_md else None
+        if not state.is_transcribed(md_path):
+            to_transcribe.append((entry.path, md_path))
+            logging.info(f"Added {entry.path} to transcribe list")
+        if content_hash and state.needs_embedding(md_path, content_hash):
+            to_embed.append(md_path)
+            logging.info(f"Added {entry.path} to embedding list")
+        seen_md.add(md_path)
 
     try:
-        process_directory(root_dir)
-        logging.info(f"Found {len(to_transcribe)} entries to transcribe and {len(to_embed)} entries to embed.")
+        scans = []
+        for entry in scan_files(root_dir):
+            if is_journal_entry(entry.name):
+                scans.append(entry)
+            elif entry.name.endswith(".md"):
+                md_stats[entry.path] = entry.stat()
+        for entry in scans:
+            process_entry(entry)
+
+        state.update_manifest(manifest_updates)
+        state.remove_from_manifest([p for p in manifest if p not in md_stats])
+        logging.info(
+            f"Found {len(to_transcribe)} entries to transcribe and {len(to_embed)} entries to embed "
+            f"({len(manifest_updates)} pages read, {(time.perf_counter() - start) * 1000:.0f} ms)."
+        )
     except Exception as e:
         logging.error(f"Error: {str(e)}")
         raise
@@ -131,59 +202,115 @@ def compute_content_hash(body: str) -> str:
     """SHA-256 hash of content body (frontmatter excluded)."""
     return hashlib.sha256(body.encode("utf-8")).hexdigest()
 
-def crawl_evergreen_entries(root_dir: str) -> list[str]:
-    """Find evergreen .md files that need (re-)embedding based on content hash."""
+def crawl_evergreen_entries(
+    root_dir: str,
+    state: ProcessingStateStore | None = None
+) -> list[str]:
+    """Find evergreen .md files that need (re-)embedding based on content hash.
+
+    Hashes are compared against the processing state store; a legacy
+    `content_hash` frontmatter field is only consulted to seed files the store
+    hasn't seen. Files whose stat info matches the manifest are not re-read.
+    """
+    state = state or ProcessingStateStore()
     to_embed = []
 
     if not os.path.exists(root_dir):
         logging.info(f"Evergreen directory not found: {root_dir}")
         return to_embed
 
-    for dirpath, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            if not filename.endswith(".md"):
-                continue
-            full_path = os.path.join(dirpath, filename)
+    manifest = state.load_manifest(root_dir)
+    manifest_updates: dict[str, ManifestEntry] = {}
+    seen = set()
+
+    for entry in scan_files(root_dir):
+        if not entry.name.endswith(".md"):
+            continue
+        full_path = entry.path
+        seen.add(full_path)
+        st = entry.stat()
 
+        known = manifest.get(full_path)
+        if known and known.matches(st):
+            new_hash = known.content_hash
+        else:
             with open(full_path, 'r', encoding='utf-8') as f:
                 content = f.read()
-
             body = strip_frontmatter(content)
-            if not body.strip():
-                logging.info(f"Skipping empty evergreen file: {full_path}")
-                continue
+            new_hash = compute_content_hash(body) if body.strip() else None
+            if new_hash and state.get(full_path) is None and _parse_frontmatter(content).get("content_hash") == new_hash:
+                state.record_embedding(full_path, new_hash, kind="evergreen")
+            manifest_updates[full_path] = ManifestEntry.from_stat(st, new_hash)
 
-            new_hash = compute_content_hash(body)
-            frontmatter = _parse_frontmatter(content)
+        if new_hash is None:
+            logging.info(f"Skipping empty evergreen file: {full_path}")
+            continue
 
-            if frontmatter.get("content_hash") != new_hash:
-                to_embed.append(full_path)
-                logging.info(f"Evergreen file needs embedding: {full_path}")
+        if state.needs_embedding(full_path, new_hash):
+            to_embed.append(full_path)
+            logging.info(f"Evergreen file needs embedding: {full_path}")
 
+    state.update_manifest(manifest_updates)
+    state.remove_from_manifest([p for p in manifest if p not in seen])
     logging.info(f"Found {len(to_embed)} evergreen entries to embed.")
     return to_embed
 
+TAG_PATTERN = re.compile(r"#([\w/-]+)")
+
+def index_tags(root_dir: str, state: ProcessingStateStore | None = None) -> dict[str, int]:
+    """ Bring the tag index for `root_dir` up to date and return its tag frequencies.
+
+    Only markdown files whose size, mtime or inode changed since they were last
+    indexed are re-read; deleted files drop out of the index.
+    """
+    start = time.perf_counter()
+    state = state or ProcessingStateStore()
+    if not os.path.isdir(root_dir):
+        return {}
+    manifest = state.load_manifest(root_dir, table="tag_manifest")
+    manifest_updates: dict[str, ManifestEntry] = {}
+    file_tags: dict[str, dict[str, int]] = {}
+    seen = set()
+
+    for entry in scan_files(root_dir):
+        if not entry.name.endswith(".md"):
+            continue
+        seen.add(entry.path)
+        st = entry.stat()
+        known = manifest.get(entry.path)
+        if known and known.matches(st):
+            continue
+        with open(entry.path, "r", encoding="utf-8") as f:
+            file_tags[entry.path] = Counter(TAG_PATTERN.findall(f.read()))
+        manifest_updates[entry.path] = ManifestEntry.from_stat(st, None)
+
+    removed = [p for p in manifest if p not in seen]
+    state.set_file_tags(file_tags)
+    state.update_manifest(manifest_updates, table="tag_manifest")
+    state.remove_file_tags(removed)
+    state.remove_from_manifest(removed, table="tag_manifest")
+    logging.info(
+        f"Tag index updated: {len(file_tags)} files read, {len(removed)} removed "
+        f"({(time.perf_counter() - start) * 1000:.0f} ms)."
+    )
+    return state.tag_frequencies(root_dir)
+
 def extract_tags(
     root_dir: str,
-    output_format: Literal["string", "frequency"] = "string"
+    output_format: Literal["string", "frequency"] = "string",
+    state: ProcessingStateStore | None = None
 ) -> str | dict[str, int]:
-    """ Extracts all tags from an Obsidian vault.
+    """ Extracts all tags from an Obsidian vault, via the incremental tag index.
 
     Args:
         root_dir: Path to the vault directory
         output_format: "string" returns space-separated unique tags (default),
                       "frequency" returns dict with tag counts
+        state: Processing state store holding the index (defaults to the pipeline's)
     """
-    vault_path = Path(root_dir)
-    tag_pattern = re.compile(r"#([\w/-]+)")
-
-    tag_counter: Counter[str] = Counter()
-    for file in vault_path.rglob("*.md"):
-        with open(file, "r", encoding="utf-8") as f:
-            content = f.read()
-            tag_counter.update(tag_pattern.findall(content))
+    frequencies = index_tags(root_dir, state)
 
     if output_format == "frequency":
-        return dict(tag_counter.most_common())
+        return frequencies
 
-    return " ".join(sorted(tag_counter.keys()))
+    return " ".join(sorted(frequencies))
@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
@@ -11,6 +12,8 @@ class Credentials(BaseModel):
 
 class FileStorageSettings(BaseModel):
     chat_storage_path: str = "/home/neurostack/code/journal_ocr/data/chats.json"
+    lance_storage_path: str = "lance.journal-app"
+    state_storage_path: str = "/home/neurostack/code/journal_ocr/data/pipeline_state.db"
     embedding_storage_path: str = "/mnt/c/Users/Administrator/OneDrive/Journal/embeddings.jsonl"
     journal_storage_path: str = "/mnt/c/Users/Administrator/OneDrive/Journal/Daily Pages"
     evergreen_storage_path: str = "/mnt/c/Users/Administrator/OneDrive/Journal/Evergreen"
@@ -20,6 +23,61 @@ class ModelSettings(BaseModel):
     embedding_model: str = "gemini-embedding-001" # Google models only
     transcription_model: str = "gpt-5" # OpenAI models only
 
+class ImageSettings(BaseModel):
+    """Preprocessing applied to scans before they're uploaded for transcription."""
+    dpi: int = 150 # PDF rasterization resolution
+    max_long_edge: int | None = 2048 # the vision API downsamples anything larger
+    grayscale: bool = True
+    format: Literal["PNG", "JPEG", "WEBP"] = "JPEG"
+    quality: int = 85 # JPEG/WEBP only
+
+class PipelineSettings(BaseModel):
+    transcription_concurrency: int = 5
+    embedding_concurrency: int = 5
+    queue_size: int = 10 # bounded hand-off between stages (backpressure)
+    encoding_workers: int = max(1, (os.cpu_count() or 2) - 1) # processes for PDF rasterization/image encoding
+    page_concurrency: int = 2 # pages of one document rasterized/transcribed at once
+    transcription_retries: int = 4 # attempts per page on rate limits, timeouts and 5xx errors
+    retry_base_delay_seconds: float = 2.0 # doubled after each failed attempt, plus up to 100% jitter
+    tag_hint_common_limit: int = 150 # most frequent tags, shared by every page's prompt prefix
+    tag_hint_page_limit: int = 40 # extra tags from entries near the page's date and in its folder
+    tag_hint_window_days: int = 7
+
+class WatchSettings(BaseModel):
+    mode: Literal["auto", "events", "polling"] = "auto" # auto polls on WSL /mnt drives
+    debounce_seconds: float = 2.0
+    poll_interval_seconds: float = 10.0
+
+class HistorySettings(BaseModel):
+    recent_messages: int = 8 # thread messages sent verbatim with each prompt; older ones are summarized
+    summary_batch: int = 6 # messages that leave the verbatim window before the summary is refreshed
+
+class VectorIndexSettings(BaseModel):
+    flat_max_rows: int = 10_000 # exact search below this; an ANN index is slower and less accurate on small tables
+    hnsw_max_rows: int = 1_000_000 # IVF-HNSW-SQ up to here, compressed IVF-PQ above
+    nprobes: int = 20 # IVF partitions searched per query
+    refine_factor: int | None = None # re-rank refine_factor * k IVF-PQ candidates on full vectors
+    # benchmarks/eval_retrieval.py sweeps these against recall for the current vault
+
+class CacheSettings(BaseModel):
+    query_embeddings: int = 512 # LRU entries of chat query -> embedding; 0 disables
+    responses: bool = False # reuse chat responses for repeated questions (same thread state and journal version)
+    response_entries: int = 256 # LRU entries of the response cache
+    response_ttl_seconds: float = 900.0
+
+class TracingSettings(BaseModel):
+    debug_header: bool = False # always send Server-Timing; otherwise only when the request sets X-Debug-Timings
+    otel: bool = False # mirror spans to OpenTelemetry (optional dependency)
+    otel_spans_path: str = "logs/otel_spans.jsonl" # local exporter used when the OpenTelemetry SDK is installed
+
+class StubModelSettings(BaseModel):
+    enabled: bool = os.getenv("STUB_MODELS", "") == "1" # swap Gemini embeddings and BAML calls for core.stub_models
+    embedding_dim: int = 3072 # match the real embedding model so stub vectors fit existing tables
+    embedding_latency_ms: float = 0.0
+    latency_ms: float = 300.0 # per call, before the first token
+    tokens_per_second: float = 50.0 # generation speed of free-text responses; 0 returns them at once
+    response_tokens: int = 200 # words in DirectChat/AgentSynthesizer responses
+
 class TestSettings(BaseModel):
     test_data_source_dir: str = ""
     test_data_dir_path: str = ""
@@ -31,6 +89,14 @@ class Settings(BaseModel):
     credentials: Credentials = Credentials()
     file_storage: FileStorageSettings = FileStorageSettings()
     models: ModelSettings = ModelSettings()
+    images: ImageSettings = ImageSettings()
+    pipeline: PipelineSettings = PipelineSettings()
+    watch: WatchSettings = WatchSettings()
+    tracing: TracingSettings = TracingSettings()
+    history: HistorySettings = HistorySettings()
+    vector_index: VectorIndexSettings = VectorIndexSettings()
+    cache: CacheSettings = CacheSettings()
+    stub_models: StubModelSettings = StubModelSettings()
     test_settings: TestSettings = TestSettings()
 
 settings = Settings()
@@ -0,0 +1,277 @@
+# state.py
+# app-owned pipeline bookkeeping, kept out of the journal files
+import os
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+FILE_STATE_COLUMNS = {
+    "kind": "TEXT",
+    "transcription_status": "TEXT",
+    "transcription_model": "TEXT",
+    "transcribed_at": "TEXT",
+    "content_hash": "TEXT",
+    "embedding_status": "TEXT",
+    "embedding_model": "TEXT",
+    "embedded_at": "TEXT",
+    "last_error": "TEXT",
+    "updated_at": "TEXT",
+}
+
+# file_manifest backs the crawlers; tag_manifest backs the tag index, which reads every .md file
+MANIFEST_TABLES = ("file_manifest", "tag_manifest")
+
+
+class ManifestEntry(NamedTuple):
+    """Stat fingerprint of a file plus the hash of its content when last read."""
+    size: int
+    mtime_ns: int
+    inode: int
+    content_hash: str | None
+
+    @classmethod
+    def from_stat(cls, st: os.stat_result, content_hash: str | None) -> "ManifestEntry":
+        return cls(st.st_size, st.st_mtime_ns, st.st_ino, content_hash)
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.size, self.mtime_ns, self.inode) == (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class ProcessingStateStore:
+    """SQLite record of what the pipeline has done to each source file.
+
+    Keyed by markdown path. Replaces the `transcription`/`embedding`/`content_hash`
+    frontmatter flags, so processing never rewrites journal files just to record
+    progress. `content_hash` is the hash of the text that was last embedded; a
+    file needs re-embedding when that hash or the embedding model changes.
+
+    The `file_manifest` table holds a stat fingerprint per crawled file so the
+    crawlers only open files whose size, mtime or inode changed since the last run.
+    The tag index keeps its own manifest (`tag_manifest`) plus per-file tag counts
+    (`file_tags`), so vault-wide tag frequencies are a query instead of a rescan.
+
+    The `page_transcriptions` table caches each transcribed page keyed by the hash
+    of the uploaded image and the model, so a rerun after a failure or interruption
+    only pays for the pages that never completed.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path or settings.file_storage.state_storage_path
+        state_dir = os.path.dirname(self.path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        # used from one thread at a time, but not always the one that opened it (e.g. the API's event loop)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("CREATE TABLE IF NOT EXISTS file_state (path TEXT PRIMARY KEY)")
+        for table in MANIFEST_TABLES:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, content_hash TEXT)"
+            )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_tags "
+            "(path TEXT, tag TEXT, count INTEGER, PRIMARY KEY (path, tag))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_transcriptions "
+            "(image_hash TEXT, model TEXT, transcription TEXT, created_at TEXT, "
+            "PRIMARY KEY (image_hash, model))"
+        )
+        self._ensure_columns()
+
+    def _ensure_columns(self) -> None:
+        """Add columns missing from state databases created by older versions."""
+        existing = {row["name"] for row in self.conn.execute("PRAGMA table_info(file_state)")}
+        for column, column_type in FILE_STATE_COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE file_state ADD COLUMN {column} {column_type}")
+        if "embedding_status" not in existing:
+            # rows written before statuses were tracked only ever recorded completed embeddings
+            self.conn.execute(
+                "UPDATE file_state SET embedding_status = 'done' WHERE content_hash IS NOT NULL"
+            )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _upsert(self, path: str, **fields) -> None:
+        fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+        columns = ", ".join(["path", *fields])
+        placeholders = ", ".join("?" for _ in range(len(fields) + 1))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in fields)
+        self.conn.execute(
+            f"INSERT INTO file_state ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(path) DO UPDATE SET {updates}",
+            (path, *fields.values()),
+        )
+        self.conn.commit()
+
+    def get(self, path: str) -> dict | None:
+        """Full state row for `path`, if the pipeline has seen it."""
+        row = self.conn.execute("SELECT * FROM file_state WHERE path = ?", (path,)).fetchone()
+        return dict(row) if row else None
+
+    def is_transcribed(self, path: str) -> bool:
+        row = self.get(path)
+        return bool(row) and row["transcription_status"] == "done"
+
+    def get_content_hash(self, path: str) -> str | None:
+        """Hash of the content last embedded for `path`, if any."""
+        row = self.get(path)
+        return row["content_hash"] if row else None
+
+    def needs_embedding(self, path: str, content_hash: str) -> bool:
+        """True when `path` was never embedded, its content changed, or the embedding model changed."""
+        row = self.get(path)
+        if not row or row["embedding_status"] != "done":
+            return True
+        return (
+            row["content_hash"] != content_hash
+            or row["embedding_model"] != settings.models.embedding_model
+        )
+
+    def record_transcription(self, path: str, model: str | None = None, kind: str = "daily") -> None:
+        self._upsert(
+            path,
+            kind=kind,
+            transcription_status="done",
+            transcription_model=model or settings.models.transcription_model,
+            transcribed_at=datetime.now(timezone.utc).isoformat(),
+            last_error=None,
+        )
+
+    def record_embedding(
+        self,
+        path: str,
+        content_hash: str,
+        model: str | None = None,
+        kind: str = "daily"
+    ) -> None:
+        """Record that `path` was embedded with content hashing to `content_hash`."""
+        self._upsert(
+            path,
+            kind=kind,
+            content_hash=content_hash,
+            embedding_status="done",
+            embedding_model=model or settings.models.embedding_model,
+            embedded_at=datetime.now(timezone.utc).isoformat(),
+            last_error=None,
+        )
+
+    def record_failure(self, path: str, stage: str, error: str) -> None:
+        """Mark a transcription/embedding attempt as failed; it is retried on the next run."""
+        self._upsert(path, **{f"{stage}_status": "failed", "last_error": error})
+
+    def status_counts(self) -> list[tuple[str, str, str, int]]:
+        """(kind, stage, status, file count) for each stage, for ingestion progress metrics."""
+        counts = []
+        for stage in ("transcription", "embedding"):
+            rows = self.conn.execute(
+                f"SELECT kind, {stage}_status AS status, COUNT(*) AS n FROM file_state "
+                f"WHERE {stage}_status IS NOT NULL GROUP BY kind, {stage}_status"
+            )
+            counts.extend((row["kind"] or "unknown", stage, row["status"], row["n"]) for row in rows)
+        return counts
+
+    def paths(self, kind: str | None = None) -> list[str]:
+        if kind:
+            rows = self.conn.execute("SELECT path FROM file_state WHERE kind = ?", (kind,))
+        else:
+            rows = self.conn.execute("SELECT path FROM file_state")
+        return [row["path"] for row in rows]
+
+    ### file manifest
+
+    def load_manifest(self, root_dir: str | None = None, table: str = "file_manifest") -> dict[str, ManifestEntry]:
+        """Manifest entries keyed by path, optionally limited to files under `root_dir`."""
+        assert table in MANIFEST_TABLES
+        query = f"SELECT path, size, mtime_ns, inode, content_hash FROM {table}"
+        query, params = self._under(query, root_dir)
+        return {row["path"]: ManifestEntry(*tuple(row)[1:]) for row in self.conn.execute(query, params)}
+
+    def update_manifest(self, entries: dict[str, ManifestEntry], table: str = "file_manifest") -> None:
+        """Upsert manifest entries in a single transaction."""
+        assert table in MANIFEST_TABLES
+        if not entries:
+            return
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (path, size, mtime_ns, inode, content_hash) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(path, *entry) for path, entry in entries.items()],
+        )
+        self.conn.commit()
+
+    def remove_from_manifest(self, paths: list[str], table: str = "file_manifest") -> None:
+        assert table in MANIFEST_TABLES
+        if not paths:
+            return
+        self.conn.executemany(f"DELETE FROM {table} WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
+
+    @staticmethod
+    def _under(query: str, root_dir: str | None) -> tuple[str, tuple]:
+        """Restrict a path-keyed query to files under `root_dir`."""
+        if not root_dir:
+            return query, ()
+        prefix = os.path.join(root_dir, "")
+        return query + " WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+
+    ### tag index
+
+    def set_file_tags(self, tags: dict[str, dict[str, int]]) -> None:
+        """Replace the tag counts of each file in `tags` (path -> tag -> count) in one transaction."""
+        if not tags:
+            return
+        self.conn.executemany("DELETE FROM file_tags WHERE path = ?", [(p,) for p in tags])
+        self.conn.executemany(
+            "INSERT INTO file_tags (path, tag, count) VALUES (?, ?, ?)",
+            [(path, tag, count) for path, counts in tags.items() for tag, count in counts.items()],
+        )
+        self.conn.commit()
+
+    def remove_file_tags(self, paths: list[str]) -> None:
+        if not paths:
+            return
+        self.conn.executemany("DELETE FROM file_tags WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
+
+    def file_tags(self, root_dir: str | None = None) -> dict[str, dict[str, int]]:
+        """Indexed tag counts per file (path -> tag -> count)."""
+        query, params = self._under("SELECT path, tag, count FROM file_tags", root_dir)
+        tags: dict[str, dict[str, int]] = {}
+        for row in self.conn.execute(query, params):
+            tags.setdefault(row["path"], {})[row["tag"]] = row["count"]
+        return tags
+
+    def tag_frequencies(self, root_dir: str | None = None, limit: int | None = None) -> dict[str, int]:
+        """Tag -> occurrence count across indexed files, most frequent first."""
+        query, params = self._under("SELECT tag, SUM(count) AS total FROM file_tags", root_dir)
+        query += " GROUP BY tag ORDER BY total DESC, tag"
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (*params, limit)
+        return {row["tag"]: row["total"] for row in self.conn.execute(query, params)}
+
+    ### page transcription cache
+
+    def get_page_transcription(self, image_hash: str, model: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT transcription FROM page_transcriptions WHERE image_hash = ? AND model = ?",
+            (image_hash, model),
+        ).fetchone()
+        return row["transcription"] if row else None
+
+    def record_page_transcription(self, image_hash: str, model: str, transcription: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO page_transcriptions (image_hash, model, transcription, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (image_hash, model, transcription, datetime.now(timezone.utc).isoformat()),
+        )
+        self.conn.commit()
@@ -0,0 +1,136 @@
+# stub_models.py
+# offline stand-ins for the embedding model and the BAML client, enabled with
+# `settings.stub_models.enabled` (or STUB_MODELS=1) to load-test and profile the
+# chat flows without calling any provider
+import asyncio
+import hashlib
+import math
+import random
+from typing import AsyncIterator
+
+from core.baml_client.types import SearchOptions, SearchToolCall, SearchToolType
+from core.settings import settings
+
+WORDS = (
+    "the week felt long but the morning run helped and I wrote down a few notes about the "
+    "project before dinner with family then read for an hour and went to bed early"
+).split()
+
+
+def _seed(*parts: str) -> int:
+    return int.from_bytes(hashlib.sha256("\x1f".join(parts).encode()).digest()[:8], "big")
+
+
+async def stub_embedding(text: str) -> list[float]:
+    """Deterministic unit vector for `text`: equal texts embed identically, different texts roughly orthogonally."""
+    options = settings.stub_models
+    if options.embedding_latency_ms:
+        await asyncio.sleep(options.embedding_latency_ms / 1000)
+    rng = random.Random(_seed(text))
+    vector = [rng.gauss(0, 1) for _ in range(options.embedding_dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class StubStream:
+    """Mimics a BAML stream: iterate for growing partial text, or await the final response."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._final: str | None = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        options = settings.stub_models
+        await asyncio.sleep(options.latency_ms / 1000)
+        tokens = self.text.split(" ")
+        delay = 1 / options.tokens_per_second if options.tokens_per_second else 0
+        for i in range(1, len(tokens) + 1):
+            await asyncio.sleep(delay)
+            yield " ".join(tokens[:i])
+        self._final = self.text
+
+    async def get_final_response(self) -> str:
+        if self._final is None:
+            async for _ in self:
+                pass
+        return self.text
+
+
+class _StubStreamClient:
+    def __init__(self, client: "StubBamlClient"):
+        self._client = client
+
+    def DirectChat(self, *args, baml_options: dict | None = None) -> StubStream:
+        return StubStream(self._client._text("DirectChat", *args))
+
+    def AgentSynthesizer(self, *args, baml_options: dict | None = None) -> StubStream:
+        return StubStream(self._client._text("AgentSynthesizer", *args))
+
+
+class StubBamlClient:
+    """Drop-in for the generated `b` client covering the functions the chat flows call.
+
+    Every call waits `latency_ms` (time to first token); free-text functions then
+    "generate" `response_tokens` words at `tokens_per_second`. Outputs depend
+    only on the inputs, so runs are reproducible.
+    """
+
+    def __init__(self):
+        self.stream = _StubStreamClient(self)
+
+    @staticmethod
+    async def _wait(tokens: int = 0) -> None:
+        options = settings.stub_models
+        delay = options.latency_ms / 1000
+        if tokens and options.tokens_per_second:
+            delay += tokens / options.tokens_per_second
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def _text(function: str, *args) -> str:
+        rng = random.Random(_seed(function, *map(str, args)))
+        return " ".join(rng.choice(WORDS) for _ in range(settings.stub_models.response_tokens))
+
+    async def IntentClassifier(self, query: str, baml_options: dict | None = None) -> SearchOptions:
+        await self._wait()
+        options = list(SearchOptions)
+        return options[_seed(query) % len(options)]
+
+    async def PersonalityClassifier(self, query: str, personality_options: str, baml_options: dict | None = None) -> str:
+        await self._wait()
+        return "default"
+
+    async def GenerateThreadTitle(self, messages: str, baml_options: dict | None = None) -> str:
+        await self._wait(5)
+        return "Stub thread"
+
+    async def SummarizeThread(self, previous_summary: str, messages: str, baml_options: dict | None = None) -> str:
+        await self._wait(settings.stub_models.response_tokens // 4)
+        return self._text("SummarizeThread", previous_summary, messages)
+
+    async def AgentToolSelector(
+        self,
+        user_query: str,
+        accumulated_context: str,
+        search_trace: str,
+        iteration: int,
+        max_iterations: int,
+        current_date: str,
+        baml_options: dict | None = None
+    ) -> list[SearchToolCall]:
+        await self._wait()
+        if iteration > 1:
+            return [SearchToolCall(tool=SearchToolType.DONE, reasoning="Stub: enough context.")]
+        return [
+            SearchToolCall(tool=SearchToolType.VECTOR_SEARCH, reasoning="Stub: semantic search.", query=user_query),
+            SearchToolCall(tool=SearchToolType.HYBRID_SEARCH, reasoning="Stub: keyword search.", query=user_query),
+        ]
+
+    async def DirectChat(self, *args, baml_options: dict | None = None) -> str:
+        return await self.stream.DirectChat(*args).get_final_response()
+
+    async def AgentSynthesizer(self, *args, baml_options: dict | None = None) -> str:
+        return await self.stream.AgentSynthesizer(*args).get_final_response()
+
+
+stub_baml_client = StubBamlClient()
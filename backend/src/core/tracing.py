@@ -0,0 +1,151 @@
+# tracing.py
+# lightweight per-request stage timings, optionally mirrored to OpenTelemetry
+import os
+import time
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from core.settings import settings
+from core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[str | None] = ContextVar("current_span", default=None)
+_otel_tracer = None
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    parent: str | None
+    start_ms: float  # offset from the start of the trace
+    duration_ms: float = 0.0
+    attributes: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Trace:
+    """Spans recorded while handling one request."""
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    spans: list[Span] = field(default_factory=list)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def stages(self) -> dict[str, float]:
+        """Total milliseconds per span name, in the order stages first started.
+
+        Concurrent spans with the same name (parallel tool calls) are summed, so
+        totals can exceed the request's wall time.
+        """
+        totals: dict[str, float] = {}
+        for span in sorted(self.spans, key=lambda s: s.start_ms):
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return {name: round(ms, 1) for name, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value, which browser dev tools show per request."""
+        stages = {**self.stages(), "total": round(self.elapsed_ms(), 1)}
+        return ", ".join(f"{name};dur={ms}" for name, ms in stages.items())
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Collect spans opened in this context (and tasks started from it) into a new trace."""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Time a stage of the current trace; a no-op outside a trace unless OpenTelemetry is on."""
+    trace = _current_trace.get()
+    if trace is None and _otel_tracer is None:
+        yield
+        return
+    record = Span(name, _current_span.get(), 0.0, attributes=attributes)
+    if trace is not None:
+        record.start_ms = trace.elapsed_ms()
+        trace.spans.append(record)
+    token = _current_span.set(name)
+    start = time.perf_counter()
+    try:
+        if _otel_tracer is not None:
+            with _otel_tracer.start_as_current_span(name, attributes=attributes):
+                yield
+        else:
+            yield
+    finally:
+        record.duration_ms = (time.perf_counter() - start) * 1000
+        _current_span.reset(token)
+        STAGE_SECONDS.observe(name, value=record.duration_ms / 1000)
+
+
+def traced(name: str):
+    """Decorator recording each call of an async function as a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def log_trace(trace: Trace, **fields) -> None:
+    """Write a finished trace's stage breakdown to the structured app log."""
+    logging.getLogger("journal_app").info(f"{trace.name}_completed", extra={
+        "metrics": {
+            **fields,
+            "elapsed_time_ms": round(trace.elapsed_ms(), 1),
+            "stages_ms": trace.stages(),
+        }
+    })
+
+
+def configure_otel() -> None:
+    """Mirror spans to OpenTelemetry when `settings.tracing.otel` is on.
+
+    With only the OpenTelemetry API installed, spans go to whatever tracer
+    provider the host process configured. With the SDK installed and no provider
+    configured, spans are exported as JSON lines to `settings.tracing.otel_spans_path`.
+    """
+    global _otel_tracer
+    if not settings.tracing.otel:
+        return
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        logger.warning("tracing.otel is set but opentelemetry is not installed")
+        return
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        pass
+    else:
+        path = settings.tracing.otel_spans_path
+        if path and not isinstance(otel_trace.get_tracer_provider(), TracerProvider):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            exporter = ConsoleSpanExporter(
+                out=open(path, "a"),
+                formatter=lambda s: s.to_json(indent=None) + "\n",
+            )
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+            otel_trace.set_tracer_provider(provider)
+    _otel_tracer = otel_trace.get_tracer("journal_app")
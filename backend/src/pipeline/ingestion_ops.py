@@ -2,29 +2,135 @@
 # functions for handling batch ingestion
 
 import os
+import re
 import json
 import time
 import asyncio
 import logging
+from functools import lru_cache
+
+import tiktoken
 
 from core.settings import settings
-from core.ingest import extract_transcription
+from core.ingest import extract_transcription, chunk_embeddings_path, compact_chunk_embeddings
 from core.navigation import strip_frontmatter, compute_content_hash
 from core.llm import get_embedding
+from core.models import EmbeddedDoc, UnprocessedDocs
+from core.state import ProcessingStateStore
 from core.log_config import setup_logging
-from pipeline.transcription import (
-    encode_entry, transcribe_images, insert_transcription,
-    update_frontmatter_field
-)
+from pipeline.transcription import transcribe_entry, insert_transcription
+from pipeline.tag_hints import TagHints
 
 logger = setup_logging()
 
+CHUNK_MAX_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$", re.MULTILINE)
+
 def _append_embedding(embeddings_path: str, file_path: str, embedding: list[float]) -> None:
     entry = {"path": file_path, "embedding": embedding}
     with open(embeddings_path, 'a') as f:
         f.write(json.dumps(entry) + "\n")
 
-async def transcribe_docs(files: list[tuple[str, str]], tags: str) -> None:
+def _append_chunk_embeddings(
+    chunks_path: str,
+    file_path: str,
+    chunks: list[dict],
+    embeddings: list[list[float] | None]
+) -> None:
+    with open(chunks_path, 'a') as f:
+        for chunk, embedding in zip(chunks, embeddings):
+            f.write(json.dumps({"path": file_path, **chunk, "embedding": embedding}) + "\n")
+
+### chunking
+
+@lru_cache(maxsize=1)
+def _get_encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("cl100k_base")
+
+def _split_sections(text: str) -> list[tuple[str, str]]:
+    """Split markdown into (heading, section) pairs at heading lines."""
+    matches = list(_HEADING_RE.finditer(text))
+    sections = []
+
+    preamble = text[:matches[0].start()] if matches else text
+    if preamble.strip():
+        sections.append(("", preamble.strip()))
+
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        section = text[match.start():end].strip()
+        if section:
+            sections.append((match.group(1).strip(), section))
+    return sections
+
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+) -> list[dict]:
+    """ Split text into passages of at most `max_tokens`.
+
+    Splits at markdown headings first, packing consecutive small sections
+    together; sections longer than `max_tokens` are cut into overlapping
+    token windows. Returns dicts with chunk_index, heading and text.
+    """
+    encoding = _get_encoding()
+    chunks: list[dict] = []
+    buffer: list[str] = []
+    buffer_heading = ""
+    buffer_tokens = 0
+
+    for heading, section in _split_sections(text):
+        tokens = encoding.encode(section)
+
+        if buffer and (len(tokens) > max_tokens or buffer_tokens + len(tokens) > max_tokens):
+            chunks.append({"heading": buffer_heading, "text": "\n\n".join(buffer)})
+            buffer, buffer_tokens = [], 0
+
+        if len(tokens) > max_tokens:
+            step = max_tokens - overlap_tokens
+            for start in range(0, len(tokens), step):
+                chunks.append({"heading": heading, "text": encoding.decode(tokens[start:start + max_tokens])})
+                if start + max_tokens >= len(tokens):
+                    break
+            continue
+
+        if not buffer:
+            buffer_heading = heading
+        buffer.append(section)
+        buffer_tokens += len(tokens)
+
+    if buffer:
+        chunks.append({"heading": buffer_heading, "text": "\n\n".join(buffer)})
+
+    return [{"chunk_index": i, **chunk} for i, chunk in enumerate(chunks)]
+
+async def _embed_chunks(text: str, file: str, embeddings_path: str) -> list[dict]:
+    """Embed passages of documents longer than one chunk; short documents use their document embedding.
+
+    Every call starts a new chunk set for `file`. Short documents get a single
+    row without an embedding, which replaces any passages from a longer version.
+    """
+    chunks = chunk_text(text)
+    if len(chunks) <= 1:
+        _append_chunk_embeddings(
+            chunk_embeddings_path(embeddings_path), file,
+            [{"chunk_index": 0, "heading": "", "text": text}], [None],
+        )
+        return []
+    embeddings = await asyncio.gather(*[get_embedding(chunk["text"]) for chunk in chunks])
+    if any(e is None for e in embeddings):
+        raise ValueError(f"No chunk embedding created for {file}")
+    _append_chunk_embeddings(chunk_embeddings_path(embeddings_path), file, chunks, embeddings)
+    return [{**chunk, "embedding": embedding} for chunk, embedding in zip(chunks, embeddings)]
+
+async def transcribe_docs(
+    files: list[tuple[str, str]],
+    tags: TagHints,
+    state: ProcessingStateStore | None = None
+) -> None:
     logger.info("transcription_beginning", extra={
         "metrics": {
             "input_doc_count": len(files)
@@ -32,17 +138,30 @@ async def transcribe_docs(files: list[tuple[str, str]], tags: str) -> None:
     })
     start = time.perf_counter()
 
-    semaphore = asyncio.Semaphore(5)
-    await asyncio.gather(*[transcribe_single_doc(semaphore, f, tags) for f in files])
+    semaphore = asyncio.Semaphore(settings.pipeline.transcription_concurrency)
+    state = state or ProcessingStateStore()
+    results = await asyncio.gather(
+        *[transcribe_single_doc(semaphore, f, tags, state) for f in files],
+        return_exceptions=True
+    )
+    # failures are recorded in the state store and picked up again on the next run
+    failed = [(f, r) for f, r in zip(files, results) if isinstance(r, Exception)]
+    for f, error in failed:
+        logger.error(f"transcription failed for {f[0]}: {error}")
 
     logger.info("transcription_completed", extra={
         "metrics": {
             "input_doc_count": len(files),
+            "failed_doc_count": len(failed),
             "elapsed_time_ms": (time.perf_counter() - start) * 1000
         }
     })
 
-async def embed_docs(files: list[str], embeddings_path: str | None = None) -> None:
+async def embed_docs(
+    files: list[str],
+    embeddings_path: str | None = None,
+    state: ProcessingStateStore | None = None
+) -> list[EmbeddedDoc]:
     logger.info("embedding_beginning", extra={
         "metrics": {
             "input_doc_count": len(files)
@@ -50,11 +169,13 @@ async def embed_docs(files: list[str], embeddings_path: str | None = None) -> No
     })
     start = time.perf_counter()
 
-    semaphore = asyncio.Semaphore(5)
+    semaphore = asyncio.Semaphore(settings.pipeline.embedding_concurrency)
     embeddings_file = embeddings_path or settings.file_storage.embedding_storage_path
     if not os.path.exists(embeddings_file):
         open(embeddings_file, 'w').close()
-    await asyncio.gather(*[embed_single_doc(semaphore, f, embeddings_file) for f in files])
+    state = state or ProcessingStateStore()
+    docs = await asyncio.gather(*[embed_single_doc(semaphore, f, embeddings_file, state) for f in files])
+    compact_chunk_embeddings(chunk_embeddings_path(embeddings_file))
 
     logger.info("embedding_completed", extra={
         "metrics": {
@@ -62,18 +183,125 @@ async def embed_docs(files: list[str], embeddings_path: str | None = None) -> No
             "elapsed_time_ms": (time.perf_counter() - start) * 1000
         }
     })
+    return docs
+
+async def transcribe_and_embed_docs(
+    files: UnprocessedDocs,
+    tags: TagHints,
+    embeddings_path: str | None = None,
+    state: ProcessingStateStore | None = None
+) -> list[EmbeddedDoc]:
+    """ Run transcription and embedding as concurrent stages joined by bounded queues.
+
+    Each page moves on to embedding as soon as its transcription is written, so
+    pages transcribed in this run are embedded too, and total time tracks the
+    slower stage instead of the sum of both. Scans that share a markdown page
+    (AM/PM) are transcribed one after another by the same worker. A failed page
+    is logged and recorded in the state store without stopping the others.
+    """
+    logger.info("ingestion_beginning", extra={
+        "metrics": {
+            "transcribe_doc_count": len(files.to_transcribe),
+            "embed_doc_count": len(files.to_embed)
+        }
+    })
+    start = time.perf_counter()
+
+    state = state or ProcessingStateStore()
+    embeddings_file = embeddings_path or settings.file_storage.embedding_storage_path
+    if not os.path.exists(embeddings_file):
+        open(embeddings_file, 'w').close()
+
+    pages: dict[str, list[str]] = {}
+    for scan, md in files.to_transcribe:
+        pages.setdefault(md, []).append(scan)
+
+    transcribe_queue: asyncio.Queue[tuple[str, list[str]]] = asyncio.Queue(settings.pipeline.queue_size)
+    embed_queue: asyncio.Queue[str] = asyncio.Queue(settings.pipeline.queue_size)
+    # workers already bound concurrency; the semaphores only satisfy the single-doc signatures
+    transcribe_semaphore = asyncio.Semaphore(settings.pipeline.transcription_concurrency)
+    embed_semaphore = asyncio.Semaphore(settings.pipeline.embedding_concurrency)
+    embedded: list[EmbeddedDoc] = []
+    failed: list[str] = []
+
+    async def produce_transcriptions() -> None:
+        for md, scans in pages.items():
+            await transcribe_queue.put((md, scans))
+
+    async def produce_embeddings() -> None:
+        # pages being transcribed are queued for embedding by their transcription worker
+        for md in dict.fromkeys(files.to_embed):
+            if md not in pages:
+                await embed_queue.put(md)
+
+    async def transcription_worker() -> None:
+        while True:
+            md, scans = await transcribe_queue.get()
+            try:
+                for scan in scans:
+                    await transcribe_single_doc(transcribe_semaphore, (scan, md), tags, state)
+                await embed_queue.put(md)
+            except Exception:
+                logger.exception(f"transcription failed for {md}")
+                failed.append(md)
+            finally:
+                transcribe_queue.task_done()
+
+    async def embedding_worker() -> None:
+        while True:
+            md = await embed_queue.get()
+            try:
+                embedded.append(await embed_single_doc(embed_semaphore, md, embeddings_file, state))
+            except Exception as e:
+                logger.exception(f"embedding failed for {md}")
+                state.record_failure(md, "embedding", str(e))
+                failed.append(md)
+            finally:
+                embed_queue.task_done()
+
+    workers = [
+        *[asyncio.create_task(transcription_worker()) for _ in range(settings.pipeline.transcription_concurrency)],
+        *[asyncio.create_task(embedding_worker()) for _ in range(settings.pipeline.embedding_concurrency)],
+    ]
+    try:
+        await asyncio.gather(produce_transcriptions(), produce_embeddings())
+        # transcription workers enqueue before marking done, so this order drains both stages
+        await transcribe_queue.join()
+        await embed_queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    compact_chunk_embeddings(chunk_embeddings_path(embeddings_file))
+
+    logger.info("ingestion_completed", extra={
+        "metrics": {
+            "transcribed_doc_count": len(pages),
+            "embedded_doc_count": len(embedded),
+            "failed_doc_count": len(failed),
+            "elapsed_time_ms": (time.perf_counter() - start) * 1000
+        }
+    })
+    return embedded
 
 async def transcribe_single_doc(
     semaphore: asyncio.Semaphore,
     file: tuple[str, str],
-    tags: str
+    tags: TagHints,
+    state: ProcessingStateStore
 ) -> None:
     logger.debug(f"transcribing {file}")
     async with semaphore:
         start = time.perf_counter()
-        images = encode_entry(file[0])
-        transcription = await transcribe_images(images, tags)
+        try:
+            transcription = await transcribe_entry(
+                file[0], tags.common, cache=state, page_tags=tags.for_page(file[1])
+            )
+        except Exception as e:
+            state.record_failure(file[1], "transcription", str(e))
+            raise
         insert_transcription(file[1], transcription)
+        state.record_transcription(file[1])
         logger.info(f"transcription completed for ...{file[0][-25:]}", extra={
             "metrics": {"time_elapsed_ms": (time.perf_counter() - start) * 1000}
         })
@@ -81,8 +309,9 @@ async def transcribe_single_doc(
 async def embed_single_doc(
     semaphore: asyncio.Semaphore,
     file: str,
-    embeddings_path: str
-) -> None:
+    embeddings_path: str,
+    state: ProcessingStateStore
+) -> EmbeddedDoc:
 
     logger.debug(f"embedding {file}")
     async with semaphore:
@@ -93,23 +322,31 @@ async def embed_single_doc(
         embedding = await get_embedding(transcription)
         if embedding is None:
             raise ValueError(f"No embedding created for {file}")
-        update_frontmatter_field(file, "embedding", "True")
+        chunks = await _embed_chunks(transcription, file, embeddings_path)
         _append_embedding(embeddings_path, file, embedding)
+        state.record_embedding(file, compute_content_hash(transcription))
         logger.info(f"embedding completed for ...{file[-25:]}", extra={
             "metrics": {"time_elapsed_ms": (time.perf_counter() - start) * 1000}
         })
+        return EmbeddedDoc(file, embedding, chunks)
 
-async def embed_evergreen_docs(files: list[str], embeddings_path: str | None = None) -> None:
+async def embed_evergreen_docs(
+    files: list[str],
+    embeddings_path: str | None = None,
+    state: ProcessingStateStore | None = None
+) -> list[EmbeddedDoc]:
     logger.info("evergreen_embedding_beginning", extra={
         "metrics": {"input_doc_count": len(files)}
     })
     start = time.perf_counter()
 
-    semaphore = asyncio.Semaphore(5)
+    semaphore = asyncio.Semaphore(settings.pipeline.embedding_concurrency)
     embeddings_file = embeddings_path or settings.file_storage.embedding_storage_path
     if not os.path.exists(embeddings_file):
         open(embeddings_file, 'w').close()
-    await asyncio.gather(*[embed_single_evergreen(semaphore, f, embeddings_file) for f in files])
+    state = state or ProcessingStateStore()
+    docs = await asyncio.gather(*[embed_single_evergreen(semaphore, f, embeddings_file, state) for f in files])
+    compact_chunk_embeddings(chunk_embeddings_path(embeddings_file))
 
     logger.info("evergreen_embedding_completed", extra={
         "metrics": {
@@ -117,12 +354,14 @@ async def embed_evergreen_docs(files: list[str], embeddings_path: str | None = N
             "elapsed_time_ms": (time.perf_counter() - start) * 1000
         }
     })
+    return docs
 
 async def embed_single_evergreen(
     semaphore: asyncio.Semaphore,
     file: str,
-    embeddings_path: str
-) -> None:
+    embeddings_path: str,
+    state: ProcessingStateStore
+) -> EmbeddedDoc:
     logger.debug(f"embedding evergreen {file}")
     async with semaphore:
         start = time.perf_counter()
@@ -135,11 +374,11 @@ async def embed_single_evergreen(
         embedding = await get_embedding(body)
         if embedding is None:
             raise ValueError(f"No embedding created for evergreen {file}")
-
-        update_frontmatter_field(file, "embedding", "True")
-        update_frontmatter_field(file, "content_hash", content_hash)
+        chunks = await _embed_chunks(body, file, embeddings_path)
         _append_embedding(embeddings_path, file, embedding)
+        state.record_embedding(file, content_hash, kind="evergreen")
 
         logger.info(f"evergreen embedding completed for ...{file[-25:]}", extra={
             "metrics": {"time_elapsed_ms": (time.perf_counter() - start) * 1000}
         })
+        return EmbeddedDoc(file, embedding, chunks)
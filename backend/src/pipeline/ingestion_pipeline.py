@@ -4,22 +4,33 @@
 
 import asyncio
 
-from core.navigation import crawl_journal_entries, crawl_evergreen_entries, extract_tags
+from core.navigation import crawl_journal_entries, crawl_evergreen_entries, index_tags
 from core.settings import settings
-from pipeline.ingestion_ops import transcribe_docs, embed_docs, embed_evergreen_docs
+from core.state import ProcessingStateStore
+from pipeline.ingestion_ops import transcribe_and_embed_docs, embed_evergreen_docs
+from pipeline.transcription import shutdown_encode_pool
+from pipeline.tag_hints import TagHints
 
 async def main():
+    state = ProcessingStateStore()
+
     # get docs for processing
-    files = crawl_journal_entries(settings.file_storage.journal_storage_path)
-    tags = extract_tags(settings.file_storage.journal_storage_path)
+    files = crawl_journal_entries(settings.file_storage.journal_storage_path, state)
+    index_tags(settings.file_storage.journal_storage_path, state)
+    tags = TagHints.from_state(state, settings.file_storage.journal_storage_path)
 
-    transcriptions = await transcribe_docs(files.to_transcribe, tags)
-    embeddings = await embed_docs(files.to_embed)
+    # pages flow into embedding as soon as they're transcribed
+    await transcribe_and_embed_docs(files, tags, state=state)
+    # pick up tags from the new transcriptions for the export script and /tags
+    index_tags(settings.file_storage.journal_storage_path, state)
 
     # evergreen entries
-    evergreen_files = crawl_evergreen_entries(settings.file_storage.evergreen_storage_path)
+    evergreen_files = crawl_evergreen_entries(settings.file_storage.evergreen_storage_path, state)
     if evergreen_files:
-        await embed_evergreen_docs(evergreen_files)
+        await embed_evergreen_docs(evergreen_files, state=state)
+
+    state.close()
+    shutdown_encode_pool()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,76 @@
+# tag_hints.py
+# picks the journal tags sent with each page as transcription hints, instead of
+# the whole vault vocabulary
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from core.settings import settings
+from core.state import ProcessingStateStore
+
+
+def entry_date(md_path: str) -> date | None:
+    """ Date of a daily page from its `MM-DD-YYYY.md` filename, if it has one. """
+    try:
+        return datetime.strptime(os.path.basename(md_path).split()[0].removesuffix(".md"), "%m-%d-%Y").date()
+    except ValueError:
+        return None
+
+
+class TagHints:
+    """Bounded tag hints for transcription prompts, built from the tag index.
+
+    `common` is the same for every page of a run: the most frequent tags, in
+    alphabetical order so the prompt prefix it forms only changes when the set
+    itself does, which keeps it eligible for provider-side prompt caching.
+    `for_page` adds the tags a particular page is likely to use: those from
+    entries within a few days of it, then those from its folder.
+    """
+
+    def __init__(
+        self,
+        file_tags: dict[str, dict[str, int]] | None = None,
+        common_limit: int | None = None,
+        page_limit: int | None = None,
+        window_days: int | None = None
+    ):
+        file_tags = file_tags or {}
+        self.page_limit = page_limit if page_limit is not None else settings.pipeline.tag_hint_page_limit
+        self.window_days = window_days if window_days is not None else settings.pipeline.tag_hint_window_days
+        common_limit = common_limit if common_limit is not None else settings.pipeline.tag_hint_common_limit
+
+        frequencies: Counter[str] = Counter()
+        self._by_date: dict[date, Counter[str]] = {}
+        self._by_folder: dict[str, Counter[str]] = {}
+        for path, counts in file_tags.items():
+            frequencies.update(counts)
+            self._by_folder.setdefault(os.path.dirname(path), Counter()).update(counts)
+            day = entry_date(path)
+            if day:
+                self._by_date.setdefault(day, Counter()).update(counts)
+        self._common = {tag for tag, _ in frequencies.most_common(common_limit)}
+        self.common = " ".join(sorted(self._common))
+
+    @classmethod
+    def from_state(cls, state: ProcessingStateStore, root_dir: str) -> "TagHints":
+        return cls(state.file_tags(root_dir))
+
+    def for_page(self, md_path: str) -> str:
+        """ Space-joined tags from nearby dates and the same folder that aren't already in `common`. """
+        if self.page_limit <= 0:
+            return ""
+        nearby: Counter[str] = Counter()
+        day = entry_date(md_path)
+        if day:
+            for offset in range(-self.window_days, self.window_days + 1):
+                nearby.update(self._by_date.get(day + timedelta(days=offset), {}))
+        folder = self._by_folder.get(os.path.dirname(md_path), Counter())
+
+        selected: list[str] = []
+        for ranked in (nearby.most_common(), folder.most_common()):
+            for tag, _ in ranked:
+                if len(selected) == self.page_limit:
+                    break
+                if tag not in self._common and tag not in selected:
+                    selected.append(tag)
+        return " ".join(sorted(selected))
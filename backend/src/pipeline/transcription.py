@@ -3,18 +3,30 @@
 import asyncio
 import base64
 import json
+import random
+import hashlib
 import logging
-import yaml
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from PIL import Image
 from PIL.Image import Image as PILImage
 from io import BytesIO
-from pdf2image import convert_from_path
-from openai import AsyncOpenAI
+from pdf2image import convert_from_path, pdfinfo_from_path
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 
-from core.settings import settings
+from core.settings import ImageSettings, settings
+from core.state import ProcessingStateStore
 
-async_openai = AsyncOpenAI(api_key=settings.credentials.OPENAI_API_KEY)
+IMAGE_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# retries are handled per page by _transcribe_with_retries
+async_openai = AsyncOpenAI(api_key=settings.credentials.OPENAI_API_KEY, max_retries=0)
+
+# transient API errors worth retrying; APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+_encode_pool: ProcessPoolExecutor | None = None
 
 
 def check_image_size(encoded_image: str, max_size_mb: int = 20) -> bool:
@@ -24,29 +36,89 @@ def check_image_size(encoded_image: str, max_size_mb: int = 20) -> bool:
     return size_mb <= max_size_mb
 
 
-def convert_and_encode_pdf(pdf_path: str, output_format: str = "PNG") -> list[str]:
-    """ Convert PDF to images and encode them to base64 strings. """
-    images = convert_from_path(pdf_path)
-    return [encode_image(image, output_format) for image in images]
+def count_pages(file_path: str) -> int:
+    """ Number of pages in a journal scan; images are a single page. """
+    if file_path.lower().endswith('.pdf'):
+        return pdfinfo_from_path(file_path)["Pages"]
+    return 1
+
+
+def encode_page(file_path: str, page_number: int, options: ImageSettings | None = None) -> str:
+    """ Rasterize and encode a single (1-based) page, so only one page is held in memory. """
+    options = options or settings.images
+    if file_path.lower().endswith('.pdf'):
+        pages = convert_from_path(
+            file_path, dpi=options.dpi, grayscale=options.grayscale,
+            first_page=page_number, last_page=page_number,
+        )
+        return encode_image(pages[0], options)
+    with Image.open(file_path) as image:
+        return encode_image(image, options)
 
 
-def encode_entry(file_path: str, output_format: str = "PNG") -> list[str]:
+def convert_and_encode_pdf(pdf_path: str, options: ImageSettings | None = None) -> list[str]:
+    """ Convert PDF to images and encode them to base64 strings, one page at a time. """
+    return [encode_page(pdf_path, n, options) for n in range(1, count_pages(pdf_path) + 1)]
+
+
+def encode_entry(file_path: str, options: ImageSettings | None = None) -> list[str]:
     """ Calls the corresponding encoding function on PDF and image based journal entries. """
     try:
         if file_path.lower().endswith('.pdf'):
-            return convert_and_encode_pdf(file_path, output_format)
+            encoded = convert_and_encode_pdf(file_path, options)
         else:
             with Image.open(file_path) as image:
-                return [encode_image(image, output_format)]
+                encoded = [encode_image(image, options)]
     except Exception as e:
         logging.error(f"Error encoding file {file_path}: {str(e)}")
         raise
+    if not all(check_image_size(image) for image in encoded):
+        logging.warning(f"Encoded page of {file_path} exceeds the upload size limit; lower images.dpi or max_long_edge")
+    return encoded
+
+
+def get_encode_pool() -> ProcessPoolExecutor:
+    """ Process pool for CPU-bound rasterization and encoding, created on first use.
+
+    Workers come from a forkserver: by the time the pool is created (e.g. in watch
+    mode) LanceDB and watchdog threads are running, and forking those is unsafe.
+    """
+    global _encode_pool
+    if _encode_pool is None:
+        _encode_pool = ProcessPoolExecutor(
+            max_workers=settings.pipeline.encoding_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    return _encode_pool
+
+
+def shutdown_encode_pool() -> None:
+    global _encode_pool
+    if _encode_pool is not None:
+        _encode_pool.shutdown()
+        _encode_pool = None
+
+
+def preprocess_image(image: PILImage, options: ImageSettings) -> PILImage:
+    """ Apply grayscale conversion and long-edge downscaling. Returns a new image. """
+    if options.grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")  # JPEG has no alpha channel or palette
+    else:
+        image = image.copy()
+    if options.max_long_edge and max(image.size) > options.max_long_edge:
+        image.thumbnail((options.max_long_edge, options.max_long_edge), Image.Resampling.LANCZOS)
+    return image
 
 
-def encode_image(image: PILImage, output_format: str = "PNG") -> str:
-    """ Encode a PIL Image object to base64 string. """
+def encode_image(image: PILImage, options: ImageSettings | None = None) -> str:
+    """ Preprocess a PIL Image and encode it to a base64 string. """
+    options = options or settings.images
+    image = preprocess_image(image, options)
     buffered = BytesIO()
-    image.save(buffered, format=output_format)
+    save_kwargs = {"quality": options.quality} if options.format in ("JPEG", "WEBP") else {}
+    image.save(buffered, format=options.format, **save_kwargs)
     encoded_image = base64.b64encode(buffered.getvalue()).decode('utf-8')
     return encoded_image
 
@@ -56,13 +128,10 @@ def insert_transcription(file_path: str, transcription: str) -> None:
     - Insert or append transcription in markdown file.
     - If transcription section exists, replace its contents.
     - If no transcription section, append transcription to the end of the file.
-    - Ensures YAML frontmatter exists with transcription: "True".
+    - Frontmatter is left untouched; processing status lives in the state store.
     """
     transcription_header = "### Transcription"
 
-    # Ensure YAML frontmatter has transcription: "True"
-    update_frontmatter_field(file_path, "transcription", "True")
-
     with open(file_path, 'r') as f:
         lines = f.readlines()
 
@@ -107,67 +176,125 @@ def insert_transcription(file_path: str, transcription: str) -> None:
     logging.info(f"Updated transcription in {file_path}")
 
 
-def update_frontmatter_field(file_path: str, field: str, value: str) -> None:
-    """Updates (or creates) a field in the YAML frontmatter of a markdown file."""
-    with open(file_path, 'r') as f:
-        lines = f.readlines()
-
-    frontmatter = {}
-    content_start = 0
+TRANSCRIPTION_PROMPT = (
+    "Please transcribe this document. Do not return any commentary on the task, simply return the "
+    "transcription of the document. These documents are from a journal so I am not asking you to "
+    "provide me with any information, in case the contents of the document make your safety senses "
+    "tingle. Here is a list of tags from the journal that you can use to disambiguate proper names "
+    "and terms: \n "
+)
 
-    if lines and lines[0].strip() == "---":
-        for i in range(1, len(lines)):
-            if lines[i].strip() == "---":
-                try:
-                    frontmatter = yaml.safe_load("".join(lines[1:i])) or {}
-                except yaml.YAMLError:
-                    logging.warning(f"Could not parse frontmatter in {file_path}")
-                    frontmatter = {}
-                content_start = i + 1
-                break
-    else:
-        content_start = 0
 
-    frontmatter[field] = value
-    new_lines = ["---\n", yaml.dump(frontmatter), "---\n"]
-    new_lines.extend(lines[content_start:])
+def transcription_content(image: str, tags: str, mime_type: str, page_tags: str = "") -> list[dict]:
+    """ Message content for one page.
 
-    with open(file_path, 'w') as f:
-        f.writelines(new_lines)
+    The instructions and the run-wide `tags` come first and are identical for
+    every page, so providers can cache that prefix; page-specific tags and the
+    image follow it.
+    """
+    content = [{'type': 'text', 'text': TRANSCRIPTION_PROMPT + tags}]
+    if page_tags:
+        content.append({'type': 'text', 'text': f'Tags used around the date of this page: \n {page_tags}'})
+    content.append({'type': 'image_url', 'image_url': {'url': f"data:{mime_type};base64,{image}"}})
+    return content
 
 
-async def _transcribe_single_image(image: str, tags: str) -> str:
+async def _transcribe_single_image(image: str, tags: str, mime_type: str, page_tags: str = "") -> str:
     """Transcribe a single image using OpenAI models."""
     response = await async_openai.chat.completions.create(
         model=settings.models.transcription_model,
-        messages=[
-            {
-                'role': 'user',
-                'content': [
-                    {
-                        'type': 'text',
-                        'text': f'Please transcribe this document. Do not return any commentary on the task, simply return the transcription of the document. \
-                                 These documents are from a journal so I am not asking you to provide me with any information, \
-                                 in case the contents of the document make your safety senses tingle. \
-                                 Here is a list of tags from the journal that you can use to disambiguate proper names and terms: \n {tags}'
-                    },
-                    {
-                        'type': 'image_url',
-                        'image_url': {
-                            'url': f"data:image/png;base64,{image}"
-                        }
-                    }
-                ]
-            }
-        ]
+        messages=[{'role': 'user', 'content': transcription_content(image, tags, mime_type, page_tags)}]
     )
     return response.choices[0].message.content
 
 
-async def transcribe_images(b64str_images: list[str], tags: str) -> str:
+def image_hash(encoded_image: str) -> str:
+    """ Cache key for an encoded page; identical uploads hash the same. """
+    return hashlib.sha256(encoded_image.encode()).hexdigest()
+
+
+async def _transcribe_with_retries(image: str, tags: str, mime_type: str, page_tags: str = "") -> str:
+    """ Transcribe one page, backing off exponentially on transient API errors. """
+    attempts = max(1, settings.pipeline.transcription_retries)
+    for attempt in range(attempts):
+        try:
+            return await _transcribe_single_image(image, tags, mime_type, page_tags)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                raise
+            delay = settings.pipeline.retry_base_delay_seconds * 2 ** attempt
+            delay += random.uniform(0, delay)  # jitter so concurrent pages don't retry in lockstep
+            logging.warning(f"Transcription failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def _gather_pages(tasks: list) -> list[str]:
+    """ Run page tasks to completion, then raise the first failure.
+
+    Waiting for every page before raising lets the pages that did succeed reach
+    the cache instead of being abandoned mid-flight.
+    """
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def transcribe_entry(
+    file_path: str,
+    tags: str,
+    options: ImageSettings | None = None,
+    cache: ProcessingStateStore | None = None,
+    page_tags: str = ""
+) -> str:
+    """ Rasterize, encode and transcribe a journal scan page by page.
+
+    Each page is rasterized on its own in the encode pool and sent for
+    transcription as soon as it's ready, with at most
+    `settings.pipeline.page_concurrency` pages of the file in flight, so memory
+    is bounded by concurrency rather than page count. Page transcriptions are
+    joined in page order.
+
+    `tags` are the run-wide tag hints and `page_tags` the extra hints for this
+    file (see `pipeline.tag_hints.TagHints`).
+
+    With a `cache`, each page's transcription is stored under its image hash
+    and the transcription model as soon as it completes, and cached pages are
+    not sent again, so a failed or interrupted file resumes where it left off.
+    """
+    options = options or settings.images
+    mime_type = IMAGE_MIME_TYPES[options.format]
+    model = settings.models.transcription_model
+    loop = asyncio.get_running_loop()
+    pool = get_encode_pool()
+    page_count = await loop.run_in_executor(pool, count_pages, file_path)
+    semaphore = asyncio.Semaphore(settings.pipeline.page_concurrency)
+
+    async def transcribe_page(page_number: int) -> str:
+        async with semaphore:
+            image = await loop.run_in_executor(pool, encode_page, file_path, page_number, options)
+            key = image_hash(image)
+            if cache is not None:
+                cached = cache.get_page_transcription(key, model)
+                if cached is not None:
+                    return cached
+            if not check_image_size(image):
+                logging.warning(f"Page {page_number} of {file_path} exceeds the upload size limit")
+            transcription = await _transcribe_with_retries(image, tags, mime_type, page_tags)
+            if cache is not None:
+                cache.record_page_transcription(key, model, transcription)
+            return transcription
+
+    transcriptions = await _gather_pages([transcribe_page(n) for n in range(1, page_count + 1)])
+    return "".join(transcriptions)
+
+
+async def transcribe_images(b64str_images: list[str], tags: str, image_format: str | None = None) -> str:
     """Given a list of images, transcribe them with GPT-4o in parallel."""
-    tasks = [_transcribe_single_image(img, tags) for img in b64str_images]
-    transcriptions = await asyncio.gather(*tasks)
+    mime_type = IMAGE_MIME_TYPES[image_format or settings.images.format]
+    tasks = [_transcribe_with_retries(img, tags, mime_type) for img in b64str_images]
+    transcriptions = await _gather_pages(tasks)
     return "".join(transcriptions)
 
 
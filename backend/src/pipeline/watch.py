@@ -0,0 +1,236 @@
+# watch.py
+# long-running ingestion: watches the vault and pushes changed pages through
+# transcription -> embedding -> LanceDB upsert as they appear
+#
+# usage (from backend/src): python -m pipeline.watch
+
+import os
+import time
+import asyncio
+
+import polars as pl
+
+from core.settings import settings
+from core.models import EmbeddedDoc, UnprocessedDocs
+from core.state import ProcessingStateStore
+from core.lancedb_client import AsyncLocalLanceDB
+from core.ingest import note_rows, evergreen_row, chunk_rows
+from core.navigation import crawl_journal_entries, crawl_evergreen_entries, index_tags
+from core.log_config import setup_logging
+from pipeline.ingestion_ops import transcribe_and_embed_docs, embed_evergreen_docs
+from pipeline.transcription import shutdown_encode_pool
+from pipeline.tag_hints import TagHints
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency; watch mode falls back to polling
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = setup_logging()
+
+# event types that can change what the crawlers see; ignores opened/closed reads
+WATCHED_EVENT_TYPES = {"created", "modified", "moved", "deleted"}
+
+
+class ChangeBatcher:
+    """Collects changed directories and releases them once events have been quiet for `debounce` seconds."""
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._pending: set[str] = set()
+        self._changed = asyncio.Event()
+
+    def add(self, directory: str) -> None:
+        self._pending.add(directory)
+        self._changed.set()
+
+    async def next_batch(self) -> set[str]:
+        await self._changed.wait()
+        while True:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self.debounce)
+            except asyncio.TimeoutError:
+                break
+        batch, self._pending = self._pending, set()
+        return batch
+
+
+class _VaultEventHandler(FileSystemEventHandler):
+    """Forwards the directory of each file event from the observer thread to the batcher."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, batcher: ChangeBatcher):
+        self.loop = loop
+        self.batcher = batcher
+
+    def on_any_event(self, event) -> None:
+        if event.event_type not in WATCHED_EVENT_TYPES:
+            return
+        path = getattr(event, "dest_path", "") or event.src_path
+        directory = path if event.is_directory else os.path.dirname(path)
+        self.loop.call_soon_threadsafe(self.batcher.add, directory)
+
+
+def _use_events(roots: list[str]) -> bool:
+    mode = settings.watch.mode
+    if mode == "polling":
+        return False
+    if Observer is None:
+        if mode == "events":
+            logger.warning("watchdog is not installed (uv sync --extra watch); falling back to polling")
+        return False
+    if mode == "auto" and any(root.startswith("/mnt/") for root in roots):
+        # inotify doesn't see changes made from the Windows side of a WSL drive (OneDrive)
+        return False
+    return True
+
+
+def _is_within(path: str, root: str) -> bool:
+    path, root = os.path.abspath(path), os.path.abspath(root)
+    return path == root or path.startswith(os.path.join(root, ""))
+
+
+def _outermost(directories: list[str]) -> list[str]:
+    """Existing directories, dropping any nested inside another one in the list (its crawl covers them)."""
+    existing = sorted({os.path.abspath(d) for d in directories if os.path.isdir(d)})
+    kept: list[str] = []
+    for d in existing:
+        if not any(_is_within(d, k) for k in kept):
+            kept.append(d)
+    return kept
+
+
+def _entry_frames(daily: list[EmbeddedDoc], evergreen: list[EmbeddedDoc]) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Journal and passage rows for freshly embedded documents."""
+    rows, chunks = [], []
+    for doc in daily:
+        for row in note_rows(doc.path, doc.embedding):
+            rows.append(row)
+            chunks.extend(chunk_rows(row, doc.chunks))
+    for doc in evergreen:
+        row = evergreen_row(doc.path, doc.embedding)
+        if row:
+            rows.append(row)
+            chunks.extend(chunk_rows(row, doc.chunks))
+    return pl.DataFrame(rows), pl.DataFrame(chunks)
+
+
+async def process_changes(
+    directories: set[str],
+    lance: AsyncLocalLanceDB,
+    state: ProcessingStateStore,
+    tags: TagHints
+) -> int:
+    """Transcribe, embed and upsert whatever changed under `directories`. Returns the number of entries upserted."""
+    start = time.perf_counter()
+    journal_root = settings.file_storage.journal_storage_path
+    evergreen_root = settings.file_storage.evergreen_storage_path
+    journal_dirs = _outermost([d for d in directories if _is_within(d, journal_root)])
+    evergreen_dirs = _outermost([d for d in directories if _is_within(d, evergreen_root)])
+
+    crawls = [crawl_journal_entries(d, state) for d in journal_dirs]
+    files = UnprocessedDocs(
+        to_transcribe=[f for c in crawls for f in c.to_transcribe],
+        to_embed=[f for c in crawls for f in c.to_embed],
+    )
+    has_work = files.to_transcribe or files.to_embed
+    daily = await transcribe_and_embed_docs(files, tags, state=state) if has_work else []
+    for d in journal_dirs:
+        index_tags(d, state)
+
+    evergreen_files = [f for d in evergreen_dirs for f in crawl_evergreen_entries(d, state)]
+    evergreen = await embed_evergreen_docs(evergreen_files, state=state) if evergreen_files else []
+
+    journal_df, chunks_df = _entry_frames(daily, evergreen)
+    if not journal_df.is_empty():
+        if "journal" in await lance.db.table_names():
+            await lance.upsert_entries(journal_df, chunks_df)
+        else:
+            logger.warning("journal table not found; new entries will load on the next API startup")
+
+    logger.info("watch_batch_completed", extra={
+        "metrics": {
+            "directory_count": len(journal_dirs) + len(evergreen_dirs),
+            "transcribed_count": len(files.to_transcribe),
+            "upserted_count": len(journal_df),
+            "elapsed_time_ms": (time.perf_counter() - start) * 1000
+        }
+    })
+    return len(journal_df)
+
+
+async def _batch_producer(batcher: ChangeBatcher, queue: asyncio.Queue) -> None:
+    while True:
+        await queue.put(await batcher.next_batch())
+
+
+async def _poll(batcher: ChangeBatcher, roots: list[str], interval: float) -> None:
+    """Polling fallback: re-crawl the roots periodically; the stat manifest keeps this cheap."""
+    while True:
+        await asyncio.sleep(interval)
+        for root in roots:
+            batcher.add(root)
+
+
+async def _consume(queue: asyncio.Queue, lance: AsyncLocalLanceDB, state: ProcessingStateStore) -> None:
+    while True:
+        directories = await queue.get()
+        # merge batches that queued up while the previous one was processing
+        while not queue.empty():
+            directories |= queue.get_nowait()
+        # the tag index is kept current by process_changes, so this is just a query
+        tags = TagHints.from_state(state, settings.file_storage.journal_storage_path)
+        try:
+            await process_changes(directories, lance, state, tags)
+        except Exception:
+            logger.exception("watch batch failed; changes will be retried on the next event or poll")
+
+
+async def watch() -> None:
+    journal_root = settings.file_storage.journal_storage_path
+    roots = [r for r in (journal_root, settings.file_storage.evergreen_storage_path) if os.path.isdir(r)]
+    if not roots:
+        raise FileNotFoundError("neither the journal nor the evergreen directory exists")
+
+    state = ProcessingStateStore()
+    lance = AsyncLocalLanceDB(settings.file_storage.lance_storage_path)
+    await lance.connect()
+    index_tags(journal_root, state)  # catch the tag index up with changes made while not running
+
+    batcher = ChangeBatcher(settings.watch.debounce_seconds)
+    queue: asyncio.Queue[set[str]] = asyncio.Queue()
+    for root in roots:
+        batcher.add(root)  # catch up on anything that changed while not running
+
+    tasks = [
+        asyncio.create_task(_batch_producer(batcher, queue)),
+        asyncio.create_task(_consume(queue, lance, state)),
+    ]
+    observer = None
+    if _use_events(roots):
+        observer = Observer()
+        handler = _VaultEventHandler(asyncio.get_running_loop(), batcher)
+        for root in roots:
+            observer.schedule(handler, root, recursive=True)
+        observer.start()
+        logger.info(f"watching {roots} for file events")
+    else:
+        tasks.append(asyncio.create_task(_poll(batcher, roots, settings.watch.poll_interval_seconds)))
+        logger.info(f"polling {roots} every {settings.watch.poll_interval_seconds}s")
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        state.close()
+        shutdown_encode_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(watch())
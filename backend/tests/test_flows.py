@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+
+import backend.flows as flows
+from core.baml_client.types import SearchToolCall, SearchToolType
+from core.models import ChatRequest, EntryView
+
+
+def _entry(date: str, title: str) -> EntryView:
+    return EntryView(date=date, title=title, text=f"text for {title}", tags=[])
+
+
+class FakeLance:
+    """Minimal stand-in for AsyncLocalLanceDB used by the agent flow."""
+
+    async def get_recent_entries(self, n: int = 7) -> list[EntryView]:
+        return [_entry("2024-01-01", "recent")]
+
+    async def get_similar_entries(self, _embedding: list[float], n: int = 5):
+        await asyncio.sleep(0.05)
+        return [(_entry("2024-01-02", "similar"), 0.1)]
+
+    async def get_similar_passages(self, _embedding: list[float], n: int = 5):
+        return await self.get_similar_entries(_embedding, n)
+
+    async def get_thread_messages(self, thread_id: str) -> list[dict]:
+        return []
+
+
+@pytest.fixture
+def agent_stubs(monkeypatch):
+    """Replace LLM-backed calls so the agent loop runs offline."""
+    rounds = [
+        [
+            SearchToolCall(tool=SearchToolType.VECTOR_SEARCH, reasoning="topic", query="running"),
+            SearchToolCall(tool=SearchToolType.RECENT_ENTRIES, reasoning="recency"),
+        ],
+        [SearchToolCall(tool=SearchToolType.DONE, reasoning="enough context")],
+    ]
+
+    async def fake_selector(**kwargs):
+        return rounds.pop(0)
+
+    async def fake_embedding(text: str):
+        return [0.1, 0.2]
+
+    async def fake_synthesizer(**kwargs):
+        return "synthesized"
+
+    async def fake_personality(query, personalities):
+        return None
+
+    monkeypatch.setattr(flows, "agent_tool_selector", fake_selector)
+    monkeypatch.setattr(flows, "get_query_embedding", fake_embedding)
+    monkeypatch.setattr(flows, "agent_synthesizer", fake_synthesizer)
+    monkeypatch.setattr(flows, "classify_personality", fake_personality)
+    monkeypatch.setattr(flows, "load_personalities", lambda: [])
+
+
+@pytest.mark.asyncio
+async def test_agent_flow_runs_tool_calls_in_parallel(agent_stubs):
+    req = ChatRequest(query="How is running going?", provider="openai", model="gpt-5", thread_id=None)
+    events = [e async for e in flows.agentic_llm_flow_stream(FakeLance(), req)]
+
+    iterations = [e["data"] for e in events if e["event"] == "search_iteration"]
+    tools = [it["tool"] for it in iterations]
+    # preseed, then both round-1 tools (fastest first), then DONE
+    assert tools == ["RECENT_ENTRIES_PRESEED", "RECENT_ENTRIES", "VECTOR_SEARCH", "DONE"]
+    assert [it["iteration"] for it in iterations] == [0, 1, 1, 2]
+
+    response = events[-1]
+    assert response["event"] == "chat_response"
+    titles = {d["entry"]["title"] for d in response["data"]["docs"]}
+    assert titles == {"recent", "similar"}
+
+
+@pytest.mark.asyncio
+async def test_failing_tool_does_not_drop_other_results(agent_stubs, monkeypatch):
+    async def broken_recent(self, n: int = 7):
+        raise RuntimeError("boom")
+
+    lance = FakeLance()
+    monkeypatch.setattr(FakeLance, "get_recent_entries", broken_recent)
+
+    calls = [
+        SearchToolCall(tool=SearchToolType.VECTOR_SEARCH, reasoning="topic", query="running"),
+        SearchToolCall(tool=SearchToolType.RECENT_ENTRIES, reasoning="recency"),
+    ]
+    results = {c.tool: entries async for c, entries in flows._execute_agent_tools(lance, calls)}
+    assert results[SearchToolType.RECENT_ENTRIES] == []
+    assert [e.title for e in results[SearchToolType.VECTOR_SEARCH]] == ["similar"]
+
+
+async def test_tool_limits_are_clamped():
+    limits = []
+
+    class RecordingLance:
+        async def get_recent_entries(self, n):
+            limits.append(n)
+            return []
+
+        async def get_entries_by_date_range(self, start, end, n, sampling):
+            limits.append(n)
+            return []
+
+    lance = RecordingLance()
+    await flows._execute_agent_tool(lance, SearchToolCall(
+        tool=SearchToolType.RECENT_ENTRIES, reasoning="lately", limit=500,
+    ))
+    await flows._execute_agent_tool(lance, SearchToolCall(
+        tool=SearchToolType.DATE_RANGE_SEARCH, reasoning="last year",
+        start_date="2024-01-01", end_date="2024-12-31", limit=365,
+    ))
+    await flows._execute_agent_tool(lance, SearchToolCall(tool=SearchToolType.RECENT_ENTRIES, reasoning="lately"))
+    await flows._execute_agent_tool(lance, SearchToolCall(
+        tool=SearchToolType.RECENT_ENTRIES, reasoning="lately", limit=-3,
+    ))
+    assert limits == [flows.MAX_TOOL_RESULTS, flows.MAX_TOOL_RESULTS, 5, 1]
+
+
+async def test_hybrid_search_without_query_skips_embedding(monkeypatch):
+    async def fail_embedding(text: str):
+        raise AssertionError("embedded an empty query")
+
+    monkeypatch.setattr(flows, "get_query_embedding", fail_embedding)
+    call = SearchToolCall(tool=SearchToolType.HYBRID_SEARCH, reasoning="names")
+    assert await flows._execute_agent_tool(FakeLance(), call) == []
+
+
+class FakeThreadLance:
+    """Thread history and summary storage for the rolling-summary tests."""
+
+    def __init__(self, count: int):
+        self.messages = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(count)
+        ]
+        self.summary = None
+
+    async def get_thread_history(self, thread_id: str) -> list[dict]:
+        return self.messages
+
+    async def get_thread_summary(self, thread_id: str) -> dict | None:
+        return self.summary
+
+    async def save_thread_summary(self, thread_id: str, summary: str, message_count: int) -> None:
+        self.summary = {"thread_id": thread_id, "summary": summary, "message_count": message_count}
+
+
+@pytest.fixture
+def history_settings(monkeypatch):
+    monkeypatch.setattr(flows.settings.history, "recent_messages", 4)
+    monkeypatch.setattr(flows.settings.history, "summary_batch", 3)
+
+
+@pytest.mark.asyncio
+async def test_thread_summary_refreshes_in_batches(history_settings, monkeypatch):
+    summarized = []
+
+    async def fake_summarize(previous_summary, messages):
+        summarized.append([m["content"] for m in messages])
+        return f"{previous_summary}+{len(messages)}"
+
+    monkeypatch.setattr(flows, "summarize_thread", fake_summarize)
+    lance = FakeThreadLance(6)
+    await flows.refresh_thread_summary(lance, "t1")  # only 2 messages outside the window
+    assert lance.summary is None
+
+    lance.messages += FakeThreadLance(10).messages[6:]
+    await flows.refresh_thread_summary(lance, "t1")
+    assert lance.summary["message_count"] == 6
+    assert summarized == [[f"message {i}" for i in range(6)]]
+
+    lance.messages += FakeThreadLance(13).messages[10:]
+    await flows.refresh_thread_summary(lance, "t1")
+    assert lance.summary == {"thread_id": "t1", "summary": "+6+3", "message_count": 9}
+
+
+@pytest.mark.asyncio
+async def test_chat_history_is_summary_plus_uncovered_tail(history_settings):
+    lance = FakeThreadLance(40)
+    lance.summary = {"summary": "we talked about running", "message_count": 33}
+    req = ChatRequest(query="and then?", provider="openai", model="gpt-5", thread_id="t1")
+
+    history = await flows._load_chat_history(lance, req)
+    assert history[0] == {"role": "summary", "content": "we talked about running"}
+    assert [m["content"] for m in history[1:]] == [f"message {i}" for i in range(33, 40)]
+
+    # a summary lagging behind (e.g. a failed refresh) leaves nothing out
+    lance.summary["message_count"] = 20
+    assert [m["content"] for m in (await flows._load_chat_history(lance, req))[1:]] == [
+        f"message {i}" for i in range(20, 40)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chat_history_without_summary_sends_every_message(history_settings):
+    lance = FakeThreadLance(20)
+    req = ChatRequest(query="and then?", provider="openai", model="gpt-5", thread_id="t1")
+    history = await flows._load_chat_history(lance, req)
+    assert [m["content"] for m in history] == [f"message {i}" for i in range(20)]
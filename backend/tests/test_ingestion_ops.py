@@ -1,25 +1,52 @@
 import pytest
 import os
 import json
+import base64
+import asyncio
+import sqlite3
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
-from core.settings import settings
-from core.navigation import crawl_journal_entries, extract_tags, duplicate_folder
-from pipeline.transcription import encode_entry, insert_transcription
-from pipeline.ingestion_ops import transcribe_docs, embed_docs
+import httpx
+import polars as pl
+from PIL import Image
+
+import pipeline.ingestion_ops as ingestion_ops
+from core.ingest import chunk_embeddings_path, load_chunks_to_df
+from core import navigation
+from core.models import UnprocessedDocs
+from core.settings import ImageSettings, settings
+from core.navigation import (
+    crawl_journal_entries, crawl_evergreen_entries, extract_tags, index_tags, duplicate_folder, compute_content_hash
+)
+from core.state import ProcessingStateStore
+import pipeline.transcription as transcription
+from pipeline.transcription import (
+    encode_entry, encode_image, insert_transcription, shutdown_encode_pool, transcribe_entry, transcription_content
+)
+from pipeline.tag_hints import TagHints
+from pipeline.ingestion_ops import transcribe_docs, embed_docs, chunk_text, transcribe_and_embed_docs
 
 TEST_DOC_LIMIT = 5
 
 
 @pytest.fixture
-def test_files():
+def state(tmp_path):
+    """Processing state store isolated from the real pipeline state."""
+    store = ProcessingStateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+@pytest.fixture
+def test_files(state):
     """Crawl test journal directory and return limited set of files."""
     duplicate_folder(settings.test_settings.test_data_source_dir, settings.test_settings.test_data_dir_path)
-    files = crawl_journal_entries(settings.test_settings.test_data_dir_path)
-    tags = extract_tags(settings.test_settings.test_data_dir_path)
-    return files, tags
+    files = crawl_journal_entries(settings.test_settings.test_data_dir_path, state)
+    index_tags(settings.test_settings.test_data_dir_path, state)
+    return files, TagHints.from_state(state, settings.test_settings.test_data_dir_path)
 
 @pytest.mark.asyncio
-async def test_ingestion_pipeline(test_files):
+async def test_ingestion_pipeline(test_files, state):
     files, tags = test_files
     to_transcribe = files.to_transcribe[:TEST_DOC_LIMIT]
     to_embed = files.to_embed[:TEST_DOC_LIMIT]
@@ -29,7 +56,7 @@ async def test_ingestion_pipeline(test_files):
         os.remove(embeddings_path)
 
     # run transcription before embedding
-    await transcribe_docs(to_transcribe, tags)
+    await transcribe_docs(to_transcribe, tags, state)
 
     # Verify transcriptions were added to markdown files
     for image_path, md_path in to_transcribe:
@@ -39,7 +66,7 @@ async def test_ingestion_pipeline(test_files):
         assert "### Transcription" in content, f"Transcription section should be added to {md_path}"
 
     # run embedding after transcriptions are available
-    await embed_docs(to_embed, embeddings_path)
+    await embed_docs(to_embed, embeddings_path, state)
 
     # Verify embeddings file was created
     assert os.path.exists(embeddings_path), "Embeddings file should be created"
@@ -80,6 +107,156 @@ def test_crawl_journal_entries(test_files):
             assert '![[' in content
             assert os.path.basename(source_file) in content
 
+@pytest.fixture
+def mini_vault(tmp_path):
+    """ A one-page vault: a scan plus its transcribed markdown note. """
+    vault = tmp_path / "Daily Pages"
+    vault.mkdir()
+    (vault / "01-02-2024 AM.pdf").write_bytes(b"")
+    md = vault / "01-02-2024.md"
+    md.write_text('---\ntranscription: "True"\n---\n#day\n### Transcription\nWent running.\n')
+    return vault, md
+
+def test_crawl_embeds_only_when_transcription_changes(mini_vault, state):
+    vault, md = mini_vault
+    files = crawl_journal_entries(str(vault), state)
+    assert files.to_embed == [str(md)]
+
+    # simulate a completed embedding
+    state.record_embedding(str(md), compute_content_hash("Went running."))
+    assert crawl_journal_entries(str(vault), state).to_embed == []
+
+    # frontmatter-only edits don't trigger a refresh
+    md.write_text(md.read_text().replace('transcription: "True"', 'transcription: "True"\nmood: good'))
+    assert crawl_journal_entries(str(vault), state).to_embed == []
+
+    # editing the transcription does
+    md.write_text(md.read_text().replace("Went running.", "Went running twice."))
+    assert crawl_journal_entries(str(vault), state).to_embed == [str(md)]
+
+def test_crawl_adopts_legacy_embedded_pages(mini_vault, state):
+    vault, md = mini_vault
+    md.write_text(md.read_text().replace('transcription: "True"', 'transcription: "True"\nembedding: "True"'))
+    assert crawl_journal_entries(str(vault), state).to_embed == []
+    assert state.get_content_hash(str(md)) == compute_content_hash("Went running.")
+
+def test_crawl_reads_status_from_state_not_frontmatter(mini_vault, state):
+    vault, md = mini_vault
+    crawl_journal_entries(str(vault), state)
+    assert state.is_transcribed(str(md))
+
+    # once seeded, the store is authoritative and frontmatter is ignored
+    md.write_text(md.read_text().replace('transcription: "True"', ''))
+    assert crawl_journal_entries(str(vault), state).to_transcribe == []
+
+    new_page = vault / "01-03-2024 AM.pdf"
+    new_page.write_bytes(b"")
+    files = crawl_journal_entries(str(vault), state)
+    assert files.to_transcribe == [(str(new_page), str(vault / "01-03-2024.md"))]
+
+def test_embedding_model_change_triggers_reembed(mini_vault, state):
+    vault, md = mini_vault
+    state.record_embedding(str(md), compute_content_hash("Went running."), model="old-model")
+    assert crawl_journal_entries(str(vault), state).to_embed == [str(md)]
+
+def test_crawl_only_reads_pages_whose_stat_changed(mini_vault, state, monkeypatch):
+    vault, md = mini_vault
+    crawl_journal_entries(str(vault), state)
+
+    reads = []
+    original = navigation.extract_transcription
+    monkeypatch.setattr(navigation, "extract_transcription", lambda text: reads.append(text) or original(text))
+
+    assert crawl_journal_entries(str(vault), state).to_embed == [str(md)]
+    assert reads == []
+
+    md.write_text(md.read_text().replace("Went running.", "Went swimming."))
+    crawl_journal_entries(str(vault), state)
+    assert len(reads) == 1
+    assert state.load_manifest(str(vault))[str(md)].content_hash == compute_content_hash("Went swimming.")
+
+def test_manifest_drops_deleted_files(mini_vault, state):
+    vault, md = mini_vault
+    crawl_journal_entries(str(vault), state)
+    assert str(md) in state.load_manifest(str(vault))
+
+    (vault / "01-02-2024 AM.pdf").unlink()
+    md.unlink()
+    crawl_journal_entries(str(vault), state)
+    assert state.load_manifest(str(vault)) == {}
+
+def test_tag_index_updates_incrementally(mini_vault, state, monkeypatch):
+    vault, md = mini_vault
+    other = vault / "2024" / "notes.md"
+    other.parent.mkdir()
+    other.write_text("#run #day #run\n")
+    assert extract_tags(str(vault), "frequency", state) == {"day": 2, "run": 2}
+    assert extract_tags(str(vault), state=state) == "day run"
+
+    reads = []
+    original = navigation.TAG_PATTERN
+    monkeypatch.setattr(navigation, "TAG_PATTERN", type("Spy", (), {
+        "findall": staticmethod(lambda text: reads.append(text) or original.findall(text))
+    }))
+    assert extract_tags(str(vault), "frequency", state) == {"day": 2, "run": 2}
+    assert reads == []
+
+    md.write_text(md.read_text() + "#swim #run\n")
+    other.unlink()
+    assert extract_tags(str(vault), "frequency", state) == {"day": 1, "run": 1, "swim": 1}
+    assert len(reads) == 1
+    assert state.tag_frequencies(str(vault), limit=1) == {"day": 1}
+
+def test_tag_hints_are_bounded_and_page_specific():
+    file_tags = {
+        "/vault/2024/01-01-2024.md": {"day": 1, "run": 3, "marguerite": 1},
+        "/vault/2024/01-05-2024.md": {"day": 1, "run": 1, "ostrava": 1},
+        "/vault/2024/03-01-2024.md": {"day": 1, "bassoon": 2},
+        "/vault/2023/01-03-2023.md": {"day": 1, "ludek": 1},
+    }
+    hints = TagHints(file_tags, common_limit=2, page_limit=2, window_days=7)
+    assert hints.common == "day run"
+
+    # nearby dates rank ahead of the rest of the folder; common tags aren't repeated
+    assert hints.for_page("/vault/2024/01-03-2024.md") == "marguerite ostrava"
+    assert hints.for_page("/vault/2024/06-01-2024.md") == "bassoon marguerite"
+    assert hints.for_page("/elsewhere/notes.md") == ""
+
+    content = transcription_content("aW1n", hints.common, "image/jpeg", hints.for_page("/vault/2023/01-03-2023.md"))
+    assert content[0]["text"].endswith("day run")
+    assert [part["type"] for part in content] == ["text", "text", "image_url"]
+
+def test_state_store_migrates_older_schema(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE file_state (path TEXT PRIMARY KEY, content_hash TEXT, embedding_model TEXT, embedded_at TEXT)")
+    conn.execute("INSERT INTO file_state VALUES ('a.md', 'abc', ?, '2024-01-01')", (settings.models.embedding_model,))
+    conn.commit()
+    conn.close()
+
+    store = ProcessingStateStore(path)
+    assert store.get_content_hash("a.md") == "abc"
+    assert not store.needs_embedding("a.md", "abc")
+    store.record_failure("a.md", "transcription", "timeout")
+    row = store.get("a.md")
+    assert row["transcription_status"] == "failed"
+    assert row["last_error"] == "timeout"
+    store.close()
+
+def test_crawl_evergreen_uses_state(tmp_path, state):
+    evergreen = tmp_path / "Evergreen"
+    evergreen.mkdir()
+    note = evergreen / "note.md"
+    note.write_text("An idea.\n")
+    legacy = evergreen / "legacy.md"
+    legacy_hash = compute_content_hash("Old idea.\n")
+    legacy.write_text(f"---\ncontent_hash: {legacy_hash}\n---\nOld idea.\n")
+
+    assert crawl_evergreen_entries(str(evergreen), state) == [str(note)]
+    state.record_embedding(str(note), compute_content_hash("An idea.\n"), kind="evergreen")
+    assert crawl_evergreen_entries(str(evergreen), state) == []
+    assert set(state.paths("evergreen")) == {str(legacy), str(note)}
+
 # FILE PROCESSING STUFF
 
 def test_encode_entry():
@@ -100,6 +277,108 @@ def test_encode_entry_on_invalid_file():
     with pytest.raises(Exception):
         encode_entry("nonexistent.pdf")
 
+def test_encode_image_downscales_and_recompresses():
+    page = Image.new("RGBA", (3000, 2000), (200, 10, 10, 255))
+    options = ImageSettings(max_long_edge=1500, grayscale=True, format="JPEG", quality=70)
+    decoded = Image.open(BytesIO(base64.b64decode(encode_image(page, options))))
+    assert decoded.format == "JPEG"
+    assert decoded.mode == "L"
+    assert decoded.size == (1500, 1000)
+
+    png = ImageSettings(max_long_edge=None, grayscale=False, format="PNG")
+    decoded = Image.open(BytesIO(base64.b64decode(encode_image(page, png))))
+    assert (decoded.format, decoded.size) == ("PNG", (3000, 2000))
+
+async def test_transcribe_entry_encodes_pages_in_process_pool(tmp_path, monkeypatch):
+    image_path = tmp_path / "page.png"
+    Image.new("RGB", (40, 30), "white").save(image_path)
+    uploads = []
+
+    async def fake_transcribe_image(image, tags, mime_type, page_tags=""):
+        uploads.append((image, mime_type))
+        return "page text"
+
+    monkeypatch.setattr(transcription, "_transcribe_single_image", fake_transcribe_image)
+    try:
+        assert await transcribe_entry(str(image_path), "") == "page text"
+        assert uploads == [(encode_entry(str(image_path))[0], "image/jpeg")]
+        with pytest.raises(Exception):
+            await transcribe_entry(str(tmp_path / "missing.png"), "")
+    finally:
+        shutdown_encode_pool()
+
+async def test_transcribe_entry_streams_pages_with_bounded_concurrency(monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def fake_transcribe_image(image, tags, mime_type, page_tags=""):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return f"[{base64.b64decode(image).decode()}]"
+
+    monkeypatch.setattr(transcription, "get_encode_pool", lambda: ThreadPoolExecutor(2))
+    monkeypatch.setattr(transcription, "count_pages", lambda path: 6)
+    monkeypatch.setattr(transcription, "encode_page", lambda path, n, options: base64.b64encode(f"p{n}".encode()).decode())
+    monkeypatch.setattr(transcription, "_transcribe_single_image", fake_transcribe_image)
+    monkeypatch.setattr(settings.pipeline, "page_concurrency", 2)
+
+    assert await transcribe_entry("notebook.pdf", "") == "[p1][p2][p3][p4][p5][p6]"
+    assert peak == 2
+
+async def test_transcribe_entry_resumes_from_cached_pages(monkeypatch, state):
+    calls = []
+    failing = {3}
+
+    async def fake_transcribe_image(image, tags, mime_type, page_tags=""):
+        page = base64.b64decode(image).decode()
+        calls.append(page)
+        if int(page[1:]) in failing:
+            raise transcription.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com"))
+        return f"[{page}]"
+
+    monkeypatch.setattr(transcription, "get_encode_pool", lambda: ThreadPoolExecutor(2))
+    monkeypatch.setattr(transcription, "count_pages", lambda path: 4)
+    monkeypatch.setattr(transcription, "encode_page", lambda path, n, options: base64.b64encode(f"p{n}".encode()).decode())
+    monkeypatch.setattr(transcription, "_transcribe_single_image", fake_transcribe_image)
+    monkeypatch.setattr(settings.pipeline, "transcription_retries", 2)
+    monkeypatch.setattr(settings.pipeline, "retry_base_delay_seconds", 0)
+
+    # page 3 exhausts its retries; the other pages still complete and are cached
+    with pytest.raises(transcription.APIConnectionError):
+        await transcribe_entry("notebook.pdf", "", cache=state)
+    assert sorted(calls) == ["p1", "p2", "p3", "p3", "p4"]
+
+    # the rerun only pays for the page that failed
+    calls.clear()
+    failing.clear()
+    assert await transcribe_entry("notebook.pdf", "", cache=state) == "[p1][p2][p3][p4]"
+    assert calls == ["p3"]
+
+    # a different model is a cache miss
+    monkeypatch.setattr(settings.models, "transcription_model", "another-model")
+    calls.clear()
+    await transcribe_entry("notebook.pdf", "", cache=state)
+    assert len(calls) == 4
+
+async def test_transcription_makes_one_attempt_without_retries(monkeypatch):
+    async def fake_transcribe_image(image, tags, mime_type, page_tags=""):
+        return "[page]"
+
+    monkeypatch.setattr(transcription, "_transcribe_single_image", fake_transcribe_image)
+    monkeypatch.setattr(settings.pipeline, "transcription_retries", 0)
+    assert await transcription._transcribe_with_retries("image", "", "image/jpeg") == "[page]"
+
+async def test_transcribe_docs_keeps_going_past_failed_docs(tmp_path, state, stub_llm):
+    broken = _page(tmp_path, "01-01-2024", "broken")
+    fine = _page(tmp_path, "01-02-2024", "fine")
+
+    await transcribe_docs([broken, fine], TagHints(), state)
+
+    assert state.get(broken[1])["transcription_status"] == "failed"
+    assert state.is_transcribed(fine[1])
+
 @pytest.fixture
 def temp_markdown(tmp_path):
     """ Create a temporary markdown file with different initial states. """
@@ -171,3 +450,109 @@ def test_transcription_at_end(temp_markdown):
 
     assert new_transcription in content
     assert "Old transcription text" not in content
+
+# CHUNKING
+
+def test_chunk_text_short_text_is_single_chunk():
+    chunks = chunk_text("A short page about running.")
+    assert chunks == [{"chunk_index": 0, "heading": "", "text": "A short page about running."}]
+
+def test_chunk_text_splits_on_headings():
+    section = "word " * 80
+    text = f"# Morning\n{section}\n\n## Afternoon\n{section}\n\n## Evening\n{section}"
+    chunks = chunk_text(text, max_tokens=100, overlap_tokens=10)
+    assert [c["heading"] for c in chunks] == ["Morning", "Afternoon", "Evening"]
+    assert [c["chunk_index"] for c in chunks] == [0, 1, 2]
+    assert chunks[1]["text"].startswith("## Afternoon")
+
+def test_chunk_text_packs_small_sections_together():
+    text = "# One\nfirst\n\n# Two\nsecond\n\n# Three\nthird"
+    chunks = chunk_text(text, max_tokens=100, overlap_tokens=10)
+    assert len(chunks) == 1
+    assert chunks[0]["heading"] == "One"
+    assert "third" in chunks[0]["text"]
+
+def test_chunk_text_windows_long_sections_with_overlap():
+    text = " ".join(f"w{i}" for i in range(1000))
+    chunks = chunk_text(text, max_tokens=200, overlap_tokens=20)
+    assert len(chunks) > 1
+    # consecutive windows share their overlap
+    assert chunks[0]["text"].split()[-1] in chunks[1]["text"]
+
+# STAGED PIPELINE
+
+async def test_reembedding_short_text_replaces_old_passages(tmp_path, state, monkeypatch):
+    md = tmp_path / "01-01-2024.md"
+    embeddings_path = str(tmp_path / "embeddings.jsonl")
+
+    async def fake_embedding(text):
+        return [0.1, 0.2]
+
+    monkeypatch.setattr(ingestion_ops, "get_embedding", fake_embedding)
+    monkeypatch.setattr(ingestion_ops, "chunk_text", lambda text: [
+        {"chunk_index": i, "heading": "", "text": part} for i, part in enumerate(text.split("|"))
+    ])
+    md.write_text("#day\n### Transcription\nOLD passage 0|OLD passage 1|OLD passage 2\n")
+    await embed_docs([str(md)], embeddings_path, state)
+    md.write_text("#day\n### Transcription\nShort rewrite\n")
+    await embed_docs([str(md)], embeddings_path, state)
+
+    chunks_path = chunk_embeddings_path(embeddings_path)
+    with open(chunks_path) as f:
+        assert len(f.readlines()) == 1  # compacted to the latest chunk set
+    journal_df = pl.DataFrame([{
+        "date": "2024-01-01", "title": "01-01-2024", "text": "Short rewrite",
+        "tags": ["#day"], "embedding": [0.1, 0.2], "entry_type": "daily",
+    }])
+    assert load_chunks_to_df(chunks_path, journal_df)["text"].to_list() == ["Short rewrite"]
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """Stub transcription and embedding; records the order stages finish in."""
+    events = []
+
+    async def fake_transcribe(path, tags, **kwargs):
+        page = os.path.basename(path).split()[1].removesuffix(".pdf")
+        if page == "broken":
+            raise RuntimeError("api error")
+        await asyncio.sleep(0.2 if page == "slow" else 0.01)
+        events.append(("transcribed", page))
+        return f"Transcribed {page}."
+
+    async def fake_embedding(text):
+        events.append(("embedded", text))
+        return [0.1, 0.2]
+
+    monkeypatch.setattr(ingestion_ops, "transcribe_entry", fake_transcribe)
+    monkeypatch.setattr(ingestion_ops, "get_embedding", fake_embedding)
+    monkeypatch.setattr(ingestion_ops, "chunk_text", lambda text: [{"chunk_index": 0, "heading": "", "text": text}])
+    return events
+
+def _page(vault, date: str, scan: str, transcription: str = "") -> tuple[str, str]:
+    (vault / f"{date} {scan}.pdf").write_bytes(b"")
+    md = vault / f"{date}.md"
+    md.write_text(f"#day\n### Transcription\n{transcription}\n" if transcription else "#day\n")
+    return str(vault / f"{date} {scan}.pdf"), str(md)
+
+async def test_pages_are_embedded_as_soon_as_transcribed(tmp_path, state, stub_llm):
+    slow = _page(tmp_path, "01-01-2024", "slow")
+    fast = _page(tmp_path, "01-02-2024", "fast")
+    _, existing = _page(tmp_path, "01-03-2024", "AM", "Already transcribed.")
+    files = UnprocessedDocs(to_transcribe=[slow, fast], to_embed=[existing])
+
+    docs = await transcribe_and_embed_docs(files, TagHints(), str(tmp_path / "embeddings.jsonl"), state)
+
+    assert {d.path for d in docs} == {slow[1], fast[1], existing}
+    # the fast page reaches embedding while the slow one is still transcribing
+    assert stub_llm.index(("embedded", "Transcribed fast.")) < stub_llm.index(("transcribed", "slow"))
+    assert all(state.is_transcribed(md) for _, md in (slow, fast))
+
+async def test_failed_page_does_not_stop_the_pipeline(tmp_path, state, stub_llm):
+    broken = _page(tmp_path, "01-01-2024", "broken")
+    fast = _page(tmp_path, "01-02-2024", "fast")
+    files = UnprocessedDocs(to_transcribe=[broken, fast], to_embed=[])
+
+    docs = await transcribe_and_embed_docs(files, TagHints(), str(tmp_path / "embeddings.jsonl"), state)
+
+    assert [d.path for d in docs] == [fast[1]]
+    assert state.get(broken[1])["transcription_status"] == "failed"
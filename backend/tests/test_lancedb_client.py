@@ -0,0 +1,294 @@
+import json
+import random
+
+import lancedb
+import polars as pl
+import pytest
+
+from core.ingest import load_chunks_to_df
+from core.lancedb_client import (
+    DATE_RANGE_MAX_LIMIT, VECTOR_INDEX, AsyncLocalLanceDB, _journal_arrow, _with_content_hash,
+    sample_date_range, vector_index_config,
+)
+from core.models import EntryView
+from core.settings import settings
+
+EMBEDDING_DIM = 8
+
+
+def _journal_rows() -> list[dict]:
+    """One entry per day for the first 27 days of each month of 2024."""
+    rng = random.Random(0)
+    return [
+        {
+            "date": f"2024-{month:02d}-{day:02d}",
+            "title": f"{month:02d}-{day:02d}-2024",
+            "text": f"entry for {month}/{day}" + (" lunch with Marguerite" if (month, day) == (6, 14) else ""),
+            "tags": ["#run"] * (day % 3) + (["#travel"] if month == 8 and day < 4 else [])
+                    + (["#project-x"] if month == 3 and day < 3 else [])
+                    + (["#people/ana"] if (month, day) == (3, 2) else []),
+            "embedding": [rng.random() for _ in range(EMBEDDING_DIM)],
+            "entry_type": "daily",
+        }
+        for month in range(1, 13)
+        for day in range(1, 28)
+    ]
+
+
+@pytest.fixture
+async def lance(tmp_path):
+    db = AsyncLocalLanceDB(str(tmp_path / "lance"))
+    await db.connect()
+    await db.db.create_table("journal", data=_journal_arrow(pl.DataFrame(_journal_rows())))
+    table = await db.db.open_table("journal")
+    await table.create_index("date", config=lancedb.index.BTree())
+    await table.create_index("text", config=lancedb.index.FTS())
+    await table.create_index("tags", config=lancedb.index.FTS(), name="tags_fts_idx")
+    await table.create_index("tags", config=lancedb.index.LabelList(), name="tags_label_idx")
+    return db
+
+
+### read paths
+
+async def test_recent_entries_are_views_newest_first(lance):
+    entries = await lance.get_recent_entries(3)
+    assert all(isinstance(e, EntryView) for e in entries)
+    assert [e.date for e in entries] == ["2024-12-27", "2024-12-26", "2024-12-25"]
+
+
+async def test_similar_entries_skip_embeddings(lance):
+    results = await lance.get_similar_entries([0.5] * EMBEDDING_DIM, n=4)
+    assert len(results) == 4
+    distances = [d for _, d in results]
+    assert distances == sorted(distances)
+    assert not hasattr(results[0][0], "embedding")
+
+
+async def test_hybrid_search_surfaces_exact_name_match(lance):
+    results = await lance.get_hybrid_entries("Marguerite", [0.5] * EMBEDDING_DIM, n=5)
+    assert len(results) == 5
+    assert "2024-06-14" in [e.date for e, _ in results]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+### tag retrieval
+
+async def test_entries_by_tag_lists_every_match_newest_first(lance):
+    entries = await lance.get_entries_by_tags(["travel"])
+    assert [e.date for e in entries] == ["2024-08-03", "2024-08-02", "2024-08-01"]
+    assert len(await lance.get_entries_by_tags(["#travel"], n=2)) == 2
+    assert await lance.get_entries_by_tags(["#nonexistent"]) == []
+
+
+async def test_entries_by_tags_match_all(lance):
+    entries = await lance.get_entries_by_tags(["#travel", "#run"], match_all=True)
+    assert {e.date for e in entries} == {"2024-08-01", "2024-08-02"}
+
+
+async def test_similar_entries_by_tags_prefilters(lance):
+    results = await lance.get_similar_entries_by_tags(["#travel"], [0.5] * EMBEDDING_DIM, n=10)
+    assert len(results) == 3
+    assert all("#travel" in e.tags for e, _ in results)
+
+
+async def test_tags_with_hyphens_and_slashes(lance):
+    entries = await lance.get_entries_by_tags(["#project-x", "people/ana"])
+    assert [e.date for e in entries] == ["2024-03-02", "2024-03-01"]
+    results = await lance.get_similar_entries_by_tags(["#people/ana"], [0.5] * EMBEDDING_DIM, n=5)
+    assert [e.date for e, _ in results] == ["2024-03-02"]
+
+
+async def test_tag_filter_rejects_invalid_tags(lance):
+    with pytest.raises(ValueError):
+        await lance.get_entries_by_tags(["run']) OR true --"])
+
+
+### passage retrieval
+
+async def test_similar_passages_fall_back_without_chunk_table(lance):
+    results = await lance.get_similar_passages([0.5] * EMBEDDING_DIM, n=3)
+    assert len(results) == 3
+
+
+async def test_similar_passages_group_chunks_by_parent(lance, tmp_path):
+    journal_df = pl.DataFrame(_journal_rows())
+    long_title = "06-14-2024"
+    chunks_path = tmp_path / "chunk_embeddings.jsonl"
+    query = [1.0] + [0.0] * (EMBEDDING_DIM - 1)
+    with open(chunks_path, "w") as f:
+        for i in range(3):
+            # chunk 0 and 2 point along the query; chunk 1 is orthogonal
+            embedding = query if i != 1 else [0.0, 1.0] + [0.0] * (EMBEDDING_DIM - 2)
+            f.write(json.dumps({
+                "path": f"/vault/{long_title}.md", "chunk_index": i,
+                "heading": f"Part {i}", "text": f"passage {i}", "embedding": embedding,
+            }) + "\n")
+
+    chunks_df = load_chunks_to_df(str(chunks_path), journal_df)
+    assert len(chunks_df) == len(journal_df) + 2
+    await lance.db.create_table("journal_chunks", data=_journal_arrow(chunks_df))
+
+    results = await lance.get_similar_passages(query, n=2, passages_per_entry=2)
+    top, distance = results[0]
+    assert top.title == long_title
+    assert top.text == "passage 0\n\n[...]\n\npassage 2"
+    assert distance == pytest.approx(0.0, abs=1e-5)
+    assert len({(e.date, e.title) for e, _ in results}) == 2
+
+
+async def test_entry_embedding_loaded_on_demand(lance):
+    embedding = await lance.get_entry_embedding("2024-02-03", "02-03-2024")
+    assert embedding is not None and len(embedding) == EMBEDDING_DIM
+    assert await lance.get_entry_embedding("2024-02-03", "missing") is None
+
+
+### syncing and vector index tiers
+
+async def test_sync_table_rewrites_only_changed_rows(lance):
+    rows = _journal_rows()
+    assert await lance._sync_table("journal", pl.DataFrame(rows), ["date", "title"]) is None  # old schema: rebuilt
+
+    version = await lance.content_version()
+    rows[0]["text"] = "rewritten"
+    rows = rows[:-1] + [{**rows[-1], "date": "2025-01-01", "title": "01-01-2025"}]
+    result = await lance._sync_table("journal", pl.DataFrame(rows), ["date", "title"])
+    assert (result.num_updated_rows, result.num_inserted_rows, result.num_deleted_rows) == (1, 1, 1)
+    assert await lance.content_version() != version  # invalidates cached chat responses
+
+    table = await lance.db.open_table("journal")
+    after = await table.query().select(["title", "text"]).to_polars()
+    assert len(after) == len(rows)
+    assert "12-27-2024" not in after["title"].to_list()
+    assert after.filter(pl.col("title") == "01-01-2024")["text"].item() == "rewritten"
+
+    result = await lance._sync_table("journal", pl.DataFrame(rows), ["date", "title"])
+    assert (result.num_updated_rows, result.num_inserted_rows, result.num_deleted_rows) == (0, 0, 0)
+
+
+async def test_sync_table_tolerates_duplicate_keys(lance):
+    rows = _journal_rows()
+    rows.append({**rows[0], "text": "same-named note in another folder"})
+    for _ in range(2):
+        assert await lance._sync_table("journal", pl.DataFrame(rows), ["date", "title"]) is None
+    table = await lance.db.open_table("journal")
+    assert await table.count_rows() == len(rows)
+
+    # once the duplicate is gone, merging resumes and drops the extra row
+    await lance._sync_table("journal", pl.DataFrame(rows[:-1]), ["date", "title"])
+    result = await lance._sync_table("journal", pl.DataFrame(rows[:-1]), ["date", "title"])
+    assert (result.num_updated_rows, result.num_inserted_rows, result.num_deleted_rows) == (0, 0, 0)
+    assert await (await lance.db.open_table("journal")).count_rows() == len(rows) - 1
+
+    upsert = pl.DataFrame([rows[1], {**rows[1], "text": "duplicate"}])
+    await lance._sync_table("journal", upsert, ["date", "title"], delete_filter=f"title = '{rows[1]['title']}'")
+    assert await (await lance.db.open_table("journal")).count_rows() == len(rows)
+
+
+def test_content_hash_is_a_stable_digest():
+    df = pl.DataFrame(_journal_rows()[:2])
+    hashes = _with_content_hash(df)["content_hash"].to_list()
+    assert hashes == _with_content_hash(df.clone())["content_hash"].to_list()
+    assert all(len(h) == 64 for h in hashes) and hashes[0] != hashes[1]
+
+
+def test_vector_index_config_follows_size_tiers(monkeypatch):
+    monkeypatch.setattr(settings.vector_index, "flat_max_rows", 10_000)
+    monkeypatch.setattr(settings.vector_index, "hnsw_max_rows", 1_000_000)
+    assert vector_index_config(3_000, 3072) is None
+    assert isinstance(vector_index_config(40_000, 3072), lancedb.index.HnswSq)
+    assert isinstance(vector_index_config(2_000_000, 3072), lancedb.index.IvfPq)
+
+
+async def test_vector_index_rebuilt_only_when_tier_changes(lance, monkeypatch):
+    builds = []
+    create_index = lancedb.AsyncTable.create_index
+
+    async def counting_create_index(self, column, **kwargs):
+        builds.append(kwargs["config"])
+        return await create_index(self, column, **kwargs)
+
+    monkeypatch.setattr(lancedb.AsyncTable, "create_index", counting_create_index)
+    monkeypatch.setattr(settings.vector_index, "flat_max_rows", 100)
+    monkeypatch.setattr(settings.vector_index, "hnsw_max_rows", 10_000)
+    table = await lance.db.open_table("journal")
+
+    async def vector_index_type():
+        return next((i.index_type for i in await table.list_indices() if i.name == VECTOR_INDEX), None)
+
+    await lance._ensure_vector_index(table)
+    await lance._ensure_vector_index(table)
+    assert await vector_index_type() == "IvfHnswSq"
+    assert len(builds) == 1
+
+    monkeypatch.setattr(settings.vector_index, "hnsw_max_rows", 200)
+    await lance._ensure_vector_index(table)
+    assert await vector_index_type() == "IvfPq"
+    assert len(await lance.get_similar_entries([0.5] * EMBEDDING_DIM, n=4, nprobes=4, refine_factor=5)) == 4
+
+    monkeypatch.setattr(settings.vector_index, "flat_max_rows", 1_000)
+    await lance._ensure_vector_index(table)
+    assert await vector_index_type() is None
+    assert len(builds) == 2
+
+
+### thread history and summaries
+
+async def test_thread_history_and_summary_round_trip(lance):
+    await lance.db.create_table("messages", data=[
+        {"message_id": str(i), "thread_id": thread, "timestamp": f"2025-01-01T00:00:0{i}",
+         "role": role, "content": f"message {i}", "metadata_json": None}
+        for i, (thread, role) in enumerate([("t1", "assistant"), ("t2", "user"), ("t1", "user")][::-1])
+    ])
+    assert await lance.get_thread_history("t1") == [
+        {"role": "user", "content": "message 0"}, {"role": "assistant", "content": "message 2"},
+    ]
+
+    assert await lance.get_thread_summary("t1") is None
+    await lance.save_thread_summary("t1", "first", 2)
+    await lance.save_thread_summary("t1", "second", 8)
+    await lance.save_thread_summary("t2", "other", 1)
+    summary = await lance.get_thread_summary("t1")
+    assert (summary["summary"], summary["message_count"]) == ("second", 8)
+
+
+### date range retrieval
+
+async def test_date_range_applies_limit(lance):
+    entries = await lance.get_entries_by_date_range("2024-01-01", "2024-12-31", n=6)
+    assert len(entries) == 6
+    assert all("2024-01-01" <= e.date <= "2024-12-31" for e in entries)
+
+
+async def test_date_range_caps_requested_limit(lance):
+    entries = await lance.get_entries_by_date_range("2024-01-01", "2024-12-31", n=1_000)
+    assert len(entries) == DATE_RANGE_MAX_LIMIT
+
+
+async def test_date_range_small_range_returns_everything(lance):
+    entries = await lance.get_entries_by_date_range("2024-03-01", "2024-03-03", n=10)
+    assert [e.date for e in entries] == ["2024-03-01", "2024-03-02", "2024-03-03"]
+
+
+async def test_date_range_sampling_strategies(lance):
+    evenly = await lance.get_entries_by_date_range("2024-01-01", "2024-12-31", 5, "evenly_spaced")
+    assert evenly[0].date == "2024-01-01"
+    assert evenly[-1].date == "2024-12-27"
+
+    recent = await lance.get_entries_by_date_range("2024-01-01", "2024-12-31", 3, "most_recent")
+    assert [e.date for e in recent] == ["2024-12-27", "2024-12-26", "2024-12-25"]
+
+    tagged = await lance.get_entries_by_date_range("2024-01-01", "2024-12-31", 4, "tag_weighted")
+    assert all(len(e.tags) >= 2 for e in tagged)
+    assert len({e.date[:7] for e in tagged}) == 4  # spread over the range
+
+
+async def test_date_range_rejects_malformed_dates(lance):
+    with pytest.raises(ValueError):
+        await lance.get_entries_by_date_range("2024-01-01' OR '1'='1", "2024-12-31")
+
+
+def test_sample_date_range_evenly_spaced_includes_endpoints():
+    df = pl.DataFrame({"date": [f"2024-01-{d:02d}" for d in range(1, 11)], "tags": [[]] * 10})
+    sampled = sample_date_range(df, 4)
+    assert sampled["date"].to_list() == ["2024-01-01", "2024-01-04", "2024-01-07", "2024-01-10"]
@@ -0,0 +1,75 @@
+from fastapi.testclient import TestClient
+
+import backend.api as api
+import core.llm as llm
+from core.metrics import EMBEDDING_CACHE, HTTP_REQUEST_SECONDS, MetricsRegistry
+from core.settings import settings
+from core.state import ProcessingStateStore
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    calls = registry.counter("llm_calls_total", "Calls.", ("function", "status"))
+    latency = registry.histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    calls.inc("DirectChat", "ok")
+    calls.inc("DirectChat", "ok")
+    latency.observe("embedding", value=0.05)
+    latency.observe("embedding", value=0.5)
+    latency.observe("embedding", value=3)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE llm_calls_total counter" in lines
+    assert 'llm_calls_total{function="DirectChat",status="ok"} 2' in lines
+    assert 'latency_seconds_bucket{stage="embedding",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="embedding",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{stage="embedding",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="embedding"} 3' in lines
+
+
+async def test_query_embeddings_are_cached(monkeypatch):
+    calls = []
+
+    async def fake_embedding(text):
+        calls.append(text)
+        return [0.1, 0.2]
+
+    monkeypatch.setattr(llm, "get_embedding", fake_embedding)
+    monkeypatch.setattr(llm, "_query_embeddings", llm.OrderedDict())
+    monkeypatch.setattr(settings.cache, "query_embeddings", 1)
+    hits = EMBEDDING_CACHE.get("hit")
+
+    await llm.get_query_embedding("how was the run?")
+    await llm.get_query_embedding("how was the run?")
+    await llm.get_query_embedding("what did I read?")  # evicts the first query
+    await llm.get_query_embedding("how was the run?")
+    assert calls == ["how was the run?", "what did I read?", "how was the run?"]
+    assert EMBEDDING_CACHE.get("hit") == hits + 1
+
+
+class FakeLance:
+    async def table_stats(self):
+        return {"journal": {"rows": 12, "fragments": 3}}
+
+
+def test_metrics_endpoint(tmp_path):
+    state = ProcessingStateStore(str(tmp_path / "state.db"))
+    state.record_transcription("/vault/01-02-2024.md")
+    state.record_failure("/vault/01-03-2024.md", "transcription", "timeout")
+    api.app.dependency_overrides[api.get_db] = lambda: FakeLance()
+    api.app.dependency_overrides[api.get_processing_state] = lambda: state
+    requests = HTTP_REQUEST_SECONDS.count("GET", "/status", "200")
+    try:
+        client = TestClient(api.app)
+        client.get("/status")
+        response = client.get("/metrics")
+    finally:
+        api.app.dependency_overrides.clear()
+        state.close()
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert 'journal_lancedb_table_rows{table="journal"} 12' in lines
+    assert 'journal_lancedb_table_fragments{table="journal"} 3' in lines
+    assert 'journal_ingestion_files{kind="daily",stage="transcription",status="done"} 1' in lines
+    assert 'journal_ingestion_files{kind="unknown",stage="transcription",status="failed"} 1' in lines
+    assert HTTP_REQUEST_SECONDS.count("GET", "/status", "200") == requests + 1
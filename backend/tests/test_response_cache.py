@@ -0,0 +1,88 @@
+from fastapi.testclient import TestClient
+
+import backend.api as api
+from backend.response_cache import ResponseCache, response_cache
+from core.models import ChatRequest, ChatResponse
+from core.settings import settings
+
+
+class FakeLance:
+    def __init__(self):
+        self.version = (3, 3)
+        self.updated_at = "2025-01-01T00:00:00"
+
+    async def get_thread(self, thread_id):
+        return {"thread_id": thread_id, "updated_at": self.updated_at}
+
+    async def content_version(self):
+        return self.version
+
+
+def _request(query: str, thread_id: str | None = "t1") -> ChatRequest:
+    return ChatRequest(query=query, provider="openai", model="gpt-5", thread_id=thread_id)
+
+
+async def test_keys_follow_query_thread_and_journal_versions(monkeypatch):
+    monkeypatch.setattr(settings.cache, "responses", True)
+    lance, cache = FakeLance(), ResponseCache()
+    key = await cache.key(lance, "default", _request("How was the run?"))
+    cache.put(key, "answer")
+
+    assert cache.get(await cache.key(lance, "default", _request("  how was the   RUN? "))) == "answer"
+    assert cache.get(await cache.key(lance, "agent", _request("How was the run?"))) is None
+
+    lance.updated_at = "2025-01-01T00:05:00"  # a message was added to the thread
+    assert cache.get(await cache.key(lance, "default", _request("How was the run?"))) is None
+    lance.updated_at = "2025-01-01T00:00:00"
+    lance.version = (4, 4)  # new entries were ingested
+    assert cache.get(await cache.key(lance, "default", _request("How was the run?"))) is None
+
+
+async def test_ttl_and_lru_eviction(monkeypatch):
+    monkeypatch.setattr(settings.cache, "responses", True)
+    monkeypatch.setattr(settings.cache, "response_entries", 2)
+    lance, cache = FakeLance(), ResponseCache()
+    keys = [await cache.key(lance, "default", _request(q)) for q in ("a", "b", "c")]
+    for key in keys:
+        cache.put(key, key[1])
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == "c"
+
+    monkeypatch.setattr(settings.cache, "response_ttl_seconds", 0)
+    cache.put(keys[0], "a")
+    assert cache.get(keys[0]) is None
+
+
+async def test_disabled_cache_has_no_keys():
+    assert await ResponseCache().key(None, "default", _request("a")) is None
+
+
+def test_repeated_requests_skip_the_flows(monkeypatch):
+    calls = []
+
+    async def fake_flow(db, request):
+        calls.append("default")
+        return ChatResponse(response="ok", docs=[], thread_id=None)
+
+    async def fake_stream(db, request):
+        calls.append("agent")
+        yield {"event": "search_iteration", "data": {"iteration": 0}}
+        yield {"event": "chat_response", "data": {"response": "ok"}}
+
+    monkeypatch.setattr(settings.cache, "responses", True)
+    monkeypatch.setattr(api, "default_llm_flow", fake_flow)
+    monkeypatch.setattr(api, "agentic_llm_flow_stream", fake_stream)
+    response_cache.clear()
+    api.app.dependency_overrides[api.get_db] = FakeLance
+    try:
+        client = TestClient(api.app)
+        body = {"query": "how was the run?", "provider": "openai", "model": "gpt-5", "thread_id": None}
+        first = client.post("/journal_chat", json=body).json()
+        assert client.post("/journal_chat", json=body).json() == first
+        streams = [client.post("/journal_chat_agent/stream", json=body).text for _ in range(2)]
+        assert streams[0] == streams[1]
+        assert "event: chat_response" in streams[0]
+    finally:
+        api.app.dependency_overrides.clear()
+        response_cache.clear()
+    assert calls == ["default", "agent"]
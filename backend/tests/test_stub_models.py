@@ -0,0 +1,48 @@
+import math
+
+import core.llm as llm
+from backend import completions
+from core.baml_client.types import SearchToolType
+from core.models import ChatRequest
+from core.settings import settings
+from core.stub_models import stub_embedding
+
+
+def _stub(monkeypatch, **overrides):
+    monkeypatch.setattr(settings.stub_models, "enabled", True)
+    monkeypatch.setattr(settings.stub_models, "latency_ms", 0)
+    monkeypatch.setattr(settings.stub_models, "tokens_per_second", 0)
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings.stub_models, name, value)
+
+
+async def test_stub_embeddings_are_deterministic_unit_vectors(monkeypatch):
+    _stub(monkeypatch, embedding_dim=64)
+    first = await llm.get_embedding("how was the run?")
+    assert first == await stub_embedding("how was the run?")
+    assert len(first) == 64
+    assert math.isclose(sum(v * v for v in first), 1.0)
+    assert first != await stub_embedding("what did I read?")
+
+
+async def test_completions_use_stub_client(monkeypatch):
+    _stub(monkeypatch, response_tokens=12)
+    request = ChatRequest(query="how was the run?", provider="stub", model="stub", thread_id=None)
+
+    answer = await completions.chat_response(request, [], "entries")
+    assert len(answer.split(" ")) == 12
+    assert answer == await completions.chat_response(request, [], "entries")
+
+    tools = await completions.agent_tool_selector("how was the run?", "", "", 1, 3)
+    assert SearchToolType.DONE not in {t.tool for t in tools}
+    done = await completions.agent_tool_selector("how was the run?", "", "", 2, 3)
+    assert [t.tool for t in done] == [SearchToolType.DONE]
+    assert await completions.generate_thread_title([{"role": "user", "content": "hi"}]) == "Stub thread"
+
+
+async def test_stub_stream_yields_growing_text(monkeypatch):
+    _stub(monkeypatch, response_tokens=5)
+    stream = completions.stub_baml_client.stream.DirectChat("messages", "entries", "", "")
+    partials = [partial async for partial in stream]
+    assert len(partials) == 5
+    assert partials[-1] == await stream.get_final_response()
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from fastapi.testclient import TestClient
+
+import backend.api as api
+from core.models import ChatResponse
+from core.tracing import current_trace, span, start_trace, traced
+
+
+@traced("embedding")
+async def fake_embedding(text: str) -> list[float]:
+    await asyncio.sleep(0.01)
+    return [0.0]
+
+
+async def test_spans_collect_into_the_current_trace():
+    # outside a trace, spans cost nothing and record nothing
+    with span("ignored"):
+        assert current_trace() is None
+
+    with start_trace("request") as trace:
+        with span("retrieval"):
+            # concurrent tasks inherit the trace and the parent span
+            await asyncio.gather(fake_embedding("a"), fake_embedding("b"))
+        with span("synthesis", model="gpt-5"):
+            pass
+
+    assert [(s.name, s.parent) for s in trace.spans] == [
+        ("retrieval", None), ("embedding", "retrieval"), ("embedding", "retrieval"), ("synthesis", None)
+    ]
+    assert trace.spans[-1].attributes == {"model": "gpt-5"}
+    stages = trace.stages()
+    assert list(stages) == ["retrieval", "embedding", "synthesis"]
+    assert stages["embedding"] >= 20
+    assert trace.server_timing().startswith("retrieval;dur=")
+
+
+def test_chat_request_reports_stage_timings(monkeypatch, caplog):
+    async def fake_flow(db, request):
+        await fake_embedding(request.query)
+        return ChatResponse(response="ok", docs=[], thread_id=None)
+
+    monkeypatch.setattr(api, "default_llm_flow", fake_flow)
+    api.app.dependency_overrides[api.get_db] = lambda: None
+    try:
+        client = TestClient(api.app)
+        body = {"query": "how was the run?", "provider": "openai", "model": "gpt-5", "thread_id": None}
+        with caplog.at_level(logging.INFO, logger="journal_app"):
+            response = client.post("/journal_chat", json=body, headers={"X-Debug-Timings": "1"})
+        assert response.status_code == 200
+        assert response.headers["Server-Timing"].startswith("embedding;dur=")
+        assert "Server-Timing" not in client.post("/journal_chat", json=body).headers
+    finally:
+        api.app.dependency_overrides.clear()
+
+    record = next(r for r in caplog.records if r.getMessage() == "request_completed")
+    assert record.metrics["path"] == "/journal_chat"
+    assert "embedding" in record.metrics["stages_ms"]
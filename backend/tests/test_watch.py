@@ -0,0 +1,110 @@
+import asyncio
+
+import polars as pl
+import pytest
+
+import pipeline.ingestion_ops as ingestion_ops
+from core.lancedb_client import AsyncLocalLanceDB, _journal_arrow
+from core.ingest import chunk_rows
+from core.settings import settings
+from core.state import ProcessingStateStore
+from pipeline.tag_hints import TagHints
+from pipeline.watch import ChangeBatcher, process_changes, _outermost
+
+EMBEDDING_DIM = 4
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    """Journal and evergreen folders wired into settings, with LLM calls stubbed."""
+    journal = tmp_path / "Daily Pages"
+    evergreen = tmp_path / "Evergreen"
+    (journal / "2024").mkdir(parents=True)
+    evergreen.mkdir()
+    monkeypatch.setattr(settings.file_storage, "journal_storage_path", str(journal))
+    monkeypatch.setattr(settings.file_storage, "evergreen_storage_path", str(evergreen))
+    monkeypatch.setattr(settings.file_storage, "embedding_storage_path", str(tmp_path / "embeddings.jsonl"))
+
+    async def fake_transcribe(path, tags, **kwargs):
+        return "Went running with #marguerite."
+
+    async def fake_embedding(text):
+        return [float(len(text))] + [0.0] * (EMBEDDING_DIM - 1)
+
+    monkeypatch.setattr(ingestion_ops, "transcribe_entry", fake_transcribe)
+    monkeypatch.setattr(ingestion_ops, "get_embedding", fake_embedding)
+    monkeypatch.setattr(ingestion_ops, "chunk_text", lambda text: [{"chunk_index": 0, "heading": "", "text": text}])
+    return journal, evergreen
+
+
+@pytest.fixture
+async def lance(tmp_path):
+    db = AsyncLocalLanceDB(str(tmp_path / "lance"))
+    await db.connect()
+    existing = {
+        "date": "2024-01-01", "title": "01-01-2024", "text": "older entry", "tags": ["#run"],
+        "embedding": [1.0] * EMBEDDING_DIM, "entry_type": "daily",
+    }
+    await db.db.create_table("journal", data=_journal_arrow(pl.DataFrame([existing])))
+    await db.db.create_table("journal_chunks", data=_journal_arrow(pl.DataFrame(chunk_rows(existing, None))))
+    return db
+
+
+@pytest.fixture
+def state(tmp_path):
+    store = ProcessingStateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+async def test_change_batcher_waits_for_quiet():
+    batcher = ChangeBatcher(debounce=0.05)
+    batch = asyncio.create_task(batcher.next_batch())
+    batcher.add("/vault/a")
+    await asyncio.sleep(0.02)
+    batcher.add("/vault/b")
+    assert not batch.done()
+    assert await asyncio.wait_for(batch, timeout=1) == {"/vault/a", "/vault/b"}
+
+
+def test_outermost_drops_nested_and_missing_dirs(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    dirs = [str(tmp_path / "a" / "b"), str(tmp_path / "a"), str(tmp_path / "missing")]
+    assert _outermost(dirs) == [str(tmp_path / "a")]
+
+
+async def test_new_scan_is_transcribed_embedded_and_upserted(vault, lance, state):
+    journal, _ = vault
+    (journal / "2024" / "01-02-2024 AM.pdf").write_bytes(b"")
+
+    assert await process_changes({str(journal / "2024")}, lance, state, tags=TagHints()) == 1
+
+    table = await lance.db.open_table("journal")
+    rows = (await table.query().select(["date", "text"]).to_polars()).sort("date")
+    assert rows["date"].to_list() == ["2024-01-01", "2024-01-02"]
+    assert rows["text"][1] == "Went running with #marguerite."
+    chunks = await (await lance.db.open_table("journal_chunks")).count_rows()
+    assert chunks == 2
+
+    # nothing changed: nothing is re-embedded
+    assert await process_changes({str(journal)}, lance, state, tags=TagHints()) == 0
+
+
+async def test_edited_entries_replace_their_rows(vault, lance, state):
+    journal, evergreen = vault
+    (journal / "2024" / "01-02-2024 AM.pdf").write_bytes(b"")
+    note = evergreen / "ideas.md"
+    note.write_text("An idea.\n")
+    await process_changes({str(journal), str(evergreen)}, lance, state, tags=TagHints())
+
+    md = journal / "2024" / "01-02-2024.md"
+    md.write_text(md.read_text().replace("Went running", "Went swimming"))
+    note.write_text("A better idea.\n")
+    assert await process_changes({str(journal / "2024"), str(evergreen)}, lance, state, tags=TagHints()) == 2
+
+    table = await lance.db.open_table("journal")
+    rows = await table.query().select(["title", "text"]).to_polars()
+    assert len(rows) == 3
+    texts = dict(zip(rows["title"].to_list(), rows["text"].to_list()))
+    assert texts["01-02-2024"] == "Went swimming with #marguerite."
+    assert texts["ideas"] == "A better idea.\n"
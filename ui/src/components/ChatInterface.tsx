@@ -120,8 +120,8 @@ const MessageMetadataView = ({ metadata, onFlipBack }: { metadata: MessageMetada
         <h5>Retrieval Trace ({metadata.retrieval_trace.length})</h5>
         {metadata.retrieval_trace.length === 0 ? (
           <div className="metadata-muted">No retrieval trace recorded.</div>
-        ) : metadata.retrieval_trace.map((iter) => (
-          <div key={iter.iteration} className="metadata-trace-item">
+        ) : metadata.retrieval_trace.map((iter, idx) => (
+          <div key={`${iter.iteration}-${idx}`} className="metadata-trace-item">
             <div className="metadata-trace-header">
               <strong>{iter.iteration}. {iter.tool}</strong>
               <span>{iter.results_count} results, {iter.new_entries_added} new</span>